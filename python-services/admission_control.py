@@ -0,0 +1,276 @@
+"""
+CLARA Admission Control
+=======================
+Priority admission for API requests. At most `max_concurrent` requests run
+at once; the rest wait in bounded per-priority queues and a free slot always
+goes to the highest-priority waiter:
+
+    emergency     transcripts whose opening text contains emergency words
+    interactive   single-patient analyses (default)
+    batch         /api/batch-analyze, bulk metrics, model evaluation, cohort
+                  indexing, job submission and job chunks
+    background    dashboards, trends and reports
+
+A request whose queue is full, or that waits longer than `max_wait`, is
+rejected with 503 and a Retry-After estimate, so low-priority spikes are shed
+instead of delaying emergency and interactive work. Clients may set the
+class with an X-Clara-Priority header.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+import config
+from deadlines import current_deadline
+
+PRIORITIES = ('emergency', 'interactive', 'batch', 'background')
+
+PRIORITY_HEADER = 'X-Clara-Priority'
+
+# Cheap endpoints that never queue
+EXEMPT_PATHS = (
+    '/api/health', '/api/metrics', '/api/startup-report', '/api/models', '/api/shadow/summary'
+)
+
+ENDPOINT_PRIORITIES = {
+    '/api/batch-analyze': 'batch',
+    '/api/calculate-metrics/bulk': 'batch',
+    '/api/evaluate-model': 'batch',
+    '/api/cohorts/records': 'batch',
+    '/api/jobs': 'batch',
+    '/api/dashboard': 'background',
+    '/api/trend-analysis': 'background',
+    '/api/compare-periods': 'background',
+    '/api/impact-metrics': 'background',
+    '/api/analytics-report': 'background',
+    '/api/measure-impact': 'background'
+}
+
+# Endpoints whose transcript text is pre-screened for emergency words
+TRANSCRIPT_FIELDS = {
+    '/api/analyze-nlp': 'transcript',
+    '/api/comprehensive-analysis': 'transcript',
+    '/api/nlp-sessions': 'text'
+}
+
+
+def parse_queue_limits(value):
+    """'emergency=64,interactive=32,...' -> {priority: limit}; unknown classes are ignored."""
+    limits = {}
+    for part in (value or '').split(','):
+        name, _, limit = part.partition('=')
+        name = name.strip().lower()
+        if name in PRIORITIES and limit.strip().isdigit():
+            limits[name] = int(limit)
+    return limits
+
+
+class AdmissionController:
+    """
+    Concurrency limit with bounded priority queues.
+    """
+
+    DEFAULT_QUEUE_LIMITS = {'emergency': 64, 'interactive': 32, 'batch': 8, 'background': 4}
+
+    def __init__(self, enabled=False, max_concurrent=8, queue_limits=None, max_wait=10.0,
+                 scan_chars=2000):
+        self.enabled = enabled
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue_limits = dict(self.DEFAULT_QUEUE_LIMITS, **(queue_limits or {}))
+        self.max_wait = max_wait
+        self.scan_chars = scan_chars
+        self._emergency_words = ()
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self._service_seconds = 0.05
+        self._stats = {priority: {
+            'admitted': 0, 'queued': 0, 'shed': 0, 'timed_out': 0, 'wait_seconds': 0.0
+        } for priority in PRIORITIES}
+
+    def init_app(self, app, emergency_words=()):
+        """Register the admission hooks on a Flask app."""
+        self._emergency_words = tuple(word.lower() for word in emergency_words)
+        app.before_request(self.admit_request)
+        app.teardown_request(self.release_request)
+
+    def classify(self, path, data=None):
+        """Priority class for a request: client hint, emergency pre-screen, then endpoint default."""
+        hint = request.headers.get(PRIORITY_HEADER, '').strip().lower()
+        if hint in PRIORITIES:
+            return hint
+
+        field = TRANSCRIPT_FIELDS.get(path)
+        if field is None and path.startswith('/api/nlp-sessions/'):
+            field = 'text'
+        if field and isinstance(data, dict) and self.is_emergency(data.get(field)):
+            return 'emergency'
+
+        for prefix, priority in ENDPOINT_PRIORITIES.items():
+            if path == prefix or path.startswith(prefix + '/'):
+                return priority
+        return 'interactive'
+
+    def is_emergency(self, text):
+        """Emergency words in the opening `scan_chars` characters of the text."""
+        if not isinstance(text, str) or not text:
+            return False
+        opening = text[:self.scan_chars].lower()
+        return any(word in opening for word in self._emergency_words)
+
+    def admit_request(self):
+        """before_request hook: wait for a slot or reject with 503."""
+        if not self.enabled or request.method == 'OPTIONS':
+            return None
+        path = request.path
+        if path.startswith(EXEMPT_PATHS) or (request.method == 'GET' and path.startswith('/api/jobs')):
+            return None
+
+        screened = path in TRANSCRIPT_FIELDS or path.startswith('/api/nlp-sessions/')
+        # Flask caches the parsed body, so the endpoint does not parse it again
+        data = request.get_json(silent=True) if screened else None
+        priority = self.classify(path, data)
+        # Never wait past the request's own deadline
+        remaining = current_deadline().remaining()
+        timeout = self.max_wait if remaining is None else min(self.max_wait, remaining)
+        if not self.acquire(priority, timeout=timeout):
+            response = jsonify({
+                'error': 'Service saturated, retry later',
+                'priority': priority
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(self.retry_after())
+            return response
+        g.admission = (priority, time.perf_counter())
+        return None
+
+    def release_request(self, exc=None):
+        """teardown_request hook: free the slot taken by admit_request."""
+        admission = g.pop('admission', None)
+        if admission is not None:
+            self.release(time.perf_counter() - admission[1])
+
+    def acquire(self, priority, timeout=None, bounded=True):
+        """
+        Take a slot, waiting behind higher-priority requests.
+
+        Args:
+            timeout: seconds to wait (default: max_wait; None with bounded=False waits forever)
+            bounded: reject immediately when this priority's queue is full
+
+        Returns:
+            bool: True once admitted, False if shed or timed out
+        """
+        if timeout is None and bounded:
+            timeout = self.max_wait
+        stats = self._stats[priority]
+        rank = PRIORITIES.index(priority)
+        with self._cond:
+            if self._running < self.max_concurrent and not self._waiters_ahead(rank):
+                self._running += 1
+                stats['admitted'] += 1
+                return True
+            if bounded and len(self._waiting[priority]) >= self.queue_limits.get(priority, 0):
+                stats['shed'] += 1
+                return False
+
+            ticket = object()
+            self._waiting[priority].append(ticket)
+            stats['queued'] += 1
+            started = time.monotonic()
+            while True:
+                if self._running < self.max_concurrent and self._next_waiter() is ticket:
+                    self._waiting[priority].popleft()
+                    self._running += 1
+                    stats['admitted'] += 1
+                    stats['wait_seconds'] += time.monotonic() - started
+                    # Another slot may still be free for the next waiter
+                    self._cond.notify_all()
+                    return True
+                remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                if remaining is not None and remaining <= 0:
+                    self._waiting[priority].remove(ticket)
+                    stats['timed_out'] += 1
+                    stats['wait_seconds'] += time.monotonic() - started
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+
+    def release(self, service_seconds=None):
+        """Give a slot back and wake the waiters."""
+        with self._cond:
+            self._running = max(0, self._running - 1)
+            if service_seconds is not None:
+                # Moving average of time in service, for Retry-After estimates
+                self._service_seconds = 0.9 * self._service_seconds + 0.1 * service_seconds
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority):
+        """
+        Hold a slot for in-process work (batch job chunks). Waits without a
+        queue bound or timeout; passes straight through when disabled.
+        """
+        if not self.enabled:
+            yield
+            return
+        self.acquire(priority, timeout=None, bounded=False)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained (1-60)."""
+        with self._cond:
+            backlog = sum(len(waiting) for waiting in self._waiting.values()) + self._running
+        seconds = backlog * self._service_seconds / self.max_concurrent
+        return min(60, max(1, math.ceil(seconds)))
+
+    def stats(self):
+        """Slots in use, queue depths and per-priority admission counts."""
+        with self._cond:
+            priorities = {}
+            for priority in PRIORITIES:
+                stats = dict(self._stats[priority])
+                wait_seconds = stats.pop('wait_seconds')
+                stats['waiting'] = len(self._waiting[priority])
+                stats['queue_limit'] = self.queue_limits.get(priority, 0)
+                stats['average_wait_ms'] = (
+                    round(wait_seconds / stats['queued'] * 1000, 2) if stats['queued'] else 0.0
+                )
+                priorities[priority] = stats
+            running = self._running
+        return {
+            'enabled': self.enabled,
+            'max_concurrent': self.max_concurrent,
+            'running': running,
+            'priorities': priorities,
+            'generated_at': datetime.now().isoformat()
+        }
+
+    def _waiters_ahead(self, rank):
+        return any(self._waiting[priority] for priority in PRIORITIES[:rank + 1])
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            if self._waiting[priority]:
+                return self._waiting[priority][0]
+        return None
+
+
+# Export for use in main app
+admission_controller = AdmissionController(
+    enabled=config.ADMISSION_CONTROL,
+    max_concurrent=config.ADMISSION_MAX_CONCURRENT,
+    queue_limits=parse_queue_limits(config.ADMISSION_QUEUE_LIMITS),
+    max_wait=config.ADMISSION_MAX_WAIT_SECONDS,
+    scan_chars=config.ADMISSION_SCAN_CHARS
+)
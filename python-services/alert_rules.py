@@ -0,0 +1,350 @@
+"""
+CLARA Alert Rules
+=================
+Declarative alert rule tables, compiled once into predicates over a feature
+matrix (one row per patient, one column per feature).
+
+A rule fires when all of its conditions hold. Rules that share a `group` are
+exclusive: only the first matching rule of the group fires (an if/elif
+chain). Each compiled condition is a comparison operator applied to one
+feature column, so the same rule evaluates a single patient (plain values)
+or a whole panel (NumPy columns, one comparison per condition for every
+patient at once).
+
+Alert dicts are interned: every patient that fires the same rule with the
+same message gets the same dict, built once instead of per patient.
+Returned alerts are shared and must be treated as read-only.
+"""
+
+from string import Formatter
+import operator
+import threading
+
+OPERATORS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+ALERT_THRESHOLDS = {
+    'critical_risk': 75,
+    'high_risk': 50,
+    'multiple_conditions': 3,
+    'polypharmacy': 5
+}
+
+# AlertSystem: features risk_score, condition_count, medication_count (distinct drugs)
+PATIENT_ALERT_RULES = (
+    {
+        'name': 'critical_risk',
+        'group': 'risk',
+        'when': [('risk_score', '>=', ALERT_THRESHOLDS['critical_risk'])],
+        'alert': {
+            'type': 'CRITICAL',
+            'category': 'Risk Assessment',
+            'message': 'Critical risk level detected (Score: {risk_score})',
+            'priority': 1,
+            'action': 'Immediate medical review recommended',
+            'color': '#ef4444'
+        }
+    },
+    {
+        'name': 'high_risk',
+        'group': 'risk',
+        'when': [('risk_score', '>=', ALERT_THRESHOLDS['high_risk'])],
+        'alert': {
+            'type': 'WARNING',
+            'category': 'Risk Assessment',
+            'message': 'High risk level detected (Score: {risk_score})',
+            'priority': 2,
+            'action': 'Schedule follow-up within 48 hours',
+            'color': '#f97316'
+        }
+    },
+    {
+        'name': 'multiple_conditions',
+        'when': [('condition_count', '>=', ALERT_THRESHOLDS['multiple_conditions'])],
+        'alert': {
+            'type': 'INFO',
+            'category': 'Complexity',
+            'message': 'Multiple conditions detected ({condition_count} conditions)',
+            'priority': 3,
+            'action': 'Consider multidisciplinary consultation',
+            'color': '#3b82f6'
+        }
+    },
+    {
+        'name': 'polypharmacy',
+        'when': [('medication_count', '>=', ALERT_THRESHOLDS['polypharmacy'])],
+        'alert': {
+            'type': 'WARNING',
+            'category': 'Medication Safety',
+            'message': 'Polypharmacy risk ({medication_count} medications)',
+            'priority': 2,
+            'action': 'Review medication interactions and necessity',
+            'color': '#f97316'
+        }
+    }
+)
+
+# ClinicalInsightsEngine: features age, condition_count
+CLINICAL_ALERT_RULES = (
+    {
+        'name': 'colorectal_screening',
+        'when': [('age', '>=', 50)],
+        'alert': {
+            'type': 'Screening',
+            'priority': 'Medium',
+            'message': 'Consider colorectal cancer screening',
+            'due': 'If not done in past 10 years'
+        }
+    },
+    {
+        'name': 'vaccination',
+        'when': [('age', '>=', 65)],
+        'alert': {
+            'type': 'Vaccination',
+            'priority': 'Medium',
+            'message': 'Annual influenza and pneumococcal vaccination due',
+            'due': 'Annually'
+        }
+    },
+    {
+        'name': 'care_coordination',
+        'when': [('condition_count', '>=', 3)],
+        'alert': {
+            'type': 'Care Coordination',
+            'priority': 'High',
+            'message': 'Complex patient - consider care coordinator referral',
+            'due': 'Within 2 weeks'
+        }
+    }
+)
+
+# Interaction severity -> (alert type, priority, color)
+INTERACTION_SEVERITY_ALERTS = {
+    'contraindicated': ('DANGER', 1, '#dc2626'),
+    'major': ('DANGER', 1, '#dc2626'),
+    'moderate': ('WARNING', 2, '#f97316'),
+    'minor': ('INFO', 3, '#3b82f6')
+}
+
+INTERN_CACHE_SIZE = 10000
+
+
+class CompiledAlertRule:
+    """
+    One rule: (column, operator, value) conditions and an alert template.
+    """
+
+    def __init__(self, index, rule, columns):
+        self.index = index
+        self.name = rule['name']
+        self.group = rule.get('group')
+        self.conditions = tuple(
+            (columns[feature], OPERATORS[op], value) for feature, op, value in rule['when']
+        )
+        self.template = dict(rule['alert'])
+        self.priority = self.template.get('priority')
+        # Features the message is formatted with (None when it is constant)
+        fields = tuple(
+            field for _, field, _, _ in Formatter().parse(self.template['message']) if field
+        )
+        self.message_columns = tuple((field, columns[field]) for field in fields) or None
+
+    def matches(self, row):
+        """Whether all conditions hold for one feature row."""
+        for column, compare, value in self.conditions:
+            if not compare(row[column], value):
+                return False
+        return True
+
+    def message_values(self, row):
+        """Values the message is formatted with, from one feature row."""
+        if self.message_columns is None:
+            return ()
+        return tuple(row[column] for _, column in self.message_columns)
+
+    def mask(self, matrix):
+        """Boolean mask of the panel rows the conditions hold for."""
+        import numpy as np
+
+        mask = np.ones(matrix.shape[0], dtype=bool)
+        for column, compare, value in self.conditions:
+            mask &= compare(matrix[:, column], value)
+        return mask
+
+
+class AlertRuleSet:
+    """
+    A compiled rule table. `evaluate` takes one patient's features,
+    `evaluate_panel` a whole panel's feature columns; both run the same compiled rules.
+    """
+
+    def __init__(self, rules, order_by_priority=False):
+        features = []
+        for rule in rules:
+            for feature, _, _ in rule['when']:
+                if feature not in features:
+                    features.append(feature)
+            for _, field, _, _ in Formatter().parse(rule['alert']['message']):
+                if field and field not in features:
+                    features.append(field)
+        self.features = tuple(features)
+        columns = {feature: index for index, feature in enumerate(self.features)}
+
+        self.rules = tuple(CompiledAlertRule(index, rule, columns) for index, rule in enumerate(rules))
+        # Output order: table order, or by priority (stable, as a sort by priority would give)
+        self._order_by_priority = order_by_priority
+        if order_by_priority:
+            self._output_order = tuple(sorted(self.rules, key=lambda rule: (rule.priority, rule.index)))
+        else:
+            self._output_order = self.rules
+        self._rank = {rule: rank for rank, rule in enumerate(self._output_order)}
+        self._interned = {}
+        self._lock = threading.Lock()
+
+    def feature_row(self, values):
+        """Feature tuple in column order from a dict (missing features are 0)."""
+        return tuple(values.get(feature, 0) for feature in self.features)
+
+    def feature_matrix(self, columns):
+        """
+        (patients x features) float matrix.
+
+        Args:
+            columns: dict feature -> sequence of per-patient values (equal lengths)
+        """
+        import numpy as np
+
+        length = len(next(iter(columns.values()))) if columns else 0
+        matrix = np.zeros((length, len(self.features)), dtype=np.float64)
+        for column, feature in enumerate(self.features):
+            if feature in columns:
+                matrix[:, column] = columns[feature]
+        return matrix
+
+    def evaluate(self, values):
+        """
+        Alerts for one patient.
+
+        Args:
+            values: dict feature -> value
+
+        Returns:
+            list: interned alert dicts in output order
+        """
+        row = self.feature_row(values)
+        fired = []
+        taken = ()
+        for rule in self.rules:
+            if rule.group is not None and rule.group in taken:
+                continue
+            if rule.matches(row):
+                fired.append(rule)
+                if rule.group is not None:
+                    taken += (rule.group,)
+        if self._order_by_priority and len(fired) > 1:
+            fired.sort(key=self._rank.__getitem__)
+        return [self._alert(rule, rule.message_values(row)) for rule in fired]
+
+    def evaluate_panel(self, columns):
+        """
+        Alerts for a whole panel. Conditions run on the feature matrix (see
+        feature_matrix); messages are formatted from the original values, so
+        they read exactly as evaluate would print them.
+
+        Args:
+            columns: dict feature -> sequence of per-patient values (equal lengths)
+
+        Returns:
+            list: one list of interned alert dicts per patient
+        """
+        import numpy as np
+
+        matrix = self.feature_matrix(columns)
+        masks = {}
+        taken = {}
+        for rule in self.rules:
+            mask = rule.mask(matrix)
+            if rule.group is not None:
+                group_taken = taken.get(rule.group)
+                if group_taken is None:
+                    taken[rule.group] = mask.copy()
+                else:
+                    mask &= ~group_taken
+                    group_taken |= mask
+            masks[rule.index] = mask
+
+        results = [[] for _ in range(matrix.shape[0])]
+        for rule in self._output_order:
+            fired = np.flatnonzero(masks[rule.index]).tolist()
+            if not fired:
+                continue
+            if rule.message_columns is None:
+                alert = self._alert(rule, ())
+                for patient in fired:
+                    results[patient].append(alert)
+                continue
+            message_columns = [columns.get(field) for field, _ in rule.message_columns]
+            for patient in fired:
+                values = tuple(column[patient] if column is not None else 0 for column in message_columns)
+                results[patient].append(self._alert(rule, values))
+        return results
+
+    def stats(self):
+        return {
+            'rules': len(self.rules),
+            'features': list(self.features),
+            'interned_alerts': len(self._interned)
+        }
+
+    def _alert(self, rule, values):
+        """Interned alert for a fired rule (one dict per distinct message)."""
+        # 50 and 50.0 compare equal but print differently: key on the type too
+        key = (rule.index,) + tuple((type(value), value) for value in values)
+        alert = self._interned.get(key)
+        if alert is None:
+            alert = dict(rule.template)
+            if rule.message_columns is not None:
+                alert['message'] = rule.template['message'].format(**{
+                    field: value for (field, _), value in zip(rule.message_columns, values)
+                })
+            with self._lock:
+                if len(self._interned) >= INTERN_CACHE_SIZE:
+                    self._interned.clear()
+                self._interned[key] = alert
+        return alert
+
+
+_interaction_alerts = {}
+
+
+def interaction_alert(interaction):
+    """Interned alert for an interaction record (see InteractionKnowledgeBase.check)."""
+    severity = interaction['severity']
+    key = (severity, interaction['message'], interaction['action'])
+    alert = _interaction_alerts.get(key)
+    if alert is None:
+        alert_type, priority, color = INTERACTION_SEVERITY_ALERTS[severity]
+        alert = {
+            'type': alert_type,
+            'category': 'Drug Interaction',
+            'message': interaction['message'],
+            'priority': priority,
+            'action': interaction['action'],
+            'severity': severity,
+            'color': color
+        }
+        if len(_interaction_alerts) >= INTERN_CACHE_SIZE:
+            _interaction_alerts.clear()
+        _interaction_alerts[key] = alert
+    return alert
+
+
+# Export for use in main app
+patient_alert_rules = AlertRuleSet(PATIENT_ALERT_RULES, order_by_priority=True)
+clinical_alert_rules = AlertRuleSet(CLINICAL_ALERT_RULES)
@@ -0,0 +1,78 @@
+"""
+CLARA Alert System
+==================
+Patient alerts from the compiled rule table in alert_rules (risk level,
+condition count, polypharmacy) plus drug interaction alerts, for one
+patient or a whole panel.
+"""
+
+from medication_normalizer import medication_normalizer
+from drug_interactions import interaction_kb
+from alert_rules import patient_alert_rules, interaction_alert
+
+
+class AlertSystem:
+    """
+    Dynamic alert generation based on clinical data patterns.
+    Rules are the compiled table in alert_rules; alert dicts are interned.
+    """
+    
+    def __init__(self, rules=None):
+        self.rules = rules or patient_alert_rules
+    
+    def generate_alerts(self, analysis_data):
+        """Generate relevant alerts based on analysis data."""
+        # Polypharmacy counts distinct drugs after brand/generic normalization
+        medications = medication_normalizer.normalize_list(analysis_data.get('medications', []))
+        return self.assemble_alerts(
+            analysis_data.get('risk_score', 0),
+            len(analysis_data.get('diseases', [])),
+            len(medications),
+            self._check_interactions(medications)
+        )
+    
+    def generate_alerts_batch(self, analyses):
+        """
+        Alerts for many patients at once: every rule is one vectorized
+        comparison over the panel's feature matrix.
+        """
+        names = {}
+        medication_lists = [
+            medication_normalizer.normalize_list(analysis.get('medications', []), cache=names)
+            for analysis in analyses
+        ]
+        panel = self.rules.evaluate_panel({
+            'risk_score': [analysis.get('risk_score', 0) for analysis in analyses],
+            'condition_count': [len(analysis.get('diseases', [])) for analysis in analyses],
+            'medication_count': [len(medications) for medications in medication_lists]
+        })
+        return [
+            # Interactions need at least two distinct drugs
+            self._with_interactions(alerts, self._check_interactions(medications)) if len(medications) > 1 else alerts
+            for alerts, medications in zip(panel, medication_lists)
+        ]
+    
+    def assemble_alerts(self, risk_score, condition_count, medication_count, interactions):
+        """
+        Alerts from already-computed inputs (risk score, distinct condition and
+        medication counts, interaction records), sorted by priority.
+        """
+        alerts = self.rules.evaluate({
+            'risk_score': risk_score,
+            'condition_count': condition_count,
+            'medication_count': medication_count
+        })
+        return self._with_interactions(alerts, interactions)
+    
+    def _with_interactions(self, alerts, interactions):
+        """Rule alerts (already in priority order) merged with interaction alerts."""
+        if not interactions:
+            return alerts
+        alerts.extend(interaction_alert(interaction) for interaction in interactions)
+        # Stable: rule alerts stay ahead of interaction alerts of the same priority
+        alerts.sort(key=lambda x: x['priority'])
+        return alerts
+    
+    def _check_interactions(self, medications):
+        """Check normalized drug IDs for known interactions (hashed pair lookups)."""
+        return interaction_kb.check_ids(medications)
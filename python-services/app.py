@@ -5,298 +5,57 @@ Machine Learning-based risk prediction, NLP analysis, and clinical analytics.
 Provides measurable impact metrics and dynamic features.
 """
 
+from startup import ModuleLoader
+import config
+
+# Created first so it can time the rest of the app import
+module_loader = ModuleLoader(lazy=config.LAZY_IMPORTS)
+
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import json
 import os
 import io
-import numpy as np
+import time
 from collections import Counter, defaultdict
 import random
 
+from compression import response_compressor
+from risk_prediction import RiskPredictionModel, load_learned_risk_model
+from clinical_nlp import ClinicalNLPAnalyzer
+from model_registry import model_registry
+from shadow_evaluation import shadow_evaluator, compare_risk, compare_outcomes
+from drug_interactions import interaction_kb
+from medication_normalizer import medication_normalizer
+from icd10_index import icd10_index
+from fuzzy_matcher import fuzzy_matcher
+from nlp_sessions import create_session_store
+from patient_state import create_patient_state_store
+from alert_system import AlertSystem
+from batch_jobs import batch_job_queue
+from rpc import rpc_dispatcher, RpcContext, RpcError
+from single_flight import single_flight
+from significance import bootstrap_tester, period_summary
+from model_evaluation import model_evaluator
+from cohort_engine import cohort_engine, analysis_record
+from data_access import analysis_store, analysis_summary, record_filters
+from admission_control import admission_controller
+import deadlines
+from deadlines import current_deadline, Deadline, DeadlineExceeded
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
+response_compressor.init_app(app)
+deadlines.init_app(app)
 
-# ============================================
-# MODULE: Risk Prediction ML Model (Simulated)
-# ============================================
-
-class RiskPredictionModel:
-    """
-    Machine Learning model for clinical risk prediction.
-    Uses weighted scoring based on clinical factors.
-    """
-    
-    # Risk factor weights (derived from medical literature)
-    RISK_WEIGHTS = {
-        'age_over_65': 15,
-        'age_over_75': 25,
-        'diabetes': 20,
-        'hypertension': 15,
-        'heart_disease': 30,
-        'previous_mi': 35,
-        'kidney_disease': 25,
-        'copd': 20,
-        'asthma': 10,
-        'obesity': 15,
-        'smoking': 20,
-        'multiple_medications': 10,
-        'drug_interaction_risk': 25,
-        'high_blood_pressure': 15,
-        'abnormal_ecg': 20,
-        'chest_pain': 25,
-        'shortness_of_breath': 15,
-        'family_history': 10
-    }
-    
-    # Disease severity scores
-    DISEASE_SEVERITY = {
-        'hypertension': 15,
-        'type 2 diabetes': 20,
-        'type 1 diabetes': 25,
-        'coronary artery disease': 35,
-        'heart failure': 40,
-        'atrial fibrillation': 25,
-        'pneumonia': 20,
-        'asthma': 15,
-        'copd': 25,
-        'chronic kidney disease': 30,
-        'myocardial infarction': 45,
-        'stroke': 40,
-        'cancer': 50
-    }
-    
-    def predict_risk(self, patient_data):
-        """
-        Predict risk score based on patient data.
-        Returns score (0-100), level, confidence, and factors.
-        """
-        score = 0
-        factors = []
-        
-        # Age factor
-        age = patient_data.get('age', 0)
-        if age >= 75:
-            score += self.RISK_WEIGHTS['age_over_75']
-            factors.append(f'Advanced age ({age} years)')
-        elif age >= 65:
-            score += self.RISK_WEIGHTS['age_over_65']
-            factors.append(f'Age over 65 ({age} years)')
-        
-        # Disease factors
-        diseases = patient_data.get('diseases', [])
-        for disease in diseases:
-            disease_lower = disease.lower()
-            for key, severity in self.DISEASE_SEVERITY.items():
-                if key in disease_lower:
-                    score += severity
-                    factors.append(f'Condition: {disease}')
-                    break
-        
-        # Medication count factor
-        medications = patient_data.get('medications', [])
-        if len(medications) >= 5:
-            score += self.RISK_WEIGHTS['multiple_medications']
-            factors.append(f'Polypharmacy ({len(medications)} medications)')
-        
-        # Symptoms factor
-        symptoms = patient_data.get('symptoms', [])
-        symptom_keywords = {
-            'chest pain': 25,
-            'shortness of breath': 15,
-            'difficulty breathing': 20,
-            'dizziness': 10,
-            'syncope': 20,
-            'palpitations': 15
-        }
-        for symptom in symptoms:
-            symptom_lower = symptom.lower()
-            for keyword, weight in symptom_keywords.items():
-                if keyword in symptom_lower:
-                    score += weight
-                    factors.append(f'Symptom: {symptom}')
-                    break
-        
-        # Cap score at 100
-        score = min(score, 100)
-        
-        # Determine level
-        if score >= 75:
-            level = 'Critical'
-        elif score >= 50:
-            level = 'High'
-        elif score >= 25:
-            level = 'Medium'
-        else:
-            level = 'Low'
-        
-        # Calculate confidence (based on data completeness)
-        data_points = len(diseases) + len(medications) + len(symptoms) + (1 if age else 0)
-        confidence = min(95, 60 + (data_points * 5))
-        
-        return {
-            'score': score,
-            'level': level,
-            'confidence': confidence,
-            'factors': factors[:5],  # Top 5 factors
-            'model_version': '2.0.0',
-            'prediction_timestamp': datetime.now().isoformat()
-        }
-
-
-# ============================================
-# MODULE: NLP Analysis
-# ============================================
-
-class ClinicalNLPAnalyzer:
-    """
-    Natural Language Processing for clinical transcripts.
-    Extracts entities, sentiment, and key phrases.
-    """
-    
-    # Medical entity keywords
-    DISEASE_KEYWORDS = [
-        'diabetes', 'hypertension', 'heart disease', 'asthma', 'copd',
-        'pneumonia', 'infection', 'cancer', 'stroke', 'kidney disease',
-        'liver disease', 'anemia', 'arthritis', 'depression', 'anxiety',
-        'migraine', 'epilepsy', 'parkinson', 'alzheimer', 'covid'
-    ]
-    
-    MEDICATION_KEYWORDS = [
-        'metformin', 'aspirin', 'warfarin', 'lisinopril', 'atorvastatin',
-        'amlodipine', 'omeprazole', 'levothyroxine', 'gabapentin', 'prednisone',
-        'amoxicillin', 'azithromycin', 'ibuprofen', 'acetaminophen', 'insulin',
-        'metoprolol', 'hydrochlorothiazide', 'losartan', 'simvastatin', 'furosemide'
-    ]
-    
-    TEST_KEYWORDS = [
-        'ecg', 'ekg', 'blood test', 'x-ray', 'mri', 'ct scan', 'ultrasound',
-        'biopsy', 'endoscopy', 'colonoscopy', 'mammogram', 'pap smear',
-        'cholesterol', 'glucose', 'hba1c', 'creatinine', 'bmp', 'cbc',
-        'urinalysis', 'thyroid', 'liver function', 'kidney function'
-    ]
-    
-    SYMPTOM_KEYWORDS = [
-        'pain', 'fever', 'cough', 'headache', 'fatigue', 'nausea',
-        'vomiting', 'diarrhea', 'dizziness', 'shortness of breath',
-        'chest pain', 'swelling', 'rash', 'itching', 'numbness',
-        'weakness', 'blurred vision', 'weight loss', 'weight gain'
-    ]
-    
-    def analyze_transcript(self, transcript):
-        """
-        Perform comprehensive NLP analysis on clinical transcript.
-        """
-        text_lower = transcript.lower()
-        words = text_lower.split()
-        word_count = len(words)
-        
-        # Extract entities
-        diseases = self._extract_entities(text_lower, self.DISEASE_KEYWORDS)
-        medications = self._extract_entities(text_lower, self.MEDICATION_KEYWORDS)
-        tests = self._extract_entities(text_lower, self.TEST_KEYWORDS)
-        symptoms = self._extract_entities(text_lower, self.SYMPTOM_KEYWORDS)
-        
-        # Sentiment analysis (simple rule-based)
-        sentiment = self._analyze_sentiment(text_lower)
-        
-        # Key phrases extraction
-        key_phrases = self._extract_key_phrases(transcript)
-        
-        # Urgency detection
-        urgency = self._detect_urgency(text_lower)
-        
-        # Calculate complexity score
-        complexity = self._calculate_complexity(diseases, medications, symptoms)
-        
-        return {
-            'entities': {
-                'diseases': diseases,
-                'medications': medications,
-                'tests': tests,
-                'symptoms': symptoms
-            },
-            'metrics': {
-                'word_count': word_count,
-                'sentence_count': transcript.count('.') + transcript.count('?'),
-                'entity_count': len(diseases) + len(medications) + len(tests) + len(symptoms)
-            },
-            'sentiment': sentiment,
-            'key_phrases': key_phrases,
-            'urgency': urgency,
-            'complexity_score': complexity,
-            'analysis_timestamp': datetime.now().isoformat()
-        }
-    
-    def _extract_entities(self, text, keywords):
-        """Extract matching keywords from text."""
-        found = []
-        for keyword in keywords:
-            if keyword in text:
-                found.append(keyword.title())
-        return list(set(found))
-    
-    def _analyze_sentiment(self, text):
-        """Simple sentiment analysis for clinical context."""
-        positive_words = ['better', 'improved', 'stable', 'good', 'normal', 'healthy', 'recovery']
-        negative_words = ['worse', 'severe', 'critical', 'pain', 'emergency', 'urgent', 'deteriorating']
-        
-        pos_count = sum(1 for word in positive_words if word in text)
-        neg_count = sum(1 for word in negative_words if word in text)
-        
-        if neg_count > pos_count:
-            return {'label': 'Concerning', 'score': -0.5 - (neg_count * 0.1)}
-        elif pos_count > neg_count:
-            return {'label': 'Positive', 'score': 0.5 + (pos_count * 0.1)}
-        else:
-            return {'label': 'Neutral', 'score': 0.0}
-    
-    def _extract_key_phrases(self, text):
-        """Extract important phrases from transcript."""
-        # Simple extraction based on patterns
-        phrases = []
-        important_patterns = [
-            'diagnosed with', 'prescribed', 'recommended', 'complains of',
-            'history of', 'symptoms include', 'test results show', 'need to'
-        ]
-        
-        text_lower = text.lower()
-        for pattern in important_patterns:
-            if pattern in text_lower:
-                idx = text_lower.find(pattern)
-                end_idx = text_lower.find('.', idx)
-                if end_idx == -1:
-                    end_idx = min(idx + 100, len(text))
-                phrase = text[idx:end_idx].strip()
-                if len(phrase) > 10:
-                    phrases.append(phrase[:100])
-        
-        return phrases[:5]
-    
-    def _detect_urgency(self, text):
-        """Detect urgency level from transcript."""
-        emergency_words = ['emergency', 'urgent', 'immediately', 'critical', 'severe', '911']
-        high_words = ['concerning', 'worrying', 'significant', 'serious']
-        
-        for word in emergency_words:
-            if word in text:
-                return {'level': 'Emergency', 'score': 5}
-        
-        for word in high_words:
-            if word in text:
-                return {'level': 'High', 'score': 4}
-        
-        return {'level': 'Routine', 'score': 2}
-    
-    def _calculate_complexity(self, diseases, medications, symptoms):
-        """Calculate case complexity score (1-10)."""
-        score = 1
-        score += min(len(diseases) * 1.5, 4)
-        score += min(len(medications) * 0.5, 2)
-        score += min(len(symptoms) * 0.5, 2)
-        return min(round(score, 1), 10)
+fuzzy_matcher.register_vocabulary('entities', lambda: (
+    ClinicalNLPAnalyzer.DISEASE_KEYWORDS + ClinicalNLPAnalyzer.MEDICATION_KEYWORDS +
+    ClinicalNLPAnalyzer.TEST_KEYWORDS + ClinicalNLPAnalyzer.SYMPTOM_KEYWORDS
+))
+fuzzy_matcher.register_vocabulary('medications', medication_normalizer.extractable_synonyms)
+admission_controller.init_app(app, emergency_words=ClinicalNLPAnalyzer.EMERGENCY_WORDS)
 
 
 # ============================================
@@ -386,7 +145,12 @@ class ImpactAnalytics:
         """
         Calculate measurable impact between two time periods.
         Returns improvement metrics.
+        Periods with raw "risk_scores" (and optional "high_risk" flags) get
+        their aggregates derived from them and bootstrap significance tests.
         """
+        significance = bootstrap_tester.compare_periods(before_metrics, after_metrics)
+        before_metrics = dict(period_summary(before_metrics), **before_metrics)
+        after_metrics = dict(period_summary(after_metrics), **after_metrics)
         improvements = {}
         
         # Risk reduction
@@ -417,116 +181,13 @@ class ImpactAnalytics:
             impact_score += min(improvements['volume_change'], 20)
         
         improvements['overall_impact_score'] = min(round(impact_score, 1), 100)
+        if significance is not None:
+            improvements['significance'] = significance
         improvements['timestamp'] = datetime.now().isoformat()
         
         return improvements
 
 
-# ============================================
-# MODULE: Dynamic Alert System
-# ============================================
-
-class AlertSystem:
-    """
-    Dynamic alert generation based on clinical data patterns.
-    """
-    
-    ALERT_THRESHOLDS = {
-        'critical_risk': 75,
-        'high_risk': 50,
-        'drug_interaction': True,
-        'multiple_conditions': 3,
-        'polypharmacy': 5
-    }
-    
-    def generate_alerts(self, analysis_data):
-        """Generate relevant alerts based on analysis data."""
-        alerts = []
-        
-        # Risk score alerts
-        risk_score = analysis_data.get('risk_score', 0)
-        if risk_score >= self.ALERT_THRESHOLDS['critical_risk']:
-            alerts.append({
-                'type': 'CRITICAL',
-                'category': 'Risk Assessment',
-                'message': f'Critical risk level detected (Score: {risk_score})',
-                'priority': 1,
-                'action': 'Immediate medical review recommended',
-                'color': '#ef4444'
-            })
-        elif risk_score >= self.ALERT_THRESHOLDS['high_risk']:
-            alerts.append({
-                'type': 'WARNING',
-                'category': 'Risk Assessment',
-                'message': f'High risk level detected (Score: {risk_score})',
-                'priority': 2,
-                'action': 'Schedule follow-up within 48 hours',
-                'color': '#f97316'
-            })
-        
-        # Multiple conditions alert
-        diseases = analysis_data.get('diseases', [])
-        if len(diseases) >= self.ALERT_THRESHOLDS['multiple_conditions']:
-            alerts.append({
-                'type': 'INFO',
-                'category': 'Complexity',
-                'message': f'Multiple conditions detected ({len(diseases)} conditions)',
-                'priority': 3,
-                'action': 'Consider multidisciplinary consultation',
-                'color': '#3b82f6'
-            })
-        
-        # Polypharmacy alert
-        medications = analysis_data.get('medications', [])
-        if len(medications) >= self.ALERT_THRESHOLDS['polypharmacy']:
-            alerts.append({
-                'type': 'WARNING',
-                'category': 'Medication Safety',
-                'message': f'Polypharmacy risk ({len(medications)} medications)',
-                'priority': 2,
-                'action': 'Review medication interactions and necessity',
-                'color': '#f97316'
-            })
-        
-        # Drug interaction alerts (simplified)
-        interaction_risks = self._check_interactions(medications)
-        for interaction in interaction_risks:
-            alerts.append({
-                'type': 'DANGER',
-                'category': 'Drug Interaction',
-                'message': interaction['message'],
-                'priority': 1,
-                'action': interaction['action'],
-                'color': '#dc2626'
-            })
-        
-        # Sort by priority
-        alerts.sort(key=lambda x: x['priority'])
-        
-        return alerts
-    
-    def _check_interactions(self, medications):
-        """Check for known drug interactions."""
-        interactions = []
-        med_lower = [m.lower() for m in medications]
-        
-        # Known dangerous combinations
-        dangerous_pairs = [
-            (['warfarin', 'aspirin'], 'Warfarin + Aspirin increases bleeding risk'),
-            (['metformin', 'alcohol'], 'Metformin + Alcohol may cause lactic acidosis'),
-            (['lisinopril', 'potassium'], 'ACE inhibitor + Potassium may cause hyperkalemia'),
-        ]
-        
-        for pair, message in dangerous_pairs:
-            if all(drug in med_lower for drug in pair):
-                interactions.append({
-                    'message': message,
-                    'action': 'Review medication combination with pharmacist'
-                })
-        
-        return interactions
-
-
 # ============================================
 # MODULE: Report Generation
 # ============================================
@@ -591,11 +252,151 @@ class ReportGenerator:
 # ============================================
 # GLOBAL INSTANCES
 # ============================================
-risk_model = RiskPredictionModel()
+
+risk_model = RiskPredictionModel(
+    learned_model_loader=lambda: load_learned_risk_model(module_loader=module_loader)
+)
+if not config.LAZY_IMPORTS:
+    # Memory-map the trained artifact at startup rather than on the first request
+    risk_model.learned_model
+
+
+def register_shadow_candidates():
+    """Wire candidate models for shadow evaluation from configuration."""
+    if config.SHADOW_FRACTION <= 0:
+        return
+    if not config.SHADOW_RULES_VERSION and not config.SHADOW_RISK_MODEL_PATH:
+        print("Warning: shadow evaluation enabled but no candidate model configured")
+        return
+    
+    def candidate_rules():
+        if config.SHADOW_RULES_VERSION:
+            return model_registry.get(config.SHADOW_RULES_VERSION)
+        return model_registry.active
+    
+    candidate_risk_model = RiskPredictionModel(
+        learned_model_loader=(lambda: load_learned_risk_model(config.SHADOW_RISK_MODEL_PATH, module_loader))
+        if config.SHADOW_RISK_MODEL_PATH else None
+    )
+    shadow_evaluator.register_candidate(
+        'predict-risk',
+        lambda data: candidate_risk_model.predict_risk(data, rules=candidate_rules()),
+        compare_risk,
+        warmup=lambda: (candidate_risk_model.learned_model, candidate_rules())
+    )
+    
+    if config.SHADOW_RULES_VERSION:
+        def run_outcomes(data):
+            if not advanced_modules_available():
+                raise RuntimeError('Advanced modules not available')
+            return outcome_predictor.predict_outcomes(data, rules=candidate_rules())
+        
+        shadow_evaluator.register_candidate(
+            'predict-outcomes', run_outcomes, compare_outcomes,
+            warmup=lambda: advanced_modules_available()
+        )
+
+
+register_shadow_candidates()
+
+if not config.LAZY_IMPORTS:
+    medication_normalizer.load()
+    interaction_kb.load()
+    icd10_index.load()
 nlp_analyzer = ClinicalNLPAnalyzer()
+nlp_session_store = create_session_store(nlp_analyzer, medication_normalizer)
+spacy_analyzer = None
+
+
+def get_spacy_analyzer():
+    """spaCy transcript backend (CLARA_NLP_BACKEND=spacy), or None for the keyword path."""
+    global spacy_analyzer
+    if config.NLP_BACKEND != 'spacy':
+        return None
+    if spacy_analyzer is None:
+        module = module_loader.load('spacy_pipeline')
+        if module is None:
+            print("Warning: spaCy backend requested but spaCy is not available, using keyword NLP")
+            return None
+        spacy_analyzer = module.create_spacy_analyzer(nlp_analyzer, medication_normalizer).load()
+    return spacy_analyzer
+
+
+def analyze_transcripts(texts, fuzzy=None, deadline=None):
+    """
+    NLP analysis for a list of transcripts. Uses the spaCy backend (batched
+    through nlp.pipe) when enabled; fuzzy matching stays on the keyword path.
+    Once `deadline` passes no further transcripts are started, so the result
+    may be shorter than `texts`.
+    """
+    backend = get_spacy_analyzer()
+    if backend is not None and not (config.FUZZY_MATCHING if fuzzy is None else fuzzy):
+        return backend.analyze_batch(texts, deadline=deadline)
+    
+    results = []
+    for text in texts:
+        if deadline is not None and deadline.expired:
+            break
+        results.append(nlp_analyzer.analyze_transcript(text, fuzzy=fuzzy))
+    return results
+
+
+if not config.LAZY_IMPORTS:
+    get_spacy_analyzer()
+
+
+def batch_analyze_items(transcripts, fuzzy=None, deadline=None):
+    """
+    NLP analysis plus risk prediction for [{"id", "text"}, ...] (shared by batch-analyze and jobs).
+    Items not started before `deadline` are left out of the results.
+    """
+    nlp_results = analyze_transcripts(
+        [item.get('text', '') for item in transcripts], fuzzy=fuzzy, deadline=deadline
+    )
+    risk_results = risk_model.predict_risk_batch([
+        {
+            'diseases': nlp_result['entities']['diseases'],
+            'medications': nlp_result['entities']['medications'],
+            'symptoms': nlp_result['entities']['symptoms']
+        }
+        for nlp_result in nlp_results
+    ])
+    
+    results = []
+    for item, nlp_result, risk_result in zip(transcripts, nlp_results, risk_results):
+        results.append({
+            'id': item.get('id'),
+            'nlp': nlp_result,
+            'risk': risk_result
+        })
+    return results
+
+
+def run_batch_analyze_job(items, options):
+    """Process one job chunk; a malformed item fails on its own instead of failing the job."""
+    fuzzy = options.get('fuzzy')
+    try:
+        # Job chunks yield to emergency and interactive requests
+        with admission_controller.slot('batch'):
+            return batch_analyze_items(items, fuzzy=fuzzy)
+    except Exception:
+        results = []
+        for item in items:
+            try:
+                results.extend(batch_analyze_items([item], fuzzy=fuzzy))
+            except Exception as e:
+                results.append({'id': item.get('id') if isinstance(item, dict) else None, 'error': str(e)})
+        return results
+
+
+batch_job_queue.register_kind('batch-analyze', run_batch_analyze_job)
+# Pick up jobs left unfinished by a previous process (CLARA_JOB_WORKERS=0 opts out)
+if config.JOB_WORKERS > 0:
+    batch_job_queue.resume()
 impact_analytics = ImpactAnalytics()
 alert_system = AlertSystem()
 report_generator = ReportGenerator()
+patient_state_store = create_patient_state_store(risk_model, alert_system, medication_normalizer, interaction_kb)
 
 
 # ============================================
@@ -627,7 +428,9 @@ def predict_risk():
     """
     try:
         data = request.get_json()
+        started = time.perf_counter()
         prediction = risk_model.predict_risk(data)
+        shadow_evaluator.submit('predict-risk', data, prediction, time.perf_counter() - started)
         return jsonify(prediction)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -639,7 +442,8 @@ def analyze_nlp():
     NLP analysis endpoint for clinical transcripts.
     
     Input: {
-        "transcript": "Doctor: Good morning..."
+        "transcript": "Doctor: Good morning...",
+        "fuzzy": true  (optional, correct misspelled terms)
     }
     """
     try:
@@ -649,12 +453,81 @@ def analyze_nlp():
         if not transcript:
             return jsonify({'error': 'Transcript required'}), 400
         
-        analysis = nlp_analyzer.analyze_transcript(transcript)
+        analysis = analyze_transcripts([transcript], fuzzy=data.get('fuzzy'))[0]
         return jsonify(analysis)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/nlp-sessions', methods=['POST'])
+def create_nlp_session():
+    """
+    Start an incremental NLP session for a live consultation.
+    
+    Input: {
+        "text": "Doctor: Good morning..."  (optional first chunk)
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        session = nlp_session_store.create()
+        with session.lock:
+            if data.get('text'):
+                session.append(data['text'])
+            return jsonify(session.analysis()), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/nlp-sessions/<session_id>/chunks', methods=['POST'])
+def append_nlp_chunk(session_id):
+    """
+    Append a transcript chunk and return the updated analysis.
+    
+    Input: {
+        "text": " patient reports chest pain...",
+        "offset": 1240  (optional, characters already sent; rejects gaps and replays)
+    }
+    """
+    try:
+        data = request.get_json()
+        session = nlp_session_store.get(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found or expired'}), 404
+        
+        with session.lock:
+            offset = data.get('offset')
+            if offset is not None and offset != session.length:
+                return jsonify({
+                    'error': 'Offset does not match session length',
+                    'expected_offset': session.length
+                }), 409
+            session.append(data.get('text', ''))
+            return jsonify(session.analysis())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/nlp-sessions/<session_id>', methods=['GET', 'DELETE'])
+def nlp_session(session_id):
+    """
+    GET: current analysis of a session.
+    DELETE: close the session and return its final analysis.
+    """
+    try:
+        if request.method == 'DELETE':
+            session = nlp_session_store.close(session_id)
+        else:
+            session = nlp_session_store.get(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found or expired'}), 404
+        
+        with session.lock:
+            return jsonify(session.analysis())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/generate-alerts', methods=['POST'])
 def generate_alerts():
     """
@@ -674,6 +547,23 @@ def generate_alerts():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/check-interactions', methods=['POST'])
+def check_interactions():
+    """
+    Check a medication list against the interaction knowledge base.
+    
+    Input: {
+        "medications": ["Warfarin", "Aspirin", "Omeprazole"]
+    }
+    """
+    try:
+        data = request.get_json()
+        interactions = interaction_kb.check(data.get('medications', []))
+        return jsonify({'interactions': interactions, 'count': len(interactions)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/impact-metrics', methods=['POST'])
 def calculate_impact():
     """
@@ -684,10 +574,14 @@ def calculate_impact():
             {"risk_score": 45, "risk_level": "Medium", "diseases": [...], "medications": [...]}
         ]
     }
+    or {"source": "db", "filters": {...}} to read the stored records from MongoDB
     """
     try:
         data = request.get_json()
-        analyses = data.get('analyses', [])
+        if data.get('source') == 'db':
+            analyses = [analysis_summary(a) for a in analysis_store.iter_records(**record_filters(data))]
+        else:
+            analyses = data.get('analyses', [])
         metrics = impact_analytics.calculate_session_metrics(analyses)
         return jsonify(metrics)
     except Exception as e:
@@ -717,29 +611,141 @@ def batch_analyze():
         "transcripts": [
             {"id": "1", "text": "..."},
             {"id": "2", "text": "..."}
-        ]
+        ],
+        "fuzzy": true  (optional)
     }
+    
+    Past the request deadline the remaining transcripts are skipped and
+    the response is marked "partial".
     """
     try:
         data = request.get_json()
         transcripts = data.get('transcripts', [])
         
-        results = []
-        for item in transcripts:
-            nlp_result = nlp_analyzer.analyze_transcript(item.get('text', ''))
-            risk_result = risk_model.predict_risk({
-                'diseases': nlp_result['entities']['diseases'],
-                'medications': nlp_result['entities']['medications'],
-                'symptoms': nlp_result['entities']['symptoms']
-            })
-            
-            results.append({
-                'id': item.get('id'),
-                'nlp': nlp_result,
-                'risk': risk_result
-            })
-        
-        return jsonify({'results': results, 'processed': len(results)})
+        results = batch_analyze_items(transcripts, fuzzy=data.get('fuzzy'), deadline=current_deadline())
+        response = {'results': results, 'processed': len(results)}
+        if len(results) < len(transcripts):
+            response['partial'] = True
+            response['total'] = len(transcripts)
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ============================================
+# BATCH JOBS
+# ============================================
+
+def job_links(job):
+    """Add polling and result URLs to a job status."""
+    job_id = job['job_id']
+    job['links'] = {
+        'status': f'/api/jobs/{job_id}',
+        'results': f'/api/jobs/{job_id}/results',
+        'chunk': f'/api/jobs/{job_id}/results?chunk=0'
+    }
+    return job
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Submit a large batch analysis to run in the background.
+    
+    Input: {
+        "kind": "batch-analyze",  (optional, default)
+        "transcripts": [
+            {"id": "1", "text": "..."},
+            {"id": "2", "text": "..."}
+        ],
+        "fuzzy": true,  (optional)
+        "chunk_size": 100  (optional, results per chunk)
+    }
+    """
+    try:
+        data = request.get_json()
+        job = batch_job_queue.submit(
+            data.get('kind', 'batch-analyze'),
+            data.get('transcripts'),
+            options={'fuzzy': data.get('fuzzy')},
+            chunk_size=data.get('chunk_size')
+        )
+        return jsonify(job_links(job)), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """
+    Recent jobs and job counts by status.
+    """
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({
+            'jobs': [job_links(job) for job in batch_job_queue.list_jobs(limit)],
+            'queue': batch_job_queue.stats()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """
+    GET: job progress.
+    DELETE: cancel the job and remove its stored results.
+    """
+    try:
+        if request.method == 'DELETE':
+            if not batch_job_queue.delete(job_id):
+                return jsonify({'error': 'Job not found'}), 404
+            return jsonify({'job_id': job_id, 'deleted': True})
+        
+        job = batch_job_queue.status(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job_links(job))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """
+    Job results.
+    With ?chunk=N: one chunk as JSON (404 until it is ready).
+    Without: every finished chunk streamed as NDJSON, one result per line.
+    """
+    try:
+        job = batch_job_queue.status(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        chunk = request.args.get('chunk', type=int)
+        if chunk is None:
+            return app.response_class(batch_job_queue.iter_results(job_id), mimetype='application/x-ndjson')
+        
+        results = batch_job_queue.read_chunk(job_id, chunk)
+        if results is None:
+            return jsonify({
+                'error': 'Chunk not ready',
+                'chunks_ready': job['chunks_ready'],
+                'chunk_count': job['chunk_count']
+            }), 404
+        return jsonify({
+            'job_id': job_id,
+            'chunk': chunk,
+            'chunk_count': job['chunk_count'],
+            'status': job['status'],
+            'results': results
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -797,6 +803,8 @@ def trend_analysis():
 def compare_periods():
     """
     Compare metrics between two time periods for impact measurement.
+    Input: {"before": {"risk_scores": [...], "high_risk": [...]}, "after": {...}}
+    or pre-aggregated {"average_risk_score", "high_risk_rate", "total_analyses"}
     """
     try:
         data = request.get_json()
@@ -813,13 +821,47 @@ def compare_periods():
 # ADVANCED ENDPOINTS
 # ============================================
 
-# Import additional modules
-try:
-    from clinical_insights import insights_engine, outcome_predictor, impact_measurement
-    from dashboard_service import dashboard_service, metric_calculator
+ADVANCED_MODULES_LOADED = False
+
+
+def advanced_modules_available():
+    """
+    Check that the advanced modules are usable, importing them on first call.
+    With CLARA_LAZY_IMPORTS enabled this runs on the first request that needs them.
+    """
+    global ADVANCED_MODULES_LOADED
+    global insights_engine, outcome_predictor, impact_measurement
+    global dashboard_service, metric_calculator
+
+    if ADVANCED_MODULES_LOADED:
+        return True
+
+    insights_module = module_loader.load('clinical_insights')
+    dashboard_module = module_loader.load('dashboard_service')
+    if insights_module is None or dashboard_module is None:
+        return False
+
+    insights_engine = insights_module.insights_engine
+    outcome_predictor = insights_module.outcome_predictor
+    impact_measurement = insights_module.impact_measurement
+    dashboard_service = dashboard_module.dashboard_service
+    metric_calculator = dashboard_module.metric_calculator
     ADVANCED_MODULES_LOADED = True
-except ImportError:
-    ADVANCED_MODULES_LOADED = False
+    return True
+
+
+def request_rules():
+    """
+    The active rule set for a request to pin. Importing the advanced modules
+    registers their built-in tables and recompiles the active rule set, so
+    they are loaded before the snapshot is taken.
+    """
+    advanced_modules_available()
+    return model_registry.active
+
+
+# Import additional modules (deferred to first use in lazy mode)
+if not config.LAZY_IMPORTS and not advanced_modules_available():
     print("Warning: Advanced modules not loaded")
 
 
@@ -835,7 +877,7 @@ def get_clinical_insights():
         "symptoms": []
     }
     """
-    if not ADVANCED_MODULES_LOADED:
+    if not advanced_modules_available():
         return jsonify({'error': 'Advanced modules not available'}), 503
     
     try:
@@ -851,12 +893,14 @@ def predict_outcomes():
     """
     Predict clinical outcomes for a patient.
     """
-    if not ADVANCED_MODULES_LOADED:
+    if not advanced_modules_available():
         return jsonify({'error': 'Advanced modules not available'}), 503
     
     try:
         data = request.get_json()
+        started = time.perf_counter()
         predictions = outcome_predictor.predict_outcomes(data)
+        shadow_evaluator.submit('predict-outcomes', data, predictions, time.perf_counter() - started)
         return jsonify(predictions)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -866,8 +910,10 @@ def predict_outcomes():
 def measure_impact():
     """
     Calculate impact between before/after intervention periods.
+    Input: {"before": {"risk_scores": [...], "outcomes": [...]}, "after": {...}}
+    or pre-aggregated metrics; raw data adds bootstrap CIs and p-values
     """
-    if not ADVANCED_MODULES_LOADED:
+    if not advanced_modules_available():
         return jsonify({'error': 'Advanced modules not available'}), 503
     
     try:
@@ -884,17 +930,29 @@ def measure_impact():
 def get_dashboard():
     """
     Get dynamic dashboard data.
+    Concurrent identical requests share one computation.
+    
+    Input: {"records": [...]} or {"source": "db", "filters": {"since": "2026-01-01", "risk_levels": [...]}}
+    to read the stored records from MongoDB (GET ?source=db reads all of them)
     """
-    if not ADVANCED_MODULES_LOADED:
+    if not advanced_modules_available():
         return jsonify({'error': 'Advanced modules not available'}), 503
     
     try:
-        records = []
-        if request.method == 'POST':
-            data = request.get_json()
-            records = data.get('records', [])
+        data = request.get_json() if request.method == 'POST' else {'source': request.args.get('source')}
+        if data.get('source') == 'db':
+            filters = record_filters(data)
+            dashboard_data = single_flight.do(
+                'dashboard-db', filters,
+                lambda: dashboard_service.get_dashboard_data(analysis_store.load_records(**filters))
+            )
+            return jsonify(dashboard_data)
         
-        dashboard_data = dashboard_service.get_dashboard_data(records)
+        records = data.get('records', [])
+        dashboard_data = single_flight.do(
+            'dashboard', records,
+            lambda: dashboard_service.get_dashboard_data(records)
+        )
         return jsonify(dashboard_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -910,7 +968,7 @@ def calculate_metric():
         "data": {"tp": 45, "fp": 10, "tn": 40, "fn": 5}
     }
     """
-    if not ADVANCED_MODULES_LOADED:
+    if not advanced_modules_available():
         return jsonify({'error': 'Advanced modules not available'}), 503
     
     try:
@@ -950,23 +1008,137 @@ def calculate_metric():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/comprehensive-analysis', methods=['POST'])
-def comprehensive_analysis():
+BULK_METRIC_COLUMNS = {
+    'odds_ratio': ('a', 'b', 'c', 'd'),
+    'nnt': ('a', 'b', 'c', 'd'),
+    'sensitivity_specificity': ('tp', 'fp', 'tn', 'fn')
+}
+
+
+@app.route('/api/calculate-metrics/bulk', methods=['POST'])
+def calculate_metrics_bulk():
     """
-    Perform comprehensive analysis combining all features.
+    Calculate a clinical metric for many 2x2 tables in one vectorized pass.
     
     Input: {
-        "transcript": "...",
-        "patient": {"age": 65, "name": "John Doe"}
+        "metric_type": "odds_ratio",
+        "tables": {"a": [12, 0], "b": [88, 50], "c": [20, 3], "d": [80, 47]},
+        "labels": ["clinic-1", "clinic-2"]
     }
+    "tables" may also be a list of per-table objects. Columns are a/b/c/d
+    (exposed events, exposed non-events, control events, control non-events)
+    for odds_ratio and nnt, tp/fp/tn/fn for sensitivity_specificity.
+    Non-finite results (no OR, no risk reduction) are returned as null.
     """
+    if not advanced_modules_available():
+        return jsonify({'error': 'Advanced modules not available'}), 503
+    
     try:
+        import numpy as np
+        
         data = request.get_json()
-        transcript = data.get('transcript', '')
-        patient = data.get('patient', {})
+        metric_type = data.get('metric_type')
+        columns = BULK_METRIC_COLUMNS.get(metric_type)
+        if columns is None:
+            return jsonify({'error': 'Unknown metric type'}), 400
         
+        tables = data.get('tables', {})
+        if isinstance(tables, list):
+            tables = {name: [table.get(name, 0) for table in tables] for name in columns}
+        missing = [name for name in columns if name not in tables]
+        if missing:
+            return jsonify({'error': f"Missing columns: {', '.join(missing)}"}), 400
+        lengths = {len(tables[name]) for name in columns}
+        if len(lengths) != 1:
+            return jsonify({'error': 'Columns must have equal length'}), 400
+        
+        arrays = [tables[name] for name in columns]
+        if metric_type == 'odds_ratio':
+            result = metric_calculator.bulk_odds_ratio(*arrays)
+        elif metric_type == 'nnt':
+            result = metric_calculator.bulk_nnt(*arrays)
+        else:
+            result = metric_calculator.bulk_sensitivity_specificity(*arrays)
+        
+        results = {}
+        for name, values in result.items():
+            if values.dtype == bool:
+                results[name] = values.tolist()
+            else:
+                finite = np.isfinite(values)
+                results[name] = [value if ok else None for value, ok in zip(values.tolist(), finite.tolist())]
+        
+        response = {
+            'metric_type': metric_type,
+            'count': lengths.pop(),
+            'results': results
+        }
+        if 'labels' in data:
+            response['labels'] = data['labels']
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/evaluate-model', methods=['POST'])
+def evaluate_model():
+    """
+    ROC, precision-recall and calibration evaluation of scores against labeled outcomes.
+    
+    Input: {
+        "model": "risk",
+        "scores": [72, 35, 18],
+        "labels": [1, 0, 0],
+        "thresholds": [25, 50, 75]
+    }
+    "model" is "risk" (predict_risk scores 0-100) or "outcome" (probabilities 0-1);
+    thresholds default to that model's level cutoffs.
+    """
+    try:
+        data = request.get_json()
+        report = model_evaluator.evaluate(
+            data.get('scores', []),
+            data.get('labels', []),
+            model=data.get('model', 'risk'),
+            thresholds=data.get('thresholds')
+        )
+        return jsonify(report)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def run_comprehensive_analysis(data, rules, deadline=None):
+    """
+    NLP, risk, alerts, insights and outcomes for one transcript, all on one model version.
+    Stages not started before `deadline` are left as None and the result is marked "partial".
+    """
+    deadline = deadline or Deadline()
+    transcript = data.get('transcript', '')
+    patient = data.get('patient', {})
+    
+    comprehensive_result = {
+        'patient': patient,
+        'nlp_analysis': None,
+        'risk_prediction': None,
+        'alerts': None,
+        'clinical_insights': None,
+        'outcome_predictions': None,
+        'analysis_timestamp': None,
+        'model_versions': {
+            'nlp': '2.0.0',
+            'risk_model': None,
+            'clinical_rules': rules.version,
+            'insights': None
+        }
+    }
+    
+    try:
         # 1. NLP Analysis
-        nlp_result = nlp_analyzer.analyze_transcript(transcript)
+        deadline.check('nlp_analysis')
+        nlp_result = analyze_transcripts([transcript], fuzzy=data.get('fuzzy'))[0]
+        comprehensive_result['nlp_analysis'] = nlp_result
         
         # 2. Prepare patient data
         patient_data = {
@@ -977,45 +1149,366 @@ def comprehensive_analysis():
         }
         
         # 3. Risk Prediction
-        risk_result = risk_model.predict_risk(patient_data)
+        deadline.check('risk_prediction')
+        risk_result = risk_model.predict_risk(patient_data, rules=rules)
+        comprehensive_result['risk_prediction'] = risk_result
+        comprehensive_result['model_versions']['risk_model'] = risk_result['model_version']
         
         # 4. Generate Alerts
+        deadline.check('alerts')
         alert_data = {
             'risk_score': risk_result['score'],
             'diseases': patient_data['diseases'],
             'medications': patient_data['medications']
         }
-        alerts = alert_system.generate_alerts(alert_data)
+        comprehensive_result['alerts'] = alert_system.generate_alerts(alert_data)
         
         # 5. Clinical Insights (if available)
-        insights = None
-        outcomes = None
-        if ADVANCED_MODULES_LOADED:
-            insights = insights_engine.generate_insights(patient_data)
-            outcomes = outcome_predictor.predict_outcomes(patient_data)
-        
-        # Combine all results
-        comprehensive_result = {
-            'patient': patient,
-            'nlp_analysis': nlp_result,
-            'risk_prediction': risk_result,
-            'alerts': alerts,
-            'clinical_insights': insights,
-            'outcome_predictions': outcomes,
-            'analysis_timestamp': datetime.now().isoformat(),
-            'model_versions': {
-                'nlp': '2.0.0',
-                'risk_model': '2.0.0',
-                'insights': '2.0.0' if insights else None
-            }
-        }
+        if advanced_modules_available():
+            deadline.check('clinical_insights')
+            insights = insights_engine.generate_insights(patient_data, rules=rules)
+            comprehensive_result['clinical_insights'] = insights
+            comprehensive_result['model_versions']['insights'] = rules.version
+            
+            deadline.check('outcome_predictions')
+            comprehensive_result['outcome_predictions'] = outcome_predictor.predict_outcomes(patient_data, rules=rules)
+    except DeadlineExceeded as e:
+        comprehensive_result['partial'] = True
+        comprehensive_result['stopped_before'] = e.stage
+    
+    comprehensive_result['analysis_timestamp'] = datetime.now().isoformat()
+    if config.COHORT_RECORD_ANALYSES:
+        record = analysis_record(comprehensive_result)
+        if record is not None:
+            cohort_engine.add(record)
+    return comprehensive_result
+
+
+@app.route('/api/comprehensive-analysis', methods=['POST'])
+def comprehensive_analysis():
+    """
+    Perform comprehensive analysis combining all features.
+    Concurrent identical requests share one computation.
+    
+    Input: {
+        "transcript": "...",
+        "patient": {"age": 65, "name": "John Doe"},
+        "fuzzy": true  (optional)
+    }
+    """
+    try:
+        data = request.get_json()
         
+        # Pin one model version for every stage of this analysis
+        rules = request_rules()
+        deadline = current_deadline()
+        # A result the leader's deadline cut short is not shared; followers
+        # wait at most until their own deadline
+        comprehensive_result = single_flight.do(
+            'comprehensive-analysis', [rules.version, rules.generation, data],
+            lambda: run_comprehensive_analysis(data, rules, deadline),
+            shareable=lambda result: not result.get('partial'),
+            timeout=deadline.remaining()
+        )
         return jsonify(comprehensive_result)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# ============================================
+# COHORTS
+# ============================================
+
+@app.route('/api/cohorts/records', methods=['POST'])
+def add_cohort_records():
+    """
+    Index analysis records for cohort queries. Comprehensive analyses are only indexed
+    automatically with CLARA_COHORT_RECORD_ANALYSES enabled (default: off).
+    
+    Input: {
+        "records": [
+            {"age": 68, "diseases": [...], "medications": [...], "symptoms": [...],
+             "risk_score": 62, "risk_level": "High", "date": "2026-03-14"}
+        ]
+    }
+    or {"source": "db", "filters": {...}} to index the stored records from MongoDB
+    
+    A malformed record is rejected with 400. A posted batch is indexed all or
+    nothing; with source=db, "added" counts the records indexed before it.
+    """
+    added = 0
+    try:
+        data = request.get_json()
+        if data.get('source') != 'db':
+            ids = cohort_engine.add_many(data.get('records', []))
+            return jsonify({'added': len(ids), 'total_records': cohort_engine.size})
+        
+        batch = []
+        for analysis in analysis_store.iter_records(**record_filters(data)):
+            batch.append(analysis_summary(analysis))
+            if len(batch) == config.MONGO_BATCH_SIZE:
+                added += len(cohort_engine.add_many(batch))
+                batch = []
+        added += len(cohort_engine.add_many(batch))
+        return jsonify({'added': added, 'total_records': cohort_engine.size})
+    except ValueError as e:
+        return jsonify({'error': str(e), 'added': added, 'total_records': cohort_engine.size}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/cohorts/query', methods=['POST'])
+def query_cohort():
+    """
+    Count, mean risk, risk distribution and top entities for a cohort.
+    
+    Input: {
+        "age": {"min": 61, "max": 75},
+        "conditions": {"all": ["diabetes", "hypertension"]},
+        "risk_levels": ["High", "Critical"],
+        "days": {"last": 30}
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(cohort_engine.query(data))
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': f'Invalid cohort query: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ============================================
+# PATIENT STATE
+# ============================================
+
+@app.route('/api/patients/<patient_id>/encounters', methods=['POST'])
+def record_encounter(patient_id):
+    """
+    Apply one encounter's changes to a patient's state and return the updated
+    risk, outcomes and alerts. Only what changed since the last encounter is sent.
+    
+    Input: {
+        "age": 68  (optional),
+        "diseases": ["Chronic kidney disease"],
+        "medications": ["Lisinopril"],
+        "symptoms": ["Dizziness"],
+        "remove": {"medications": ["Ibuprofen"]}  (optional, resolved items),
+        "include_insights": false  (optional, full insights on the accumulated profile)
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        rules = request_rules()
+        predictor = outcome_predictor if ADVANCED_MODULES_LOADED else None
+        state = patient_state_store.get_or_create(patient_id)
+        with state.lock:
+            changed = patient_state_store.record_encounter(state, data, outcome_predictor=predictor, rules=rules)
+            result = state.snapshot()
+            result['changed'] = changed
+            if data.get('include_insights') and predictor is not None:
+                result['insights'] = insights_engine.generate_insights(
+                    state.patient_data(), rules=rules, profile=state.condition_profile()
+                )
+        return jsonify(result)
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': f'Invalid encounter: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/patients/<patient_id>/state', methods=['GET', 'DELETE'])
+def patient_state(patient_id):
+    """
+    GET: a patient's accumulated profile and last results.
+    DELETE: drop the state and return it.
+    """
+    try:
+        if request.method == 'DELETE':
+            state = patient_state_store.close(patient_id)
+        else:
+            state = patient_state_store.get(patient_id)
+        if state is None:
+            return jsonify({'error': 'Patient state not found or expired'}), 404
+        
+        with state.lock:
+            return jsonify(state.snapshot())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ============================================
+# MULTIPLEXED RPC
+# ============================================
+
+def require_advanced_modules():
+    if not advanced_modules_available():
+        raise RpcError('Advanced modules not available', 503)
+
+
+def rpc_predict_risk(params, context):
+    started = time.perf_counter()
+    prediction = risk_model.predict_risk(context.patient(params), rules=context.rules)
+    shadow_evaluator.submit('predict-risk', params, prediction, time.perf_counter() - started)
+    return prediction
+
+
+def rpc_analyze_nlp(params, context):
+    transcript = params.get('transcript', '')
+    if not transcript:
+        raise RpcError('Transcript required')
+    return analyze_transcripts([transcript], fuzzy=params.get('fuzzy'))[0]
+
+
+def rpc_generate_alerts(params, context):
+    alerts = alert_system.generate_alerts(params)
+    return {'alerts': alerts, 'count': len(alerts)}
+
+
+def rpc_check_interactions(params, context):
+    interactions = interaction_kb.check(params.get('medications', []))
+    return {'interactions': interactions, 'count': len(interactions)}
+
+
+def rpc_clinical_insights(params, context):
+    require_advanced_modules()
+    return insights_engine.generate_insights(context.patient(params), rules=context.rules)
+
+
+def rpc_predict_outcomes(params, context):
+    require_advanced_modules()
+    started = time.perf_counter()
+    predictions = outcome_predictor.predict_outcomes(context.patient(params), rules=context.rules)
+    shadow_evaluator.submit('predict-outcomes', params, predictions, time.perf_counter() - started)
+    return predictions
+
+
+rpc_dispatcher.register('analyze-nlp', rpc_analyze_nlp)
+rpc_dispatcher.register('predict-risk', rpc_predict_risk, patient_params=True)
+rpc_dispatcher.register('generate-alerts', rpc_generate_alerts, patient_params=True)
+rpc_dispatcher.register('check-interactions', rpc_check_interactions, patient_params=True)
+rpc_dispatcher.register('clinical-insights', rpc_clinical_insights, patient_params=True)
+rpc_dispatcher.register('predict-outcomes', rpc_predict_outcomes, patient_params=True)
+
+
+@app.route('/api/rpc', methods=['POST'])
+def rpc():
+    """
+    Run several operations in one round trip; see rpc.py for references.
+    
+    Input: {
+        "patient": {"age": 65, "diseases": ["Diabetes"], "medications": ["Metformin"]},  (optional)
+        "operations": [
+            {"id": "risk", "method": "predict-risk"},
+            {"id": "alerts", "method": "generate-alerts",
+             "params": {"$ref": "$patient", "risk_score": {"$ref": "risk.score"}}}
+        ]
+    }
+    """
+    try:
+        data = request.get_json()
+        # Pin one model version for every operation of this call
+        context = RpcContext(
+            request_rules(), risk_model._normalize_patient, data.get('patient'),
+            deadline=current_deadline()
+        )
+        results = rpc_dispatcher.execute(data.get('operations'), context)
+        response = {
+            'results': results,
+            'count': len(results),
+            'failed': sum(1 for result in results if result['status'] != 200),
+            'model_version': context.rules.version
+        }
+        if any(result['status'] == 504 for result in results):
+            response['partial'] = True
+        return jsonify(response)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'methods': rpc_dispatcher.methods}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/models', methods=['GET'])
+def get_models():
+    """
+    Active model version and the versions available in the registry.
+    """
+    return jsonify(model_registry.status())
+
+
+@app.route('/api/models/activate', methods=['POST'])
+def activate_model():
+    """
+    Hot-swap the active model version for every worker.
+    
+    Input: {
+        "version": "2.1.0"
+    }
+    """
+    try:
+        data = request.get_json()
+        version = data.get('version')
+        if not version:
+            return jsonify({'error': 'Version required'}), 400
+        
+        compiled = model_registry.activate(version)
+        return jsonify({'active': compiled.describe()})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/shadow/summary', methods=['GET'])
+def shadow_summary():
+    """
+    Score differences and latency of candidate vs primary models.
+    """
+    try:
+        return jsonify(shadow_evaluator.summary())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Runtime counters: request coalescing, admission control, the cohort index,
+    MongoDB access, patient state and the insights/outcomes signature memo.
+    """
+    try:
+        signature_memo = None
+        if ADVANCED_MODULES_LOADED:
+            signature_memo = {
+                'insights': insights_engine.memo.stats(),
+                'outcomes': outcome_predictor.memo.stats()
+            }
+        return jsonify({
+            'single_flight': single_flight.stats(),
+            'admission': admission_controller.stats(),
+            'cohorts': cohort_engine.stats(),
+            'data_access': analysis_store.stats(),
+            'patient_state': patient_state_store.status(),
+            'signature_memo': signature_memo,
+            'generated_at': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/startup-report', methods=['GET'])
+def startup_report():
+    """
+    Report app import time, deferred module imports and loaded heavy dependencies.
+    """
+    return jsonify(module_loader.report())
+
+
+model_registry.start_watcher(config.MODEL_WATCH_INTERVAL)
+module_loader.mark_ready()
+
+
 # ============================================
 # MAIN
 # ============================================
@@ -1023,7 +1516,7 @@ def comprehensive_analysis():
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"🐍 CLARA Python Analytics Service starting on port {port}...")
-    print(f"   Advanced modules loaded: {ADVANCED_MODULES_LOADED}")
+    print(f"   Advanced modules loaded: {'deferred' if config.LAZY_IMPORTS else ADVANCED_MODULES_LOADED}")
     print(f"   Available endpoints:")
     print(f"   - POST /api/predict-risk")
     print(f"   - POST /api/analyze-nlp")
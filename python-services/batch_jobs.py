@@ -0,0 +1,403 @@
+"""
+CLARA Batch Jobs
+================
+Asynchronous processing for very large batch analyses. Submitting a job
+writes its input to local disk and returns a job ID at once; background
+worker threads process the input in fixed-size chunks and write each
+chunk's results to its own NDJSON file, so memory stays bounded by one
+chunk and finished results survive a restart.
+
+Job state lives in SQLite, which doubles as the work queue. Workers claim a
+job with a lease that is renewed after every chunk and, in the background,
+while a chunk runs (a chunk may wait a long time for an admission slot under
+interactive load); jobs whose lease expires,
+or whose worker process on this host has exited, are picked up again and
+resume at the first unfinished chunk.
+
+Layout under CLARA_JOBS_DIR:
+    <job_id>/input.ndjson           one input item per line
+    <job_id>/chunk-000000.ndjson    one result per line, in input order
+"""
+
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import uuid
+
+import config
+
+
+class BatchJobQueue:
+    """
+    Persistent job queue with background workers.
+    Job kinds are registered with the function that processes one chunk.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            options TEXT,
+            total INTEGER NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            chunks_done INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            item_errors INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            claimed_by TEXT,
+            lease_expires_at TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """
+
+    def __init__(self, db_path, jobs_dir, workers=1, chunk_size=100, max_items=100000,
+                 lease_seconds=60, retention_hours=168, poll_seconds=5):
+        self.db_path = db_path
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_items = max_items
+        self.lease_seconds = lease_seconds
+        self.retention_hours = retention_hours
+        self.poll_seconds = poll_seconds
+        self._kinds = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._schema_ready = False
+        self._owner = f'{socket.gethostname()}:{os.getpid()}'
+
+    def register_kind(self, kind, process_chunk):
+        """
+        Register a job kind.
+
+        Args:
+            process_chunk: callable(items, options) -> list of results, one per item.
+                A result dict with an 'error' key counts as a failed item.
+        """
+        self._kinds[kind] = process_chunk
+
+    @property
+    def kinds(self):
+        return sorted(self._kinds)
+
+    def submit(self, kind, items, options=None, chunk_size=None):
+        """
+        Persist a job and wake a worker.
+
+        Returns:
+            dict: job status
+        """
+        if kind not in self._kinds:
+            raise ValueError(f"Unknown job kind '{kind}' (available: {', '.join(self.kinds)})")
+        if not isinstance(items, list) or not items:
+            raise ValueError('At least one item is required')
+        if len(items) > self.max_items:
+            raise ValueError(f'Too many items: {len(items)} (maximum {self.max_items})')
+        chunk_size = max(1, min(int(chunk_size or self.chunk_size), len(items)))
+
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        input_path = os.path.join(job_dir, 'input.ndjson')
+        with open(f'{input_path}.tmp', 'w', encoding='utf-8') as f:
+            for item in items:
+                f.write(json.dumps(item, separators=(',', ':')))
+                f.write('\n')
+        os.replace(f'{input_path}.tmp', input_path)
+
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO jobs (id, kind, status, options, total, chunk_size, created_at)
+                VALUES (?, ?, 'queued', ?, ?, ?, ?)
+            """, (job_id, kind, json.dumps(options or {}), len(items), chunk_size,
+                  datetime.now().isoformat()))
+
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.status(job_id)
+
+    def status(self, job_id):
+        """Job progress, or None for an unknown job."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        chunk_count = -(-row['total'] // row['chunk_size'])
+        return {
+            'job_id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'total': row['total'],
+            'processed': row['processed'],
+            'percent': round(row['processed'] / row['total'] * 100, 1),
+            'item_errors': row['item_errors'],
+            'chunk_size': row['chunk_size'],
+            'chunk_count': chunk_count,
+            'chunks_ready': row['chunks_done'],
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at']
+        }
+
+    def list_jobs(self, limit=50):
+        """Most recent jobs first."""
+        with self._connect() as conn:
+            ids = [row['id'] for row in conn.execute(
+                'SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)
+            )]
+        return [job for job in (self.status(job_id) for job_id in ids) if job is not None]
+
+    def read_chunk(self, job_id, chunk):
+        """
+        Results of one finished chunk.
+
+        Returns:
+            list of results, or None when the chunk is not ready
+        """
+        job = self.status(job_id)
+        if job is None or not 0 <= chunk < job['chunks_ready']:
+            return None
+        with open(self._chunk_path(job_id, chunk), 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def iter_results(self, job_id):
+        """Yield NDJSON lines of every finished chunk, reading one chunk at a time."""
+        job = self.status(job_id)
+        for chunk in range(job['chunks_ready'] if job else 0):
+            with open(self._chunk_path(job_id, chunk), 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield line
+
+    def delete(self, job_id):
+        """Cancel (if active) and remove a job and its files."""
+        with self._connect() as conn:
+            deleted = conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,)).rowcount
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return bool(deleted)
+
+    def resume(self):
+        """Start workers if unfinished jobs were left by a previous process."""
+        with self._connect() as conn:
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+        if pending:
+            self.start()
+        return pending
+
+    def start(self):
+        """Start the worker threads (once)."""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(max(1, self.workers)):
+                thread = threading.Thread(target=self._run, name=f'batch-job-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stats(self):
+        """Job counts by status."""
+        with self._connect() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return {
+            'workers': len(self._threads),
+            'kinds': self.kinds,
+            'jobs': counts,
+            'generated_at': datetime.now().isoformat()
+        }
+
+    def _run(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Warning: batch job queue unavailable: {e}")
+                job = None
+            if job is None:
+                self._prune()
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_seconds)
+                continue
+            try:
+                with self._lease_kept(job['id']):
+                    self._process(job)
+            except Exception as e:
+                self._finish(job['id'], 'failed', str(e))
+
+    def _claim(self):
+        """Take the oldest queued job, or a running job whose worker is gone."""
+        now = datetime.now()
+        with self._connect() as conn:
+            active = conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+            for row in active:
+                if row['status'] == 'running' and not self._abandoned(row, now):
+                    continue
+                claimed = conn.execute("""
+                    UPDATE jobs SET status = 'running', claimed_by = ?, lease_expires_at = ?,
+                                    started_at = COALESCE(started_at, ?)
+                    WHERE id = ? AND status = ? AND COALESCE(lease_expires_at, '') = ?
+                """, (self._owner, self._lease_until(), now.isoformat(), row['id'],
+                      row['status'], row['lease_expires_at'] or '')).rowcount
+                if claimed:
+                    return dict(row)
+        return None
+
+    def _abandoned(self, row, now):
+        """Lease expired, or held by a process on this host that no longer exists."""
+        if not row['lease_expires_at'] or row['lease_expires_at'] < now.isoformat():
+            return True
+        host, _, pid = (row['claimed_by'] or '').rpartition(':')
+        if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def _process(self, job):
+        job_id = job['id']
+        process_chunk = self._kinds.get(job['kind'])
+        if process_chunk is None:
+            self._finish(job_id, 'failed', f"Unknown job kind '{job['kind']}'")
+            return
+
+        options = json.loads(job['options'] or '{}')
+        chunk_size = job['chunk_size']
+        chunk = job['chunks_done']
+        with open(os.path.join(self._job_dir(job_id), 'input.ndjson'), 'r', encoding='utf-8') as f:
+            lines = islice(f, chunk * chunk_size, None)
+            while True:
+                items = [json.loads(line) for line in islice(lines, chunk_size)]
+                if not items:
+                    break
+                results = process_chunk(items, options)
+                if len(results) != len(items):
+                    raise RuntimeError(f'Chunk {chunk} returned {len(results)} results for {len(items)} items')
+
+                path = self._chunk_path(job_id, chunk)
+                with open(f'{path}.tmp', 'w', encoding='utf-8') as out:
+                    for result in results:
+                        out.write(json.dumps(result, separators=(',', ':'), default=str))
+                        out.write('\n')
+                os.replace(f'{path}.tmp', path)
+
+                item_errors = sum(1 for r in results if isinstance(r, dict) and 'error' in r)
+                if not self._record_chunk(job_id, len(items), item_errors):
+                    # Deleted, or the lease was lost to another worker
+                    return
+                chunk += 1
+        self._finish(job_id, 'completed')
+
+    @contextmanager
+    def _lease_kept(self, job_id):
+        """Renew the job's lease every third of its length until the block exits."""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    if not self._renew_lease(job_id):
+                        # Deleted, finished or taken over; the chunk loop notices on its own
+                        return
+                except sqlite3.Error as e:
+                    print(f"Warning: could not renew lease of batch job {job_id}: {e}")
+
+        thread = threading.Thread(target=renew, name=f'batch-lease-{job_id}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _renew_lease(self, job_id):
+        with self._connect() as conn:
+            return conn.execute("""
+                UPDATE jobs SET lease_expires_at = ?
+                WHERE id = ? AND status = 'running' AND claimed_by = ?
+            """, (self._lease_until(), job_id, self._owner)).rowcount > 0
+
+    def _record_chunk(self, job_id, count, item_errors):
+        with self._connect() as conn:
+            return conn.execute("""
+                UPDATE jobs SET chunks_done = chunks_done + 1, processed = processed + ?,
+                                item_errors = item_errors + ?, lease_expires_at = ?
+                WHERE id = ? AND status = 'running' AND claimed_by = ?
+            """, (count, item_errors, self._lease_until(), job_id, self._owner)).rowcount > 0
+
+    def _finish(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL
+                WHERE id = ? AND claimed_by = ?
+            """, (status, error, datetime.now().isoformat(), job_id, self._owner))
+
+    def _prune(self):
+        """Remove finished jobs past the retention period."""
+        if self.retention_hours <= 0:
+            return
+        cutoff = (datetime.now() - timedelta(hours=self.retention_hours)).isoformat()
+        with self._connect() as conn:
+            expired = [row['id'] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?",
+                (cutoff,)
+            )]
+        for job_id in expired:
+            self.delete(job_id)
+
+    def _lease_until(self):
+        return (datetime.now() + timedelta(seconds=self.lease_seconds)).isoformat()
+
+    def _job_dir(self, job_id):
+        if not job_id.isalnum():
+            raise ValueError('Invalid job ID')
+        return os.path.join(self.jobs_dir, job_id)
+
+    def _chunk_path(self, job_id, chunk):
+        return os.path.join(self._job_dir(job_id), f'chunk-{chunk:06d}.ndjson')
+
+    def _connect(self):
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    directory = os.path.dirname(self.db_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with sqlite3.connect(self.db_path) as conn:
+                        conn.execute('PRAGMA journal_mode=WAL')
+                        conn.execute(self.SCHEMA)
+                    self._schema_ready = True
+        # Autocommit; closed when the with-block exits
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)
+
+
+# Export for use in main app
+batch_job_queue = BatchJobQueue(
+    config.JOBS_DB_PATH,
+    config.JOBS_DIR,
+    workers=config.JOB_WORKERS,
+    chunk_size=config.JOB_CHUNK_SIZE,
+    max_items=config.JOB_MAX_ITEMS,
+    retention_hours=config.JOB_RETENTION_HOURS
+)
@@ -6,8 +6,141 @@ Advanced analytics and predictive insights for clinical decision support.
 
 from datetime import datetime, timedelta
 import json
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import random
+import threading
+
+import config
+from model_registry import model_registry
+from icd10_index import icd10_index
+from alert_rules import clinical_alert_rules
+from significance import bootstrap_tester, period_summary
+
+
+def condition_profile(diseases, rules):
+    """
+    Resolve disease mentions to ICD-10-CM codes and the condition groups they
+    fall under in the code hierarchy. Mentions without a code fall back to
+    matching the group name.
+    
+    Returns:
+        list: (disease, code or None, frozenset of groups) per mention
+    """
+    profile = []
+    for disease in diseases:
+        code = icd10_index.code_for(disease)
+        if code is not None:
+            groups = rules.condition_groups(code)
+        else:
+            disease_lower = disease.lower()
+            groups = frozenset(
+                group for group, _ in rules.condition_codes
+                if group in disease_lower or group.replace('_', ' ') in disease_lower
+            )
+        profile.append((disease, code, groups))
+    return profile
+
+
+# Age cutoffs used by the insights rules (screening, vaccination, advanced age)
+INSIGHT_AGE_THRESHOLDS = (50, 65)
+
+# Disease-name keywords -> monitoring tests they add
+MONITORING_TESTS = (
+    (('diabetes',), ('HbA1c', 'Fasting glucose', 'Kidney function')),
+    (('heart', 'cardiac'), ('ECG', 'Lipid panel', 'Cardiac enzymes')),
+    (('hypertension', 'blood pressure'), ('Renal function', 'Electrolytes'))
+)
+
+SIGNATURE_FIELDS = ('age', 'diseases', 'medications', 'symptoms')
+
+
+def feature_signature(patient_data, profile, rules):
+    """
+    The few features the patient-independent parts of generate_insights and
+    predict_outcomes depend on: rule set generation (a version recompiled
+    from a changed artifact is a new generation), age cutoffs crossed, guideline
+    matches in diagnosis order, condition groups, outcome factors matched by
+    name, monitoring keywords, condition count band (capped at 3),
+    polypharmacy and which fields are filled in. Patients with equal
+    signatures get identical recommendations, monitoring plans, clinical
+    alerts, comorbidity risks and outcome probabilities.
+    """
+    age = patient_data.get('age', 0)
+    diseases = [d.lower() for d in patient_data.get('diseases', [])]
+    groups = frozenset().union(*(g for _, _, g in profile))
+    return (
+        rules.generation,
+        tuple(age >= threshold for threshold in INSIGHT_AGE_THRESHOLDS + rules.outcome_age_thresholds),
+        tuple(key for key in (_guideline_key(g, rules) for _, _, g in profile) if key),
+        groups,
+        frozenset(
+            factor for factor in rules.outcome_condition_factors
+            if factor in groups or any(factor in d for d in diseases)
+        ),
+        tuple(
+            any(keyword in d for d in diseases for keyword in keywords)
+            for keywords, _ in MONITORING_TESTS
+        ),
+        min(len(diseases), 3),
+        len(patient_data.get('medications', [])) >= 5,
+        tuple(bool(patient_data.get(field)) for field in SIGNATURE_FIELDS)
+    )
+
+
+def _guideline_key(groups, rules):
+    """First guideline a diagnosis's condition groups match, or None."""
+    for guideline_key, _, _ in rules.guidelines:
+        if guideline_key in groups:
+            return guideline_key
+    return None
+
+
+class SignatureMemo:
+    """
+    Bounded LRU table of results keyed by feature signature. Cached results
+    are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def get(self, signature, compute):
+        """Cached result for `signature`, calling compute() on a miss."""
+        if self.max_entries > 0:
+            with self._lock:
+                value = self._entries.get(signature)
+                if value is not None:
+                    self._entries.move_to_end(signature)
+                    self._stats['hits'] += 1
+                    return value
+        
+        value = compute()
+        with self._lock:
+            self._stats['misses'] += 1
+            if self.max_entries > 0:
+                self._entries[signature] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else None
+            }
+
 
 class ClinicalInsightsEngine:
     """
@@ -42,26 +175,94 @@ class ClinicalInsightsEngine:
         ('diabetes', 'hypertension', 'heart_disease'): 3.0
     }
     
-    def generate_insights(self, patient_data):
+    # Condition groups by ICD-10-CM code prefix
+    CONDITION_CODES = {
+        'diabetes': ['E08', 'E09', 'E10', 'E11', 'E13', 'O24'],
+        'hypertension': ['I10', 'I11', 'I12', 'I13', 'I15', 'I16'],
+        'heart_disease': [
+            'I05', 'I06', 'I07', 'I08', 'I09', 'I11', 'I13', 'I20', 'I21', 'I22',
+            'I23', 'I24', 'I25', 'I3', 'I40', 'I41', 'I42', 'I43', 'I44', 'I45',
+            'I46', 'I47', 'I48', 'I49', 'I50', 'I51', 'I52'
+        ],
+        'heart_failure': ['I50', 'I11.0', 'I13.0', 'I13.2'],
+        'kidney_disease': ['N18', 'N19', 'I12', 'I13', 'E10.2', 'E11.2', 'E13.2'],
+        'copd': ['J43', 'J44']
+    }
+    
+    # Condition severity by ICD-10-CM code prefix (most specific prefix wins)
+    CODE_SEVERITY = {
+        'I10': 15,
+        'I11': 25,
+        'I11.0': 40,
+        'I12': 30,
+        'I13': 40,
+        'E10': 25,
+        'E11': 20,
+        'E11.2': 30,
+        'I20': 30,
+        'I21': 45,
+        'I22': 45,
+        'I25': 35,
+        'I48': 25,
+        'I50': 40,
+        'I63': 40,
+        'J12': 20,
+        'J13': 20,
+        'J15': 20,
+        'J18': 20,
+        'J43': 25,
+        'J44': 25,
+        'J45': 15,
+        'N18': 30,
+        'N18.5': 40,
+        'N18.6': 45,
+        'C': 50
+    }
+    
+    def __init__(self, memo_size=4096):
+        self.memo = SignatureMemo(memo_size)
+    
+    def generate_insights(self, patient_data, rules=None, profile=None):
         """
         Generate comprehensive clinical insights.
+        `rules` pins a registry version; defaults to the active one.
+        `profile` is the diseases' condition_profile when already resolved.
         
         Returns:
             dict: Insights including recommendations, risks, and monitoring plans
         """
+        rules = rules or model_registry.active
+        if profile is None:
+            profile = condition_profile(patient_data.get('diseases', []), rules)
+        # Patient-independent parts are shared by every patient with the same signature
+        shared = self.memo.get(
+            feature_signature(patient_data, profile, rules),
+            lambda: self._signature_insights(patient_data, profile, rules)
+        )
         insights = {
-            'patient_summary': self._create_patient_summary(patient_data),
-            'risk_factors': self._identify_risk_factors(patient_data),
-            'recommendations': self._generate_recommendations(patient_data),
-            'monitoring_plan': self._create_monitoring_plan(patient_data),
-            'alerts': self._generate_clinical_alerts(patient_data),
+            'patient_summary': self._create_patient_summary(patient_data, profile, rules),
+            'risk_factors': self._identify_risk_factors(patient_data, profile, rules, shared['comorbidity_risks']),
+            'recommendations': shared['recommendations'],
+            'monitoring_plan': shared['monitoring_plan'],
+            'alerts': shared['alerts'],
             'quality_metrics': self._calculate_quality_metrics(patient_data),
+            'model_version': rules.version,
             'generated_at': datetime.now().isoformat()
         }
         
         return insights
     
-    def _create_patient_summary(self, data):
+    def _signature_insights(self, data, profile, rules):
+        """The parts of the insights determined by the feature signature."""
+        groups = frozenset().union(*(g for _, _, g in profile))
+        return {
+            'comorbidity_risks': self._comorbidity_risks(groups, rules),
+            'recommendations': self._generate_recommendations(profile, rules),
+            'monitoring_plan': self._create_monitoring_plan(data),
+            'alerts': self._generate_clinical_alerts(data)
+        }
+    
+    def _create_patient_summary(self, data, profile, rules):
         """Create concise patient summary."""
         diseases = data.get('diseases', [])
         medications = data.get('medications', [])
@@ -78,12 +279,21 @@ class ClinicalInsightsEngine:
             'condition_count': len(diseases),
             'medication_count': len(medications),
             'complexity_level': complexity,
-            'primary_conditions': diseases[:3] if diseases else ['None reported']
+            'primary_conditions': diseases[:3] if diseases else ['None reported'],
+            'coded_conditions': [
+                {
+                    'condition': disease,
+                    'icd10_code': code,
+                    'severity': rules.severity_for_code(code)
+                }
+                for disease, code, _ in profile if code is not None
+            ]
         }
     
-    def _identify_risk_factors(self, data):
+    def _identify_risk_factors(self, data, profile, rules, comorbidity_risks=None):
         """Identify and categorize risk factors."""
-        diseases = [d.lower() for d in data.get('diseases', [])]
+        if comorbidity_risks is None:
+            comorbidity_risks = self._comorbidity_risks(frozenset().union(*(g for _, _, g in profile)), rules)
         age = data.get('age', 0)
         
         risk_factors = []
@@ -97,17 +307,22 @@ class ClinicalInsightsEngine:
                 'description': f'Patient age ({age}) increases risk for complications'
             })
         
-        # Comorbidity risks
-        for combo, multiplier in self.COMORBIDITY_RISKS.items():
-            if all(any(c in d for d in diseases) for c in combo):
+        # High-severity conditions (ICD-10-CM hierarchy)
+        for disease, code, _ in profile:
+            severity = rules.severity_for_code(code) if code else None
+            if severity is not None and severity >= 40:
                 risk_factors.append({
-                    'factor': f'Comorbidity: {" + ".join(combo)}',
+                    'factor': f'Condition: {disease}',
                     'category': 'Clinical',
-                    'impact': 'High' if multiplier >= 2 else 'Moderate',
-                    'risk_multiplier': multiplier,
-                    'description': f'Combined conditions increase overall risk by {multiplier}x'
+                    'impact': 'High',
+                    'icd10_code': code,
+                    'severity': severity,
+                    'description': f'{disease} ({code}) is a high-severity condition'
                 })
         
+        # Comorbidity risks
+        risk_factors.extend(comorbidity_risks)
+        
         # Medication risks
         meds = [m.lower() for m in data.get('medications', [])]
         if len(meds) >= 5:
@@ -120,16 +335,29 @@ class ClinicalInsightsEngine:
         
         return risk_factors
     
-    def _generate_recommendations(self, data):
+    def _comorbidity_risks(self, groups, rules):
+        """Risk factors for condition combinations present in `groups`."""
+        return [
+            {
+                'factor': f'Comorbidity: {label}',
+                'category': 'Clinical',
+                'impact': 'High' if multiplier >= 2 else 'Moderate',
+                'risk_multiplier': multiplier,
+                'description': f'Combined conditions increase overall risk by {multiplier}x'
+            }
+            for combo, multiplier, label in rules.comorbidity_risks
+            if all(c in groups for c in combo)
+        ]
+    
+    def _generate_recommendations(self, profile, rules):
         """Generate evidence-based recommendations."""
-        diseases = [d.lower() for d in data.get('diseases', [])]
         recommendations = []
         
-        for disease in diseases:
-            for guideline_key, guideline in self.GUIDELINES.items():
-                if guideline_key in disease:
+        for _, _, groups in profile:
+            for guideline_key, condition_label, guideline in rules.guidelines:
+                if guideline_key in groups:
                     recommendations.append({
-                        'condition': guideline_key.replace('_', ' ').title(),
+                        'condition': condition_label,
                         'monitoring': guideline['monitoring'],
                         'targets': guideline['targets'],
                         'lifestyle': guideline['lifestyle'],
@@ -161,14 +389,9 @@ class ClinicalInsightsEngine:
         }
         
         # Add disease-specific tests
-        if any('diabetes' in d for d in diseases):
-            plan['tests'].extend(['HbA1c', 'Fasting glucose', 'Kidney function'])
-        
-        if any('heart' in d or 'cardiac' in d for d in diseases):
-            plan['tests'].extend(['ECG', 'Lipid panel', 'Cardiac enzymes'])
-        
-        if any('hypertension' in d or 'blood pressure' in d for d in diseases):
-            plan['tests'].extend(['Renal function', 'Electrolytes'])
+        for keywords, tests in MONITORING_TESTS:
+            if any(keyword in d for d in diseases for keyword in keywords):
+                plan['tests'].extend(tests)
         
         # Remove duplicates
         plan['tests'] = list(set(plan['tests']))
@@ -176,38 +399,11 @@ class ClinicalInsightsEngine:
         return plan
     
     def _generate_clinical_alerts(self, data):
-        """Generate time-sensitive clinical alerts."""
-        alerts = []
-        age = data.get('age', 0)
-        diseases = data.get('diseases', [])
-        
-        # Age-based screening reminders
-        if age >= 50:
-            alerts.append({
-                'type': 'Screening',
-                'priority': 'Medium',
-                'message': 'Consider colorectal cancer screening',
-                'due': 'If not done in past 10 years'
-            })
-        
-        if age >= 65:
-            alerts.append({
-                'type': 'Vaccination',
-                'priority': 'Medium',
-                'message': 'Annual influenza and pneumococcal vaccination due',
-                'due': 'Annually'
-            })
-        
-        # Condition-based alerts
-        if len(diseases) >= 3:
-            alerts.append({
-                'type': 'Care Coordination',
-                'priority': 'High',
-                'message': 'Complex patient - consider care coordinator referral',
-                'due': 'Within 2 weeks'
-            })
-        
-        return alerts
+        """Generate time-sensitive clinical alerts (compiled rules in alert_rules)."""
+        return clinical_alert_rules.evaluate({
+            'age': data.get('age', 0),
+            'condition_count': len(data.get('diseases', []))
+        })
     
     def _calculate_quality_metrics(self, data):
         """Calculate care quality metrics."""
@@ -259,46 +455,66 @@ class OutcomePredictor:
         }
     }
     
-    def predict_outcomes(self, patient_data):
+    def __init__(self, memo_size=4096):
+        self.memo = SignatureMemo(memo_size)
+    
+    def predict_outcomes(self, patient_data, rules=None, profile=None):
         """
         Predict various clinical outcomes.
+        `rules` pins a registry version; defaults to the active one.
+        `profile` is the diseases' condition_profile when already resolved.
         
         Returns:
             dict: Predicted outcomes with probabilities and confidence
         """
+        rules = rules or model_registry.active
+        if profile is None:
+            profile = condition_profile(patient_data.get('diseases', []), rules)
+        # Outcome probabilities depend only on the feature signature
+        predictions = dict(self.memo.get(
+            feature_signature(patient_data, profile, rules),
+            lambda: self._signature_predictions(patient_data, profile, rules)
+        ))
+        predictions['model_version'] = rules.version
+        predictions['predicted_at'] = datetime.now().isoformat()
+        
+        return predictions
+    
+    def _signature_predictions(self, patient_data, profile, rules):
+        """Per-outcome predictions and overall prognosis for one feature signature."""
+        groups = frozenset().union(*(g for _, _, g in profile))
         predictions = {}
         
-        for outcome_name, model in self.OUTCOME_MODELS.items():
-            probability = self._calculate_probability(patient_data, model)
+        for outcome_name, base_rate, factors in rules.outcome_models:
+            probability = self._calculate_probability(patient_data, base_rate, factors, groups)
             predictions[outcome_name] = {
                 'probability': round(probability * 100, 1),
                 'risk_level': self._categorize_risk(probability),
                 'confidence': self._calculate_confidence(patient_data),
-                'factors_present': self._identify_present_factors(patient_data, model)
+                'factors_present': self._identify_present_factors(patient_data, factors, groups)
             }
         
         predictions['overall_prognosis'] = self._calculate_prognosis(predictions)
-        predictions['predicted_at'] = datetime.now().isoformat()
-        
         return predictions
     
-    def _calculate_probability(self, data, model):
-        """Calculate outcome probability."""
-        prob = model['base_rate']
+    def _calculate_probability(self, data, base_rate, factors, groups):
+        """
+        Calculate outcome probability from precompiled risk factors.
+        Condition factors match ICD-10-CM condition groups, then disease names.
+        """
+        prob = base_rate
         diseases = [d.lower() for d in data.get('diseases', [])]
         age = data.get('age', 0)
         meds = data.get('medications', [])
         
-        for factor, weight in model['risk_factors'].items():
-            if 'age_over_75' in factor and age >= 75:
-                prob += weight
-            elif 'age_over_65' in factor and age >= 65:
+        for factor, weight, kind, threshold, _ in factors:
+            if kind == 'age' and age >= threshold:
                 prob += weight
-            elif 'polypharmacy' in factor and len(meds) >= 5:
+            elif kind == 'polypharmacy' and len(meds) >= 5:
                 prob += weight
-            elif 'multiple_conditions' in factor and len(diseases) >= 3:
+            elif kind == 'multiple_conditions' and len(diseases) >= 3:
                 prob += weight
-            elif any(factor in d for d in diseases):
+            elif factor in groups or any(factor in d for d in diseases):
                 prob += weight
         
         return min(prob, 0.95)  # Cap at 95%
@@ -320,19 +536,18 @@ class OutcomePredictor:
         present = sum(1 for f in fields if data.get(f))
         return min(95, 60 + (present * 10))
     
-    def _identify_present_factors(self, data, model):
+    def _identify_present_factors(self, data, factors, groups):
         """Identify which risk factors are present."""
         present = []
         diseases = [d.lower() for d in data.get('diseases', [])]
         age = data.get('age', 0)
         
-        for factor in model['risk_factors'].keys():
-            if 'age_over' in factor:
-                threshold = int(factor.split('_')[-1])
+        for factor, _, _, threshold, label in factors:
+            if threshold is not None:
                 if age >= threshold:
-                    present.append(factor.replace('_', ' ').title())
-            elif any(factor in d for d in diseases):
-                present.append(factor.replace('_', ' ').title())
+                    present.append(label)
+            elif factor in groups or any(factor in d for d in diseases):
+                present.append(label)
         
         return present
     
@@ -363,9 +578,18 @@ class ImpactMeasurement:
         """
         Compare metrics before and after intervention.
         
+        Periods may carry raw per-analysis data ("risk_scores", optional
+        "high_risk" and "outcomes" flags) instead of, or alongside, the
+        aggregates; the aggregates are then derived from it and the changes
+        are bootstrap-tested for significance.
+        
         Returns:
             dict: Impact measurements with statistical analysis
         """
+        significance = bootstrap_tester.compare_periods(before_data, after_data)
+        before_data = dict(period_summary(before_data), **before_data)
+        after_data = dict(period_summary(after_data), **after_data)
+        
         impact = {
             'period_comparison': {
                 'before': before_data.get('period', 'Baseline'),
@@ -416,6 +640,15 @@ class ImpactMeasurement:
         # Calculate overall impact score (0-100)
         impact['overall_impact_score'] = min(100, 50 + (total_improvement / 2))
         
+        if significance is not None:
+            impact['significance'] = significance
+            tests = (('average_risk_score', significance['mean_risk_score']),
+                     ('high_risk_rate', significance['high_risk_rate']))
+            for metric, test in tests:
+                if metric in impact['metrics']:
+                    impact['metrics'][metric]['p_value'] = test['p_value']
+                    impact['metrics'][metric]['significant'] = test['significant']
+        
         impact['summary'] = self._generate_impact_summary(impact)
         impact['calculated_at'] = datetime.now().isoformat()
         
@@ -446,7 +679,15 @@ class ImpactMeasurement:
         }
 
 
+model_registry.set_defaults(
+    GUIDELINES=ClinicalInsightsEngine.GUIDELINES,
+    COMORBIDITY_RISKS=ClinicalInsightsEngine.COMORBIDITY_RISKS,
+    CONDITION_CODES=ClinicalInsightsEngine.CONDITION_CODES,
+    CODE_SEVERITY=ClinicalInsightsEngine.CODE_SEVERITY,
+    OUTCOME_MODELS=OutcomePredictor.OUTCOME_MODELS
+)
+
 # Export for use in main app
-insights_engine = ClinicalInsightsEngine()
-outcome_predictor = OutcomePredictor()
+insights_engine = ClinicalInsightsEngine(memo_size=config.SIGNATURE_MEMO_SIZE)
+outcome_predictor = OutcomePredictor(memo_size=config.SIGNATURE_MEMO_SIZE)
 impact_measurement = ImpactMeasurement()
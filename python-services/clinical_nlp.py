@@ -0,0 +1,197 @@
+"""
+CLARA Clinical NLP
+==================
+Rule-based NLP for clinical transcripts: entity extraction (diseases,
+medications, tests, symptoms), sentiment, key phrases and urgency.
+"""
+
+from datetime import datetime
+
+import config
+from medication_normalizer import medication_normalizer
+from icd10_index import icd10_index
+from fuzzy_matcher import fuzzy_matcher
+
+
+class ClinicalNLPAnalyzer:
+    """
+    Natural Language Processing for clinical transcripts.
+    Extracts entities, sentiment, and key phrases.
+    """
+    
+    # Medical entity keywords
+    DISEASE_KEYWORDS = [
+        'diabetes', 'hypertension', 'heart disease', 'asthma', 'copd',
+        'pneumonia', 'infection', 'cancer', 'stroke', 'kidney disease',
+        'liver disease', 'anemia', 'arthritis', 'depression', 'anxiety',
+        'migraine', 'epilepsy', 'parkinson', 'alzheimer', 'covid'
+    ]
+    
+    MEDICATION_KEYWORDS = [
+        'metformin', 'aspirin', 'warfarin', 'lisinopril', 'atorvastatin',
+        'amlodipine', 'omeprazole', 'levothyroxine', 'gabapentin', 'prednisone',
+        'amoxicillin', 'azithromycin', 'ibuprofen', 'acetaminophen', 'insulin',
+        'metoprolol', 'hydrochlorothiazide', 'losartan', 'simvastatin', 'furosemide'
+    ]
+    
+    TEST_KEYWORDS = [
+        'ecg', 'ekg', 'blood test', 'x-ray', 'mri', 'ct scan', 'ultrasound',
+        'biopsy', 'endoscopy', 'colonoscopy', 'mammogram', 'pap smear',
+        'cholesterol', 'glucose', 'hba1c', 'creatinine', 'bmp', 'cbc',
+        'urinalysis', 'thyroid', 'liver function', 'kidney function'
+    ]
+    
+    SYMPTOM_KEYWORDS = [
+        'pain', 'fever', 'cough', 'headache', 'fatigue', 'nausea',
+        'vomiting', 'diarrhea', 'dizziness', 'shortness of breath',
+        'chest pain', 'swelling', 'rash', 'itching', 'numbness',
+        'weakness', 'blurred vision', 'weight loss', 'weight gain'
+    ]
+    
+    POSITIVE_WORDS = ['better', 'improved', 'stable', 'good', 'normal', 'healthy', 'recovery']
+    NEGATIVE_WORDS = ['worse', 'severe', 'critical', 'pain', 'emergency', 'urgent', 'deteriorating']
+    
+    EMERGENCY_WORDS = ['emergency', 'urgent', 'immediately', 'critical', 'severe', '911']
+    HIGH_URGENCY_WORDS = ['concerning', 'worrying', 'significant', 'serious']
+    
+    KEY_PHRASE_PATTERNS = [
+        'diagnosed with', 'prescribed', 'recommended', 'complains of',
+        'history of', 'symptoms include', 'test results show', 'need to'
+    ]
+    
+    def analyze_transcript(self, transcript, fuzzy=None):
+        """
+        Perform comprehensive NLP analysis on clinical transcript.
+        With `fuzzy` (default: CLARA_FUZZY_MATCHING) misspelled terms are
+        corrected against the entity vocabularies before extraction.
+        """
+        text_lower = transcript.lower()
+        words = text_lower.split()
+        word_count = len(words)
+        
+        entity_text = text_lower
+        corrections = None
+        if config.FUZZY_MATCHING if fuzzy is None else fuzzy:
+            entity_text, corrections = fuzzy_matcher.correct_text(text_lower)
+        
+        # Extract entities
+        diseases = self._extract_entities(entity_text, self.DISEASE_KEYWORDS)
+        medications = self._extract_medications(entity_text)
+        tests = self._extract_entities(entity_text, self.TEST_KEYWORDS)
+        symptoms = self._extract_entities(entity_text, self.SYMPTOM_KEYWORDS)
+        
+        # Sentiment analysis (simple rule-based)
+        sentiment = self._analyze_sentiment(text_lower)
+        
+        # Key phrases extraction
+        key_phrases = self._extract_key_phrases(transcript)
+        
+        # Urgency detection
+        urgency = self._detect_urgency(text_lower)
+        
+        analysis = self.build_analysis(
+            diseases, medications, tests, symptoms,
+            word_count=word_count,
+            sentence_count=transcript.count('.') + transcript.count('?'),
+            sentiment=sentiment,
+            key_phrases=key_phrases,
+            urgency=urgency
+        )
+        if corrections is not None:
+            analysis['fuzzy_corrections'] = corrections
+        return analysis
+    
+    def build_analysis(self, diseases, medications, tests, symptoms, word_count,
+                       sentence_count, sentiment, key_phrases, urgency):
+        """Assemble the analysis result (shared with incremental NLP sessions)."""
+        # Calculate complexity score
+        complexity = self._calculate_complexity(diseases, medications, symptoms)
+        
+        return {
+            'entities': {
+                'diseases': diseases,
+                'medications': medications,
+                'tests': tests,
+                'symptoms': symptoms
+            },
+            'metrics': {
+                'word_count': word_count,
+                'sentence_count': sentence_count,
+                'entity_count': len(diseases) + len(medications) + len(tests) + len(symptoms)
+            },
+            'icd10_mappings': icd10_index.map_terms(diseases),
+            'sentiment': sentiment,
+            'key_phrases': key_phrases,
+            'urgency': urgency,
+            'complexity_score': complexity,
+            'analysis_timestamp': datetime.now().isoformat()
+        }
+    
+    def _extract_entities(self, text, keywords):
+        """Extract matching keywords from text."""
+        found = []
+        for keyword in keywords:
+            if keyword in text:
+                found.append(keyword.title())
+        return list(set(found))
+    
+    def _extract_medications(self, text):
+        """Extract medications as canonical generic names (brand names and abbreviations included)."""
+        if medication_normalizer.size == 0:
+            return self._extract_entities(text, self.MEDICATION_KEYWORDS)
+        return [drug_id.title() for drug_id in medication_normalizer.extract(text)]
+    
+    def _analyze_sentiment(self, text):
+        """Simple sentiment analysis for clinical context."""
+        pos_count = sum(1 for word in self.POSITIVE_WORDS if word in text)
+        neg_count = sum(1 for word in self.NEGATIVE_WORDS if word in text)
+        return self._score_sentiment(pos_count, neg_count)
+    
+    def _score_sentiment(self, pos_count, neg_count):
+        """Sentiment label and score from positive/negative word counts."""
+        if neg_count > pos_count:
+            return {'label': 'Concerning', 'score': -0.5 - (neg_count * 0.1)}
+        elif pos_count > neg_count:
+            return {'label': 'Positive', 'score': 0.5 + (pos_count * 0.1)}
+        else:
+            return {'label': 'Neutral', 'score': 0.0}
+    
+    def _extract_key_phrases(self, text):
+        """Extract important phrases from transcript."""
+        # Simple extraction based on patterns
+        phrases = []
+        
+        text_lower = text.lower()
+        for pattern in self.KEY_PHRASE_PATTERNS:
+            if pattern in text_lower:
+                idx = text_lower.find(pattern)
+                end_idx = text_lower.find('.', idx)
+                if end_idx == -1:
+                    end_idx = min(idx + 100, len(text))
+                phrase = text[idx:end_idx].strip()
+                if len(phrase) > 10:
+                    phrases.append(phrase[:100])
+        
+        return phrases[:5]
+    
+    def _detect_urgency(self, text):
+        """Detect urgency level from transcript."""
+        emergency = any(word in text for word in self.EMERGENCY_WORDS)
+        high = any(word in text for word in self.HIGH_URGENCY_WORDS)
+        return self._urgency_level(emergency, high)
+    
+    def _urgency_level(self, emergency, high):
+        """Urgency level from the presence of emergency / high-urgency words."""
+        if emergency:
+            return {'level': 'Emergency', 'score': 5}
+        if high:
+            return {'level': 'High', 'score': 4}
+        return {'level': 'Routine', 'score': 2}
+    
+    def _calculate_complexity(self, diseases, medications, symptoms):
+        """Calculate case complexity score (1-10)."""
+        score = 1
+        score += min(len(diseases) * 1.5, 4)
+        score += min(len(medications) * 0.5, 2)
+        score += min(len(symptoms) * 0.5, 2)
+        return min(round(score, 1), 10)
@@ -0,0 +1,435 @@
+"""
+CLARA Cohort Engine
+===================
+In-process cohort queries over stored analyses. Every analysis gets a
+sequential record ID, and a compressed bitmap of record IDs is kept per
+condition, medication, symptom, age (in years), risk level and day. A cohort
+such as "age 61-75 with diabetes and hypertension at High or Critical risk in
+the last 30 days" is then a few bitmap ORs (within a dimension) and ANDs
+(across dimensions), and its aggregates come from bitmap cardinalities plus
+one gather over the per-record risk score column.
+
+Bitmaps are Roaring bitmaps when pyroaring is installed; otherwise Python
+integers are used as bitsets with the same interface.
+
+Query format:
+    {
+        "age": {"min": 61, "max": 75},
+        "conditions": {"all": ["diabetes", "hypertension"]},
+        "medications": {"any": ["metformin"], "none": ["insulin"]},
+        "symptoms": ["chest pain"],                   (a plain list means "all")
+        "risk_levels": ["High", "Critical"],
+        "days": {"last": 30}                          (or {"from": "2026-01-01", "to": "2026-01-31"})
+    }
+
+Usage:
+    python cohort_engine.py --records 1000000   # load synthetic records and time queries
+"""
+
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import sys
+import threading
+import time
+
+import config
+
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = None
+
+ENTITY_DIMENSIONS = {
+    'conditions': 'diseases',
+    'medications': 'medications',
+    'symptoms': 'symptoms'
+}
+
+RISK_LEVELS = ('low', 'medium', 'high', 'critical', 'unknown')
+
+MAX_AGE = 120
+
+
+class IntBitmap:
+    """
+    Bitset stored in a Python int (bit i set = record i), implementing the
+    subset of the pyroaring BitMap API the engine uses.
+    """
+
+    __slots__ = ('bits',)
+
+    def __init__(self, ids=(), bits=0):
+        self.bits = bits
+        if ids:
+            self.update(ids)
+
+    def update(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        low = min(ids)
+        base = low - low % 8
+        buffer = bytearray(((max(ids) - base) >> 3) + 1)
+        for i in ids:
+            offset = i - base
+            buffer[offset >> 3] |= 1 << (offset & 7)
+        self.bits |= int.from_bytes(buffer, 'little') << base
+
+    @classmethod
+    def union(cls, *bitmaps):
+        bits = 0
+        for bitmap in bitmaps:
+            bits |= bitmap.bits
+        return cls(bits=bits)
+
+    def intersection_cardinality(self, other):
+        return (self.bits & other.bits).bit_count()
+
+    def to_array(self):
+        """Set record IDs in ascending order (NumPy array)."""
+        import numpy as np
+
+        if not self.bits:
+            return np.empty(0, dtype=np.int64)
+        raw = np.frombuffer(self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder='little'))
+
+    def __and__(self, other):
+        return IntBitmap(bits=self.bits & other.bits)
+
+    def __or__(self, other):
+        return IntBitmap(bits=self.bits | other.bits)
+
+    def __sub__(self, other):
+        return IntBitmap(bits=self.bits & ~other.bits)
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+
+class CohortEngine:
+    """
+    Bitmap indexes over an append-only store of analysis records.
+    """
+
+    def __init__(self, top_n=10, use_roaring=True):
+        self.top_n = top_n
+        self.backend = 'roaring' if use_roaring and BitMap is not None else 'int'
+        self._bitmap = BitMap if self.backend == 'roaring' else IntBitmap
+        self._lock = threading.Lock()
+        self._bitmaps = {}
+        # IDs added since the bitmap was last updated; folded in before each query
+        self._pending = defaultdict(list)
+        self._risk_scores = array('d')
+        self._ages = array('H')
+        self._days = set()
+        self._queries = 0
+
+    @property
+    def size(self):
+        return len(self._risk_scores)
+
+    def add(self, record):
+        """Index one analysis record; returns its record ID."""
+        return self.add_many([record])[0]
+
+    def add_many(self, records):
+        """
+        Index analysis records.
+
+        Args:
+            records: dicts with age, diseases, medications, symptoms, risk_score,
+                risk_level and an ISO date or timestamp ("date", "timestamp" or
+                "analysis_timestamp"; default: today)
+
+        Returns:
+            list: record IDs
+
+        Raises:
+            ValueError: a record is malformed; nothing from the batch is indexed
+        """
+        # Parse the whole batch first so a bad record cannot leave it half indexed
+        parsed = []
+        for position, record in enumerate(records):
+            try:
+                risk_score = float(record.get('risk_score') or 0)
+                age = min(MAX_AGE, max(0, int(record.get('age') or 0)))
+                keys = [('all', ''), ('age', age), ('risk_level', _risk_level(record, risk_score))]
+                day = _record_day(record)
+                keys.append(('day', day))
+                for dimension, field in ENTITY_DIMENSIONS.items():
+                    for name in set(_names(record.get(field))):
+                        keys.append((dimension, name))
+            except (AttributeError, TypeError, ValueError) as e:
+                raise ValueError(f'Invalid cohort record at position {position}: {e}')
+            parsed.append((risk_score, age, day, keys))
+
+        ids = []
+        with self._lock:
+            for risk_score, age, day, keys in parsed:
+                record_id = len(self._risk_scores)
+                self._risk_scores.append(risk_score)
+                self._ages.append(age)
+                self._days.add(day)
+                for key in keys:
+                    self._pending[key].append(record_id)
+                ids.append(record_id)
+        return ids
+
+    def query(self, spec=None):
+        """
+        Aggregates over the records matching a cohort query.
+
+        Returns:
+            dict: count, mean risk score and age, risk distribution, top
+                conditions/medications/symptoms and query time
+        """
+        import numpy as np
+
+        started = time.perf_counter()
+        spec = spec or {}
+        with self._lock:
+            self._flush()
+            self._queries += 1
+            cohort = self._match(spec)
+            count = len(cohort)
+
+            result = {
+                'count': count,
+                'total_records': self.size,
+                'mean_risk_score': None,
+                'mean_age': None,
+                'risk_distribution': {},
+            }
+            if count:
+                ids = np.asarray(cohort.to_array(), dtype=np.int64)
+                scores = np.frombuffer(self._risk_scores, dtype=np.float64)
+                ages = np.frombuffer(self._ages, dtype=np.uint16)
+                result['mean_risk_score'] = round(float(scores[ids].mean()), 2)
+                result['mean_age'] = round(float(ages[ids].mean()), 1)
+            for level in RISK_LEVELS:
+                bitmap = self._bitmaps.get(('risk_level', level))
+                matching = cohort.intersection_cardinality(bitmap) if bitmap is not None and count else 0
+                if matching:
+                    result['risk_distribution'][level.title()] = matching
+            for dimension in ENTITY_DIMENSIONS:
+                result[f'top_{dimension}'] = self._top(cohort, dimension) if count else []
+
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def stats(self):
+        """Record, bitmap and query counts."""
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'records': self.size,
+                'bitmaps': len(set(self._bitmaps) | set(self._pending)),
+                'days': len(self._days),
+                'queries': self._queries,
+                'generated_at': datetime.now().isoformat()
+            }
+
+    def _flush(self):
+        for key, ids in self._pending.items():
+            bitmap = self._bitmaps.get(key)
+            if bitmap is None:
+                self._bitmaps[key] = self._bitmap(ids)
+            else:
+                bitmap.update(ids)
+        self._pending.clear()
+
+    def _get(self, dimension, value):
+        bitmap = self._bitmaps.get((dimension, value))
+        return bitmap if bitmap is not None else self._bitmap()
+
+    def _any(self, dimension, values):
+        bitmaps = [self._bitmaps[(dimension, value)] for value in values if (dimension, value) in self._bitmaps]
+        return self._bitmap.union(*bitmaps) if bitmaps else self._bitmap()
+
+    def _match(self, spec):
+        """AND of every filter in the spec; each filter ORs bitmaps within its dimension."""
+        included = []
+        excluded = []
+
+        age = spec.get('age')
+        if age:
+            low = max(0, int(age.get('min', 0)))
+            high = min(MAX_AGE, int(age.get('max', MAX_AGE)))
+            included.append(self._any('age', range(low, high + 1)))
+
+        levels = spec.get('risk_levels')
+        if levels:
+            included.append(self._any('risk_level', [level.lower() for level in levels]))
+
+        days = spec.get('days')
+        if days:
+            included.append(self._any('day', self._day_range(days)))
+
+        for dimension in ENTITY_DIMENSIONS:
+            condition = spec.get(dimension)
+            if not condition:
+                continue
+            if isinstance(condition, (list, tuple)):
+                condition = {'all': condition}
+            for name in _names(condition.get('all')):
+                included.append(self._get(dimension, name))
+            if condition.get('any'):
+                included.append(self._any(dimension, _names(condition['any'])))
+            if condition.get('none'):
+                excluded.append(self._any(dimension, _names(condition['none'])))
+
+        # Smallest first keeps the intermediate results small
+        included.sort(key=len)
+        cohort = included[0] if included else self._get('all', '')
+        for bitmap in included[1:]:
+            cohort = cohort & bitmap
+        for bitmap in excluded:
+            cohort = cohort - bitmap
+        return cohort
+
+    def _day_range(self, days):
+        if 'last' in days:
+            first = (date.today() - timedelta(days=max(1, int(days['last'])) - 1)).isoformat()
+            last = date.today().isoformat()
+        else:
+            first = days.get('from', '0000-00-00')
+            last = days.get('to', '9999-99-99')
+        return [day for day in self._days if first <= day <= last]
+
+    def _top(self, cohort, dimension):
+        counts = []
+        for (key_dimension, name), bitmap in self._bitmaps.items():
+            if key_dimension == dimension:
+                matching = cohort.intersection_cardinality(bitmap)
+                if matching:
+                    counts.append((matching, name))
+        counts.sort(key=lambda item: (-item[0], item[1]))
+        return [{'name': name, 'count': count} for count, name in counts[:self.top_n]]
+
+
+def _names(values):
+    return [str(value).strip().lower() for value in values or () if str(value).strip()]
+
+
+def _risk_level(record, risk_score):
+    level = record.get('risk_level')
+    if level:
+        return str(level).lower()
+    if record.get('risk_score') is None:
+        return 'unknown'
+    if risk_score >= 75:
+        return 'critical'
+    if risk_score >= 50:
+        return 'high'
+    if risk_score >= 25:
+        return 'medium'
+    return 'low'
+
+
+def _record_day(record):
+    for field in ('date', 'timestamp', 'analysis_timestamp'):
+        value = record.get(field)
+        if value:
+            return str(value)[:10]
+    return date.today().isoformat()
+
+
+def analysis_record(result):
+    """Cohort record for a comprehensive-analysis result (None if it has no risk prediction)."""
+    risk = result.get('risk_prediction')
+    nlp = result.get('nlp_analysis')
+    if not risk or not nlp:
+        return None
+    entities = nlp.get('entities', {})
+    return {
+        'age': (result.get('patient') or {}).get('age', 0),
+        'diseases': entities.get('diseases', []),
+        'medications': entities.get('medications', []),
+        'symptoms': entities.get('symptoms', []),
+        'risk_score': risk.get('score'),
+        'risk_level': risk.get('level'),
+        'timestamp': result.get('analysis_timestamp')
+    }
+
+
+def benchmark(records=1000000, seed=7, use_roaring=True):
+    """
+    Load synthetic records and time a few representative cohort queries.
+
+    Returns:
+        dict: load time and per-query milliseconds and counts
+    """
+    import random
+
+    rng = random.Random(seed)
+    conditions = ['diabetes', 'hypertension', 'heart disease', 'copd', 'asthma', 'kidney disease',
+                  'depression', 'obesity', 'cancer', 'stroke']
+    medications = ['metformin', 'lisinopril', 'atorvastatin', 'insulin', 'warfarin', 'aspirin',
+                   'amlodipine', 'metoprolol', 'omeprazole', 'albuterol']
+    symptoms = ['chest pain', 'shortness of breath', 'fatigue', 'dizziness', 'headache']
+    today = date.today()
+
+    engine = CohortEngine(use_roaring=use_roaring)
+    started = time.perf_counter()
+    batch = []
+    for _ in range(records):
+        batch.append({
+            'age': rng.randint(18, 95),
+            'diseases': rng.sample(conditions, rng.choice([0, 1, 1, 2, 2, 3])),
+            'medications': rng.sample(medications, rng.randint(0, 4)),
+            'symptoms': rng.sample(symptoms, rng.choice([0, 0, 1, 2])),
+            'risk_score': rng.randint(0, 100),
+            'date': (today - timedelta(days=rng.randint(0, 364))).isoformat()
+        })
+        if len(batch) == 10000:
+            engine.add_many(batch)
+            batch = []
+    engine.add_many(batch)
+    load_seconds = time.perf_counter() - started
+
+    engine.query({})  # build the bitmaps
+    queries = {
+        'all': {},
+        'diabetic_hypertensive_61_75_high_30d': {
+            'age': {'min': 61, 'max': 75},
+            'conditions': {'all': ['diabetes', 'hypertension']},
+            'risk_levels': ['High', 'Critical'],
+            'days': {'last': 30}
+        },
+        'warfarin_without_aspirin': {'medications': {'any': ['warfarin'], 'none': ['aspirin']}}
+    }
+    timings = {}
+    for name, spec in queries.items():
+        result = engine.query(spec)
+        timings[name] = {'count': result['count'], 'ms': result['elapsed_ms']}
+
+    return {
+        'backend': engine.backend,
+        'records': records,
+        'load_seconds': round(load_seconds, 2),
+        'queries': timings
+    }
+
+
+def main(argv=None):
+    """Print load and query timings for a synthetic record store."""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Benchmark the CLARA cohort engine')
+    parser.add_argument('--records', type=int, default=1000000, help='Number of synthetic records')
+    parser.add_argument('--int-bitsets', action='store_true', help='Use Python int bitsets even if pyroaring is installed')
+    args = parser.parse_args(argv)
+
+    print(json.dumps(benchmark(args.records, use_roaring=not args.int_bitsets), indent=2))
+    return 0
+
+
+# Export for use in main app
+cohort_engine = CohortEngine(top_n=config.COHORT_TOP_N)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
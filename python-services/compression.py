@@ -0,0 +1,129 @@
+"""
+CLARA Response Compression
+==========================
+Negotiated gzip/brotli compression for API responses.
+Small payloads are skipped and streamed responses are compressed chunk by chunk.
+"""
+
+import zlib
+
+from flask import request
+
+import config
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+
+class ResponseCompressor:
+    """
+    Compresses Flask responses according to the client's Accept-Encoding.
+    """
+
+    COMPRESSIBLE_MIMETYPES = {
+        'application/json',
+        'application/x-ndjson',
+        'application/javascript',
+        'text/html',
+        'text/plain',
+        'text/csv',
+        'text/event-stream'
+    }
+
+    def __init__(self, enabled=False, min_size=1024, level=6):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.level = level
+
+    def init_app(self, app):
+        """Register the compression hook on a Flask app."""
+        app.after_request(self.compress_response)
+
+    def compress_response(self, response):
+        """after_request hook: compress the response body if worthwhile."""
+        if not self.enabled or not self._is_compressible(response):
+            return response
+
+        encoding = self._negotiate_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self._compress_bytes(data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _is_compressible(self, response):
+        """Only compress successful, not-yet-encoded text payloads."""
+        if request.method == 'HEAD':
+            return False
+        if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+            return False
+        if 'Content-Encoding' in response.headers:
+            return False
+        return response.mimetype in self.COMPRESSIBLE_MIMETYPES
+
+    def _negotiate_encoding(self):
+        """Pick the best supported encoding, honouring q-values."""
+        supported = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+        return request.accept_encodings.best_match(supported)
+
+    def _brotli_quality(self):
+        """Map the configured level onto brotli's 0-11 quality range."""
+        return max(0, min(self.level, 11))
+
+    def _gzip_level(self):
+        """Clamp the configured level to zlib's 1-9 range."""
+        return max(1, min(self.level, 9))
+
+    def _compress_bytes(self, data, encoding):
+        """Compress a complete payload."""
+        if encoding == 'br':
+            return brotli.compress(data, quality=self._brotli_quality())
+        compressor = zlib.compressobj(self._gzip_level(), zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def _compress_stream(self, chunks, encoding):
+        """
+        Compress a streamed body chunk by chunk.
+        Each chunk is flushed so NDJSON lines reach the client without waiting
+        for the compressor's window to fill.
+        """
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self._brotli_quality())
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                compressed = compressor.process(chunk) + compressor.flush()
+                if compressed:
+                    yield compressed
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(self._gzip_level(), zlib.DEFLATED, 31)
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                compressed = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                if compressed:
+                    yield compressed
+            yield compressor.flush()
+
+
+# Export for use in main app
+response_compressor = ResponseCompressor(
+    enabled=config.COMPRESSION_ENABLED,
+    min_size=config.COMPRESSION_MIN_SIZE,
+    level=config.COMPRESSION_LEVEL
+)
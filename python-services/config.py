@@ -0,0 +1,276 @@
+"""
+CLARA Service Configuration
+===========================
+Environment-driven settings shared by the Python analytics modules.
+"""
+
+import os
+
+# Directory containing the service modules (bundled data and models live here)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Writable runtime state (local stores, queues, caches)
+INSTANCE_DIR = os.environ.get('CLARA_INSTANCE_DIR', os.path.join(BASE_DIR, 'instance'))
+
+
+def _env_bool(name, default=False):
+    """Read a boolean flag ('1', 'true', 'yes', 'on') from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    return int(value)
+
+
+def _env_float(name, default):
+    """Read a float setting from the environment."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    return float(value)
+
+
+# ============================================
+# Response Compression
+# ============================================
+
+# Opt-in: responses are only compressed when this is enabled
+COMPRESSION_ENABLED = _env_bool('CLARA_COMPRESSION', False)
+
+# Payloads smaller than this (bytes) are sent uncompressed
+COMPRESSION_MIN_SIZE = _env_int('CLARA_COMPRESSION_MIN_SIZE', 1024)
+
+# gzip level (1-9); brotli quality is clamped to 0-11
+COMPRESSION_LEVEL = _env_int('CLARA_COMPRESSION_LEVEL', 6)
+
+
+# ============================================
+# Startup
+# ============================================
+
+# Defer importing the advanced modules until the first request that needs them
+LAZY_IMPORTS = _env_bool('CLARA_LAZY_IMPORTS', False)
+
+
+# ============================================
+# Risk Model
+# ============================================
+
+# Trained risk model artifact; the heuristic is used when missing or empty
+RISK_MODEL_PATH = os.environ.get(
+    'CLARA_RISK_MODEL_PATH', os.path.join(BASE_DIR, 'models', 'risk_model.joblib')
+)
+
+
+# ============================================
+# Model Registry
+# ============================================
+
+# Versioned rule-table artifacts and the ACTIVE pointer file
+MODEL_REGISTRY_DIR = os.environ.get(
+    'CLARA_MODEL_REGISTRY_DIR', os.path.join(BASE_DIR, 'models', 'registry')
+)
+
+# Seconds between checks for a new ACTIVE version (0 disables hot-swap polling)
+MODEL_WATCH_INTERVAL = _env_int('CLARA_MODEL_WATCH_INTERVAL', 5)
+
+
+# ============================================
+# Shadow Evaluation
+# ============================================
+
+# Fraction of predict-risk / predict-outcomes requests replayed against candidates (0 disables)
+SHADOW_FRACTION = _env_float('CLARA_SHADOW_FRACTION', 0.0)
+
+# Candidate registry version for the heuristic risk model and outcome predictor
+SHADOW_RULES_VERSION = os.environ.get('CLARA_SHADOW_RULES_VERSION', '')
+
+# Candidate trained risk model artifact
+SHADOW_RISK_MODEL_PATH = os.environ.get('CLARA_SHADOW_RISK_MODEL_PATH', '')
+
+# Local comparison store and the maximum number of pending shadow runs
+SHADOW_DB_PATH = os.environ.get('CLARA_SHADOW_DB', os.path.join(INSTANCE_DIR, 'shadow_evaluation.sqlite3'))
+SHADOW_MAX_BACKLOG = _env_int('CLARA_SHADOW_MAX_BACKLOG', 1000)
+
+
+# ============================================
+# Drug Interactions
+# ============================================
+
+# Interaction knowledge base (CSV: drug_a,drug_b,severity,message,action)
+INTERACTIONS_PATH = os.environ.get(
+    'CLARA_INTERACTIONS_PATH', os.path.join(BASE_DIR, 'data', 'drug_interactions.csv')
+)
+
+# Medication synonym table (CSV: synonym,canonical) for brand/generic normalization
+MEDICATION_SYNONYMS_PATH = os.environ.get(
+    'CLARA_MEDICATION_SYNONYMS_PATH', os.path.join(BASE_DIR, 'data', 'medication_synonyms.csv')
+)
+
+
+# ============================================
+# ICD-10-CM
+# ============================================
+
+# Code file in CMS format (icd10cm_codes_<year>.txt or icd10cm_order_<year>.txt)
+ICD10_PATH = os.environ.get('CLARA_ICD10_PATH', os.path.join(BASE_DIR, 'data', 'icd10cm_codes.txt'))
+
+# Lay terms and abbreviations mapped to codes (CSV: term,code)
+ICD10_ALIASES_PATH = os.environ.get(
+    'CLARA_ICD10_ALIASES_PATH', os.path.join(BASE_DIR, 'data', 'icd10cm_aliases.csv')
+)
+
+
+# ============================================
+# NLP
+# ============================================
+
+# Correct misspelled drug/disease terms before entity extraction (per-request "fuzzy" overrides)
+FUZZY_MATCHING = _env_bool('CLARA_FUZZY_MATCHING', False)
+
+# Incremental NLP sessions: maximum live sessions and idle expiry (seconds)
+NLP_SESSION_MAX = _env_int('CLARA_NLP_SESSION_MAX', 1000)
+NLP_SESSION_IDLE_TTL = _env_int('CLARA_NLP_SESSION_IDLE_TTL', 900)
+
+# Transcript NLP backend: 'keyword' (string scan) or 'spacy' (nlp.pipe + PhraseMatcher)
+NLP_BACKEND = os.environ.get('CLARA_NLP_BACKEND', 'keyword').strip().lower()
+SPACY_MODEL = os.environ.get('CLARA_SPACY_MODEL', 'en_core_web_sm')
+SPACY_BATCH_SIZE = _env_int('CLARA_SPACY_BATCH_SIZE', 64)
+SPACY_N_PROCESS = _env_int('CLARA_SPACY_N_PROCESS', 1)
+
+
+# ============================================
+# RPC
+# ============================================
+
+# Maximum operations in one /api/rpc call
+RPC_MAX_OPERATIONS = _env_int('CLARA_RPC_MAX_OPERATIONS', 50)
+
+
+# ============================================
+# Request Coalescing
+# ============================================
+
+# Share one computation between concurrent identical comprehensive-analysis / dashboard requests
+SINGLE_FLIGHT = _env_bool('CLARA_SINGLE_FLIGHT', True)
+
+# Seconds a duplicate waits for the in-flight computation before computing on its own
+SINGLE_FLIGHT_WAIT_SECONDS = _env_float('CLARA_SINGLE_FLIGHT_WAIT_SECONDS', 30.0)
+
+
+# ============================================
+# Admission Control
+# ============================================
+
+# Opt-in: limit concurrent requests and queue the rest by priority
+ADMISSION_CONTROL = _env_bool('CLARA_ADMISSION_CONTROL', False)
+ADMISSION_MAX_CONCURRENT = _env_int('CLARA_ADMISSION_MAX_CONCURRENT', 8)
+
+# Waiting requests allowed per priority class; beyond this requests get 503
+ADMISSION_QUEUE_LIMITS = os.environ.get(
+    'CLARA_ADMISSION_QUEUE_LIMITS', 'emergency=64,interactive=32,batch=8,background=4'
+)
+
+# Seconds a queued request waits for a slot before it gets 503
+ADMISSION_MAX_WAIT_SECONDS = _env_float('CLARA_ADMISSION_MAX_WAIT_SECONDS', 10.0)
+
+# Opening characters of a transcript screened for emergency words
+ADMISSION_SCAN_CHARS = _env_int('CLARA_ADMISSION_SCAN_CHARS', 2000)
+
+
+# ============================================
+# Request Deadlines
+# ============================================
+
+# Default per-request time budget in milliseconds (0: only caller-supplied deadlines)
+REQUEST_TIMEOUT_MS = _env_int('CLARA_REQUEST_TIMEOUT_MS', 0)
+
+
+# ============================================
+# Batch Jobs
+# ============================================
+
+# Job state (SQLite) and per-job input/result files
+JOBS_DB_PATH = os.environ.get('CLARA_JOBS_DB', os.path.join(INSTANCE_DIR, 'jobs.sqlite3'))
+JOBS_DIR = os.environ.get('CLARA_JOBS_DIR', os.path.join(INSTANCE_DIR, 'jobs'))
+
+# Background worker threads per process, items per result chunk, items per job
+JOB_WORKERS = _env_int('CLARA_JOB_WORKERS', 1)
+JOB_CHUNK_SIZE = _env_int('CLARA_JOB_CHUNK_SIZE', 100)
+JOB_MAX_ITEMS = _env_int('CLARA_JOB_MAX_ITEMS', 100000)
+
+# Finished jobs and their results are removed after this many hours (0 keeps them)
+JOB_RETENTION_HOURS = _env_int('CLARA_JOB_RETENTION_HOURS', 168)
+
+
+# ============================================
+# Significance Testing
+# ============================================
+
+# Bootstrap resamples and confidence level for before/after comparisons
+BOOTSTRAP_RESAMPLES = _env_int('CLARA_BOOTSTRAP_RESAMPLES', 10000)
+BOOTSTRAP_CONFIDENCE = _env_float('CLARA_BOOTSTRAP_CONFIDENCE', 0.95)
+
+
+# ============================================
+# Model Evaluation
+# ============================================
+
+# Points kept per ROC/PR curve in reports, and calibration bins
+EVAL_CURVE_POINTS = _env_int('CLARA_EVAL_CURVE_POINTS', 200)
+EVAL_CALIBRATION_BINS = _env_int('CLARA_EVAL_CALIBRATION_BINS', 10)
+
+
+# ============================================
+# Cohort Engine
+# ============================================
+
+# Also index each comprehensive analysis this process serves (per-process, unbounded,
+# lost on restart); the authoritative index is loaded with /api/cohorts/records source=db
+COHORT_RECORD_ANALYSES = _env_bool('CLARA_COHORT_RECORD_ANALYSES', False)
+
+# Entries per "top" list in cohort results
+COHORT_TOP_N = _env_int('CLARA_COHORT_TOP_N', 10)
+
+
+# ============================================
+# MongoDB
+# ============================================
+
+# Same database as the Node backend (MONGO_URI is shared with it)
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/clara')
+MONGO_DB = os.environ.get('CLARA_MONGO_DB', '')
+
+# Cursor batch size for reads, documents per unordered bulk insert
+MONGO_BATCH_SIZE = _env_int('CLARA_MONGO_BATCH_SIZE', 1000)
+MONGO_WRITE_BATCH_SIZE = _env_int('CLARA_MONGO_WRITE_BATCH_SIZE', 1000)
+
+# Connection pool size and server selection / connect timeout
+MONGO_MAX_POOL_SIZE = _env_int('CLARA_MONGO_MAX_POOL_SIZE', 20)
+MONGO_TIMEOUT_MS = _env_int('CLARA_MONGO_TIMEOUT_MS', 2000)
+
+
+# ============================================
+# Patient State
+# ============================================
+
+# Patients whose risk state is kept between encounters (least recently used evicted)
+PATIENT_STATE_MAX = _env_int('CLARA_PATIENT_STATE_MAX', 10000)
+
+# Seconds of inactivity before a patient's state is dropped
+PATIENT_STATE_IDLE_TTL = _env_int('CLARA_PATIENT_STATE_IDLE_TTL', 86400)
+
+
+# ============================================
+# Signature Memoization
+# ============================================
+
+# Insights and outcome results cached per feature signature (per engine); 0 disables
+SIGNATURE_MEMO_SIZE = _env_int('CLARA_SIGNATURE_MEMO_SIZE', 4096)
@@ -411,6 +411,89 @@ class MetricCalculator:
             'npv': round(npv * 100, 1),
             'accuracy': round((tp + tn) / (tp + fp + tn + fn) * 100, 1) if (tp + fp + tn + fn) > 0 else 0
         }
+    
+    # Bulk variants: one vectorized pass over columns of 2x2 tables
+    
+    @staticmethod
+    def bulk_odds_ratio(a, b, c, d, z=1.96):
+        """
+        Odds ratios with Woolf confidence intervals for many 2x2 tables.
+        
+        Tables with a zero cell get the Haldane-Anscombe correction (0.5 added
+        to every cell of that table); tables with an empty exposed or control
+        row have no OR (NaN).
+        
+        Args:
+            a, b: exposed events / non-events (array-likes of equal length)
+            c, d: control events / non-events
+        
+        Returns:
+            dict: arrays 'or', 'ci_lower', 'ci_upper' and boolean 'corrected'
+        """
+        import numpy as np
+        
+        a, b, c, d = (np.asarray(x, dtype=np.float64) for x in (a, b, c, d))
+        valid = (a + b > 0) & (c + d > 0)
+        corrected = valid & ((a == 0) | (b == 0) | (c == 0) | (d == 0))
+        a, b, c, d = (np.where(corrected, x + 0.5, x) for x in (a, b, c, d))
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_or = np.log(a) + np.log(d) - np.log(b) - np.log(c)
+            se = np.sqrt(1 / a + 1 / b + 1 / c + 1 / d)
+        log_or = np.where(valid, log_or, np.nan)
+        
+        return {
+            'or': np.round(np.exp(log_or), 2),
+            'ci_lower': np.round(np.exp(log_or - z * se), 2),
+            'ci_upper': np.round(np.exp(log_or + z * se), 2),
+            'corrected': corrected
+        }
+    
+    @staticmethod
+    def bulk_nnt(a, b, c, d):
+        """
+        Number Needed to Treat for many 2x2 tables, from the absolute risk
+        reduction of the exposed (treated) row against the control row.
+        
+        Returns:
+            dict: arrays 'arr' (decimal) and 'nnt' (inf without a reduction,
+                NaN for tables with an empty row)
+        """
+        import numpy as np
+        
+        a, b, c, d = (np.asarray(x, dtype=np.float64) for x in (a, b, c, d))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            arr = c / (c + d) - a / (a + b)
+            nnt = np.where(arr > 0, np.round(1 / arr, 1), np.inf)
+        nnt = np.where(np.isnan(arr), np.nan, nnt)
+        
+        return {'arr': np.round(arr, 4), 'nnt': nnt}
+    
+    @staticmethod
+    def bulk_sensitivity_specificity(tp, fp, tn, fn):
+        """
+        Sensitivity, specificity, PPV, NPV and accuracy (percent) for many
+        confusion tables. Like the single-table version, a metric with an
+        empty denominator is 0.
+        
+        Returns:
+            dict: arrays 'sensitivity', 'specificity', 'ppv', 'npv', 'accuracy'
+        """
+        import numpy as np
+        
+        tp, fp, tn, fn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, tn, fn))
+        
+        def percent(numerator, denominator):
+            safe = np.where(denominator > 0, denominator, 1)
+            return np.round(np.where(denominator > 0, numerator / safe, 0) * 100, 1)
+        
+        return {
+            'sensitivity': percent(tp, tp + fn),
+            'specificity': percent(tn, tn + fp),
+            'ppv': percent(tp, tp + fp),
+            'npv': percent(tn, tn + fn),
+            'accuracy': percent(tp + tn, tp + fp + tn + fn)
+        }
 
 
 # Export
@@ -0,0 +1,266 @@
+"""
+CLARA Data Access
+=================
+Direct MongoDB access to the analysis history the Node backend stores, so
+dashboards and metrics can read it from the database instead of receiving
+whole histories serialized into request bodies.
+
+Reads use projection (only the fields a caller needs), server-side filters
+and a tuned cursor batch size, and are streamed document by document.
+Writes use unordered bulk inserts in fixed-size batches: one bad or
+duplicate document does not stop the rest, and documents with deterministic
+_ids can be re-inserted idempotently (duplicates are counted, not raised).
+
+The client is created lazily and shared; pymongo pools its connections. A
+"mongomock://" URI (or a custom client_factory) swaps in an in-process
+stand-in for local testing.
+
+Collections (as named by the Node backend's Mongoose models):
+    records      {analysis: {...}, qrToken, createdAt, ...}
+    statistics   weekly disease/medication/risk-level counts
+"""
+
+from datetime import datetime
+import threading
+
+import config
+
+RECORDS_COLLECTION = 'records'
+STATISTICS_COLLECTION = 'statistics'
+
+# Fields the dashboard and metrics endpoints read from each record
+DASHBOARD_FIELDS = (
+    'analysis.risk_assessment', 'analysis.entities', 'analysis.age',
+    'analysis.patient_id', 'createdAt'
+)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def create_client(uri, max_pool_size=20, timeout_ms=2000):
+    """MongoClient for `uri`; "mongomock://" URIs get an in-process mongomock client."""
+    if uri.startswith('mongomock://'):
+        import mongomock
+        return mongomock.MongoClient()
+
+    from pymongo import MongoClient
+    return MongoClient(
+        uri,
+        maxPoolSize=max_pool_size,
+        serverSelectionTimeoutMS=timeout_ms,
+        connectTimeoutMS=timeout_ms
+    )
+
+
+class AnalysisStore:
+    """
+    Batched reader/writer over the analysis collections.
+    """
+
+    def __init__(self, uri, database=None, batch_size=1000, write_batch_size=1000,
+                 max_pool_size=20, timeout_ms=2000, client_factory=None):
+        self.uri = uri
+        self.database_name = database
+        self.batch_size = max(1, batch_size)
+        self.write_batch_size = max(1, write_batch_size)
+        self.max_pool_size = max_pool_size
+        self.timeout_ms = timeout_ms
+        self._client_factory = client_factory or (
+            lambda: create_client(self.uri, self.max_pool_size, self.timeout_ms)
+        )
+        self._client = None
+        self._lock = threading.Lock()
+        self._stats = {'documents_read': 0, 'documents_written': 0, 'duplicates': 0, 'write_errors': 0}
+
+    @property
+    def client(self):
+        """Shared client, created on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    @property
+    def db(self):
+        if self.database_name:
+            return self.client[self.database_name]
+        try:
+            return self.client.get_default_database()
+        except Exception:
+            return self.client['clara']
+
+    def collection(self, name):
+        return self.db[name]
+
+    def iter_records(self, risk_levels=None, since=None, until=None, min_risk_score=None,
+                     fields=DASHBOARD_FIELDS, limit=None):
+        """
+        Stream stored analyses matching the filters, newest first.
+
+        Args:
+            risk_levels: e.g. ['High', 'Critical'] (case-insensitive)
+            since, until: datetimes or ISO strings bounding createdAt
+            min_risk_score: lower bound on risk_assessment.score
+            fields: projection (dotted paths); None returns whole documents
+            limit: maximum number of records
+
+        Yields:
+            dict: the record's analysis, plus "id" and "saved_at"
+        """
+        query = build_record_query(risk_levels, since, until, min_risk_score)
+        projection = {field: 1 for field in fields} if fields else None
+        cursor = self.collection(RECORDS_COLLECTION).find(query, projection)
+        cursor = cursor.sort('createdAt', -1).batch_size(self.batch_size)
+        if limit:
+            cursor = cursor.limit(int(limit))
+
+        read = 0
+        try:
+            for document in cursor:
+                read += 1
+                yield record_analysis(document)
+        finally:
+            cursor.close()
+            with self._lock:
+                self._stats['documents_read'] += read
+
+    def load_records(self, **filters):
+        """List of stored analyses (see iter_records)."""
+        return list(self.iter_records(**filters))
+
+    def load_statistics(self, year=None, weeks=None):
+        """Weekly statistics documents, most recent first."""
+        query = {'year': int(year)} if year else {}
+        cursor = self.collection(STATISTICS_COLLECTION).find(query, {'_id': 0, '__v': 0})
+        cursor = cursor.sort([('year', -1), ('weekNumber', -1)]).batch_size(self.batch_size)
+        if weeks:
+            cursor = cursor.limit(int(weeks))
+        return list(cursor)
+
+    def insert_many(self, collection_name, documents):
+        """
+        Unordered bulk insert in batches of `write_batch_size`.
+
+        Returns:
+            dict: inserted, duplicates (existing _ids) and other write errors
+        """
+        from pymongo.errors import BulkWriteError
+
+        collection = self.collection(collection_name)
+        result = {'inserted': 0, 'duplicates': 0, 'errors': 0}
+        batch = []
+
+        def flush():
+            try:
+                result['inserted'] += len(collection.insert_many(batch, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                details = e.details
+                result['inserted'] += details.get('nInserted', 0)
+                for error in details.get('writeErrors', []):
+                    if error.get('code') == DUPLICATE_KEY_ERROR:
+                        result['duplicates'] += 1
+                    else:
+                        result['errors'] += 1
+            batch.clear()
+
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= self.write_batch_size:
+                flush()
+        if batch:
+            flush()
+
+        with self._lock:
+            self._stats['documents_written'] += result['inserted']
+            self._stats['duplicates'] += result['duplicates']
+            self._stats['write_errors'] += result['errors']
+        return result
+
+    def stats(self):
+        """Read/write counters (does not touch the server)."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['connected'] = self._client is not None
+        stats['batch_size'] = self.batch_size
+        stats['generated_at'] = datetime.now().isoformat()
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+def record_filters(data):
+    """iter_records keyword arguments taken from a request's "filters" object."""
+    filters = (data or {}).get('filters') or {}
+    allowed = ('risk_levels', 'since', 'until', 'min_risk_score', 'limit')
+    return {key: filters[key] for key in allowed if filters.get(key) is not None}
+
+
+def build_record_query(risk_levels=None, since=None, until=None, min_risk_score=None):
+    """Server-side filter document for the records collection."""
+    query = {}
+    if risk_levels:
+        variants = set()
+        for level in risk_levels:
+            level = str(level)
+            variants.update((level, level.lower(), level.title(), level.upper()))
+        query['analysis.risk_assessment.level'] = {'$in': sorted(variants)}
+    if min_risk_score is not None:
+        query['analysis.risk_assessment.score'] = {'$gte': float(min_risk_score)}
+    created = {}
+    if since:
+        created['$gte'] = _as_datetime(since)
+    if until:
+        created['$lte'] = _as_datetime(until)
+    if created:
+        query['createdAt'] = created
+    return query
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def record_analysis(document):
+    """A records document flattened to its analysis plus id and saved_at."""
+    analysis = dict(document.get('analysis') or {})
+    analysis['id'] = str(document.get('_id'))
+    saved_at = document.get('createdAt')
+    if saved_at is not None:
+        analysis['saved_at'] = saved_at.isoformat() if hasattr(saved_at, 'isoformat') else saved_at
+    return analysis
+
+
+def analysis_summary(analysis):
+    """
+    Flat form used by ImpactAnalytics and the cohort engine:
+    risk_score, risk_level, age, diseases, medications, symptoms, date.
+    """
+    risk = analysis.get('risk_assessment') or {}
+    entities = analysis.get('entities') or {}
+    return {
+        'risk_score': risk.get('score', 0),
+        'risk_level': risk.get('level', 'Unknown'),
+        'age': analysis.get('age', 0),
+        'diseases': entities.get('DISEASE', []),
+        'medications': entities.get('DRUG', []),
+        'symptoms': entities.get('SYMPTOM', []),
+        'date': analysis.get('saved_at')
+    }
+
+
+# Export for use in main app
+analysis_store = AnalysisStore(
+    config.MONGO_URI,
+    database=config.MONGO_DB or None,
+    batch_size=config.MONGO_BATCH_SIZE,
+    write_batch_size=config.MONGO_WRITE_BATCH_SIZE,
+    max_pool_size=config.MONGO_MAX_POOL_SIZE,
+    timeout_ms=config.MONGO_TIMEOUT_MS
+)
@@ -0,0 +1,106 @@
+"""
+CLARA Request Deadlines
+=======================
+Per-request deadlines for cooperative cancellation. A deadline comes from
+the caller (X-Request-Timeout-Ms: relative milliseconds, or
+X-Request-Deadline: absolute Unix epoch milliseconds) and/or the configured
+CLARA_REQUEST_TIMEOUT_MS; the earliest one wins.
+
+Long-running endpoints check the deadline between pipeline stages and
+between batch items, stop once it has passed and return what they have
+computed so far with "partial": true.
+"""
+
+import math
+import time
+
+from flask import g, has_request_context, request
+
+import config
+
+TIMEOUT_HEADER = 'X-Request-Timeout-Ms'
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+
+class DeadlineExceeded(Exception):
+    """Raised by Deadline.check; `stage` is the stage that was not started."""
+
+    def __init__(self, stage=None):
+        super().__init__(f'Deadline exceeded before {stage}' if stage else 'Deadline exceeded')
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Point in time after which work should stop. `expires_at` is on the
+    time.monotonic() clock; None never expires.
+    """
+
+    def __init__(self, expires_at=None):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds):
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def from_request(cls, headers, default_ms=0):
+        """Earliest of the header deadlines and the configured timeout."""
+        candidates = []
+        if default_ms and default_ms > 0:
+            candidates.append(default_ms / 1000)
+
+        timeout_ms = _parse_number(headers.get(TIMEOUT_HEADER))
+        if timeout_ms is not None:
+            candidates.append(timeout_ms / 1000)
+
+        deadline_ms = _parse_number(headers.get(DEADLINE_HEADER))
+        if deadline_ms is not None:
+            candidates.append(deadline_ms / 1000 - time.time())
+
+        if not candidates:
+            return cls()
+        return cls.after(min(candidates))
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, stage=None):
+        """Raise DeadlineExceeded if the deadline has passed."""
+        if self.expired:
+            raise DeadlineExceeded(stage)
+
+    def remaining(self):
+        """Seconds left (never negative), or None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def _parse_number(value):
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    # "nan" would make a deadline that never expires, "inf" one that never applies
+    return number if math.isfinite(number) else None
+
+
+def current_deadline():
+    """Deadline of the current request (no deadline outside a request)."""
+    if has_request_context():
+        deadline = g.get('deadline')
+        if deadline is not None:
+            return deadline
+    return Deadline()
+
+
+def init_app(app):
+    """Attach a deadline to every request before the other hooks run."""
+    def set_deadline():
+        g.deadline = Deadline.from_request(request.headers, config.REQUEST_TIMEOUT_MS)
+
+    app.before_request(set_deadline)
@@ -0,0 +1,200 @@
+"""
+CLARA Drug Interaction Engine
+=============================
+Interaction knowledge base loaded from a local file into a hashed pair
+index. Checking N medications costs at most N*(N-1)/2 dictionary lookups,
+independent of the size of the interaction database.
+
+Source format (CSV):
+    drug_a,drug_b,severity,message,action
+
+A pickled copy of the index is cached in the instance directory and reused
+while the source file is unchanged. Drug names in the source are canonical
+generic IDs; medication lists are mapped onto them with the medication
+normalizer, so brand names and abbreviations match too.
+"""
+
+import csv
+import os
+import pickle
+import threading
+
+import config
+from medication_normalizer import medication_normalizer
+
+CACHE_FORMAT_VERSION = 1
+
+# Severity levels, most severe first
+SEVERITY_RANK = {
+    'contraindicated': 0,
+    'major': 1,
+    'moderate': 2,
+    'minor': 3
+}
+
+DEFAULT_ACTION = 'Review medication combination with pharmacist'
+
+
+def normalize_drug(name):
+    """Normalize a medication name to its lookup ID."""
+    return ' '.join(name.lower().split())
+
+
+class InteractionKnowledgeBase:
+    """
+    Pairwise drug interaction index keyed by normalized drug IDs.
+    """
+
+    def __init__(self, source_path, cache_path=None, normalizer=None):
+        self.source_path = source_path
+        self.cache_path = cache_path
+        self.normalizer = normalizer or normalize_drug
+        self._pairs = None
+        self._lock = threading.Lock()
+        self.loaded_from = None
+
+    def load(self):
+        """Load the index (from the binary cache when it is fresh)."""
+        if self._pairs is not None:
+            return self
+        with self._lock:
+            if self._pairs is not None:
+                return self
+
+            if not os.path.exists(self.source_path):
+                print(f"Warning: interaction database not found: {self.source_path}")
+                self._pairs = {}
+                return self
+
+            signature = self._source_signature()
+            pairs = self._read_cache(signature)
+            if pairs is None:
+                pairs = self._read_source()
+                self._write_cache(signature, pairs)
+                self.loaded_from = self.source_path
+            else:
+                self.loaded_from = self.cache_path
+            self._pairs = pairs
+        return self
+
+    @property
+    def size(self):
+        return len(self.load()._pairs)
+
+    def lookup(self, drug_a, drug_b):
+        """Interaction record for two normalized drug IDs, or None."""
+        key = (drug_a, drug_b) if drug_a <= drug_b else (drug_b, drug_a)
+        return self.load()._pairs.get(key)
+
+    def check(self, medications):
+        """
+        Find all known interactions among a medication list.
+
+        Returns:
+            list: interactions sorted by severity, most severe first
+        """
+        drug_ids = []
+        seen = set()
+        for medication in medications:
+            drug_id = self.normalizer(medication)
+            if drug_id and drug_id not in seen:
+                seen.add(drug_id)
+                drug_ids.append(drug_id)
+        return self.check_ids(drug_ids)
+
+    def check_ids(self, drug_ids):
+        """check() for a list that is already normalized and de-duplicated."""
+        pairs = self.load()._pairs
+        interactions = []
+        for i, drug_a in enumerate(drug_ids):
+            for drug_b in drug_ids[i + 1:]:
+                key = (drug_a, drug_b) if drug_a <= drug_b else (drug_b, drug_a)
+                record = pairs.get(key)
+                if record is not None:
+                    interactions.append(self._interaction(key, record))
+
+        interactions.sort(key=lambda x: SEVERITY_RANK.get(x['severity'], len(SEVERITY_RANK)))
+        return interactions
+
+    def interactions_with(self, drug_id, drug_ids):
+        """
+        Known interactions between one normalized drug ID and each of
+        `drug_ids` (in that order, unsorted). Used to check only the pairs a
+        newly added drug creates.
+        """
+        pairs = self.load()._pairs
+        interactions = []
+        for other in drug_ids:
+            if other == drug_id:
+                continue
+            key = (drug_id, other) if drug_id <= other else (other, drug_id)
+            record = pairs.get(key)
+            if record is not None:
+                interactions.append(self._interaction(key, record))
+        return interactions
+
+    def _interaction(self, key, record):
+        severity, message, action = record
+        return {
+            'drugs': list(key),
+            'severity': severity,
+            'message': message,
+            'action': action
+        }
+
+    def _read_source(self):
+        pairs = {}
+        with open(self.source_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                drug_a = normalize_drug(row['drug_a'])
+                drug_b = normalize_drug(row['drug_b'])
+                if not drug_a or not drug_b or drug_a == drug_b:
+                    continue
+                severity = row.get('severity', '').strip().lower() or 'moderate'
+                if severity not in SEVERITY_RANK:
+                    raise ValueError(f'Unknown interaction severity: {severity}')
+                key = (drug_a, drug_b) if drug_a <= drug_b else (drug_b, drug_a)
+                existing = pairs.get(key)
+                if existing is None or SEVERITY_RANK[severity] < SEVERITY_RANK[existing[0]]:
+                    pairs[key] = (
+                        severity,
+                        row.get('message', '').strip() or f'{drug_a.title()} + {drug_b.title()} interaction',
+                        row.get('action', '').strip() or DEFAULT_ACTION
+                    )
+        return pairs
+
+    def _source_signature(self):
+        stat = os.stat(self.source_path)
+        return (CACHE_FORMAT_VERSION, os.path.abspath(self.source_path), stat.st_mtime_ns, stat.st_size)
+
+    def _read_cache(self, signature):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except Exception:
+            return None
+        if cached.get('signature') != signature:
+            return None
+        return cached['pairs']
+
+    def _write_cache(self, signature, pairs):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'signature': signature, 'pairs': pairs}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: could not write interaction cache: {e}")
+
+
+# Export for use in main app
+interaction_kb = InteractionKnowledgeBase(
+    config.INTERACTIONS_PATH,
+    cache_path=os.path.join(config.INSTANCE_DIR, 'drug_interactions.cache.pickle'),
+    normalizer=medication_normalizer.normalize
+)
@@ -0,0 +1,206 @@
+"""
+CLARA Fuzzy Term Matching
+=========================
+SymSpell-style spelling correction for speech-to-text transcripts
+("metforman" -> "metformin", "lisinipril" -> "lisinopril").
+
+Every vocabulary word is indexed under all of its deletions up to the maximum
+edit distance. A transcript token is corrected by generating its own
+deletions and looking them up, so the cost per token depends on the token
+length and not on the vocabulary size. Candidates are verified with the
+Damerau-Levenshtein distance. Corrections are cached per token.
+
+Allowed edit distance by token length:
+    < 5 characters   exact only
+    5-8 characters   1
+    > 8 characters   2
+"""
+
+import re
+import threading
+
+MAX_DISTANCE = 2
+CORRECTION_CACHE_SIZE = 50000
+
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+# Ordinary words within one or two edits of a clinical term
+PROTECTED_WORDS = frozenset([
+    'injection', 'injections', 'infect', 'infected', 'affection', 'inflection',
+    'breathe', 'breathing', 'coughing', 'swollen', 'rashes', 'itchy'
+])
+
+
+def allowed_distance(token):
+    """Maximum edit distance tolerated for a token of this length."""
+    length = len(token)
+    if length < 5:
+        return 0
+    if length <= 8:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment (Damerau-Levenshtein) distance, or limit + 1
+    as soon as the distance is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Only cells within `limit` of the diagonal can stay under the limit
+    over = limit + 1
+    previous_previous = None
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous[j - 2] + 1 < value):
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous_previous, previous = previous, current
+    return min(previous[-1], over)
+
+
+def _deletes(word, distance):
+    """All strings reachable from `word` by up to `distance` deletions."""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        next_frontier = set()
+        for item in frontier:
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class FuzzyMatcher:
+    """
+    Deletion index over the words of the entity vocabularies.
+    Vocabulary sources are registered up front and indexed on first use.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self._words = None
+        self._deletes = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def register_vocabulary(self, name, terms):
+        """
+        Add a vocabulary: a list of terms, or a callable returning one
+        (evaluated when the index is built).
+        """
+        with self._lock:
+            self._sources[name] = terms
+            self._words = None
+            self._deletes = None
+            self._cache = {}
+
+    @property
+    def vocabulary_size(self):
+        self._ensure_index()
+        return len(self._words)
+
+    def correct_word(self, token):
+        """
+        Closest vocabulary word for a token, or None when the token is known,
+        too short, or has no candidate within the allowed distance.
+
+        Returns:
+            tuple: (word, distance) or None
+        """
+        cache = self._cache
+        if token in cache:
+            return cache[token]
+
+        words, deletes = self._ensure_index()
+        result = None
+        limit = allowed_distance(token)
+        if limit and not self._is_known(token, words):
+            candidates = set()
+            for variant in _deletes(token, limit):
+                candidates.update(deletes.get(variant, ()))
+            best = None
+            for candidate in candidates:
+                # Speech-to-text errors rarely change the first letter
+                if candidate[0] != token[0]:
+                    continue
+                distance = edit_distance(token, candidate, limit)
+                if distance <= limit and (best is None or (distance, candidate) < best):
+                    best = (distance, candidate)
+            if best is not None:
+                result = (best[1], best[0])
+
+        if len(cache) >= CORRECTION_CACHE_SIZE:
+            cache.clear()
+        cache[token] = result
+        return result
+
+    def correct_text(self, text):
+        """
+        Replace misspelled words in lowercase text with vocabulary words.
+
+        Returns:
+            tuple: (corrected text, list of corrections)
+        """
+        corrections = []
+
+        def replace(match):
+            token = match.group(0)
+            correction = self.correct_word(token)
+            if correction is None:
+                return token
+            word, distance = correction
+            corrections.append({'original': token, 'corrected': word, 'distance': distance})
+            return word
+
+        return WORD_PATTERN.sub(replace, text), corrections
+
+    def _is_known(self, token, words):
+        """Vocabulary words, their plurals and protected ordinary words are left alone."""
+        return (
+            token in words or token in PROTECTED_WORDS
+            or (token.endswith('s') and token[:-1] in words)
+            or (token.endswith('es') and token[:-2] in words)
+        )
+
+    def _ensure_index(self):
+        if self._deletes is not None:
+            return self._words, self._deletes
+        with self._lock:
+            if self._deletes is None:
+                words = set()
+                for terms in self._sources.values():
+                    if callable(terms):
+                        terms = terms()
+                    for term in terms:
+                        words.update(WORD_PATTERN.findall(term.lower()))
+
+                # A 5-letter token may reach a 4-letter word within one edit
+                deletes = {}
+                for word in words:
+                    if len(word) < 4:
+                        continue
+                    for variant in _deletes(word, MAX_DISTANCE):
+                        deletes.setdefault(variant, []).append(word)
+                self._words = frozenset(words)
+                self._deletes = deletes
+        return self._words, self._deletes
+
+
+# Export for use in main app
+fuzzy_matcher = FuzzyMatcher()
@@ -0,0 +1,285 @@
+"""
+CLARA ICD-10-CM Index
+=====================
+Local ICD-10-CM terminology indexed for code mapping:
+
+- exact code and alias lookups (dictionary)
+- an inverted token index over code descriptions for free-text mentions
+- a sorted code list for hierarchy (prefix) queries
+
+A curated subset ships in data/. Point CLARA_ICD10_PATH at a full CMS release
+(icd10cm_codes_<year>.txt or icd10cm_order_<year>.txt, ~74k codes) for
+complete coverage. The parsed index is pickled in the instance directory and
+reused while the source files are unchanged.
+"""
+
+from bisect import bisect_left
+import csv
+import os
+import pickle
+import re
+import threading
+
+import config
+
+CACHE_FORMAT_VERSION = 1
+
+CODE_PATTERN = re.compile(r'^[A-Z][0-9][0-9A-Z](\.?[0-9A-Z]{1,4})?$')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Ignored when matching free-text mentions against descriptions
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'as', 'by', 'due', 'for', 'in', 'of', 'on', 'or',
+    'the', 'to', 'with', 'without', 'patient', 'history', 'known'
+])
+
+MAPPING_CACHE_SIZE = 10000
+
+
+def format_code(code):
+    """Normalize 'e119' / 'E11.9' to 'E11.9'."""
+    code = code.strip().upper().replace('.', '')
+    return f'{code[:3]}.{code[3:]}' if len(code) > 3 else code
+
+
+def _tokens(text):
+    return TOKEN_PATTERN.findall(text.lower().replace("'s", ' '))
+
+
+def _term_key(text):
+    return ' '.join(_tokens(text))
+
+
+def _parse_line(line):
+    """
+    Parse one line of a CMS code file.
+
+    Returns:
+        tuple: (code, description, billable) or None
+    """
+    line = line.rstrip('\n')
+    if not line.strip():
+        return None
+    # Order file: 5-digit order number, code, header flag, short and long descriptions
+    if len(line) > 16 and line[:5].isdigit() and line[14] in '01':
+        code = line[6:13].strip()
+        description = line[77:].strip() or line[16:76].strip()
+        return format_code(code), description, line[14] == '1'
+    code, _, description = line.strip().partition(' ')
+    return format_code(code), description.strip(), True
+
+
+class Icd10Index:
+    """
+    ICD-10-CM code, alias, token and hierarchy index.
+    """
+
+    def __init__(self, source_path, alias_path=None, cache_path=None):
+        self.source_path = source_path
+        self.alias_path = alias_path
+        self.cache_path = cache_path
+        self._index = None
+        self._lock = threading.Lock()
+        self._mapping_cache = {}
+        self.loaded_from = None
+
+    def load(self):
+        """Load the index (from the binary cache when it is fresh)."""
+        if self._index is not None:
+            return self
+        with self._lock:
+            if self._index is not None:
+                return self
+
+            if not os.path.exists(self.source_path):
+                print(f"Warning: ICD-10 code file not found: {self.source_path}")
+                self._index = self._build([], {})
+                return self
+
+            signature = self._source_signature()
+            index = self._read_cache(signature)
+            if index is None:
+                index = self._build(self._read_codes(), self._read_aliases())
+                self._write_cache(signature, index)
+                self.loaded_from = self.source_path
+            else:
+                self.loaded_from = self.cache_path
+            self._index = index
+        return self
+
+    @property
+    def size(self):
+        return len(self.load()._index['codes'])
+
+    def describe(self, code):
+        """Code details, or None for an unknown code."""
+        code = format_code(code)
+        entry = self.load()._index['codes'].get(code)
+        if entry is None:
+            return None
+        category = self._index['codes'].get(code[:3])
+        return {
+            'code': code,
+            'description': entry[0],
+            'category': code[:3],
+            'category_description': category[0] if category else None
+        }
+
+    def lookup(self, term):
+        """
+        Map a disease mention or code to its best ICD-10-CM code.
+        Aliases and exact codes are single dictionary lookups; other mentions
+        intersect token postings and pick the most general matching code.
+
+        Returns:
+            dict: code details plus the matched term, or None
+        """
+        code = self.code_for(term)
+        if code is None:
+            return None
+        result = self.describe(code)
+        result['term'] = term
+        return result
+
+    def code_for(self, term):
+        """Best code for a mention as a plain string, or None (cached per term)."""
+        key = _term_key(term)
+        if not key:
+            return None
+        if key in self._mapping_cache:
+            return self._mapping_cache[key]
+
+        code = self._resolve(key, term)
+        if len(self._mapping_cache) >= MAPPING_CACHE_SIZE:
+            self._mapping_cache.clear()
+        self._mapping_cache[key] = code
+        return code
+
+    def map_terms(self, terms):
+        """Map each term; unmapped terms are left out."""
+        mappings = []
+        for term in terms:
+            mapping = self.lookup(term)
+            if mapping is not None:
+                mappings.append(mapping)
+        return mappings
+
+    def descendants(self, prefix):
+        """All indexed codes under a hierarchy prefix ('I50', 'E11.6', ...)."""
+        prefix = format_code(prefix)
+        codes = self.load()._index['sorted_codes']
+        start = bisect_left(codes, prefix)
+        end = start
+        while end < len(codes) and codes[end].startswith(prefix):
+            end += 1
+        return codes[start:end]
+
+    def _resolve(self, key, term):
+        index = self.load()._index
+        code = index['aliases'].get(key)
+        if code is None and CODE_PATTERN.match(term.strip().upper()):
+            candidate = format_code(term)
+            if candidate in index['codes']:
+                code = candidate
+        if code is None:
+            code = self._search_tokens(index, key)
+        return code
+
+    def _search_tokens(self, index, key):
+        tokens = [t for t in key.split() if t not in STOPWORDS]
+        if not tokens:
+            return None
+        postings = index['tokens']
+        lists = []
+        for token in tokens:
+            posting = postings.get(token)
+            if not posting:
+                return None
+            lists.append(posting)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for posting in lists[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return None
+
+        codes = index['codes']
+        # Prefer billable codes with the shortest (most general) description
+        return min(candidates, key=lambda c: (not codes[c][1], codes[c][2], len(c), c))
+
+    def _build(self, entries, aliases):
+        codes = {}
+        tokens = {}
+        for code, description, billable in entries:
+            description_tokens = set(_tokens(description))
+            codes[code] = (description, billable, len(description_tokens))
+            for token in description_tokens:
+                tokens.setdefault(token, []).append(code)
+        return {
+            'codes': codes,
+            'sorted_codes': sorted(codes),
+            'tokens': {token: tuple(posting) for token, posting in tokens.items()},
+            'aliases': {term: code for term, code in aliases.items() if code in codes}
+        }
+
+    def _read_codes(self):
+        entries = []
+        with open(self.source_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                entry = _parse_line(line)
+                if entry is not None:
+                    entries.append(entry)
+        return entries
+
+    def _read_aliases(self):
+        aliases = {}
+        if not self.alias_path or not os.path.exists(self.alias_path):
+            return aliases
+        with open(self.alias_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                key = _term_key(row['term'])
+                if key and row.get('code'):
+                    aliases[key] = format_code(row['code'])
+        return aliases
+
+    def _source_signature(self):
+        signature = [CACHE_FORMAT_VERSION]
+        for path in (self.source_path, self.alias_path):
+            if path and os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+            else:
+                signature.append(None)
+        return tuple(signature)
+
+    def _read_cache(self, signature):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except Exception:
+            return None
+        if cached.get('signature') != signature:
+            return None
+        return cached['index']
+
+    def _write_cache(self, signature, index):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'signature': signature, 'index': index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: could not write ICD-10 index cache: {e}")
+
+
+# Export for use in main app
+icd10_index = Icd10Index(
+    config.ICD10_PATH,
+    alias_path=config.ICD10_ALIASES_PATH,
+    cache_path=os.path.join(config.INSTANCE_DIR, 'icd10_index.cache.pickle')
+)
@@ -0,0 +1,486 @@
+"""
+CLARA Learned Risk Model
+========================
+Training pipeline and fast inference for a scikit-learn risk model.
+
+Patients are encoded into a fixed feature vector (age, conditions,
+medications, symptoms), a classifier is fitted on labeled outcomes and the
+artifact is persisted with joblib. At serving time the artifact is
+memory-mapped; linear models are scored directly from their coefficients and
+gradient boosting models by walking their trees in plain Python.
+
+Usage:
+    python learned_risk_model.py train --data patients.jsonl --out models/risk_model.joblib
+    python learned_risk_model.py train --synthetic 20000 --out models/risk_model.joblib
+    python learned_risk_model.py benchmark --artifact models/risk_model.joblib
+"""
+
+from datetime import datetime
+import json
+import math
+import os
+import random
+import sys
+import time
+
+ARTIFACT_FORMAT_VERSION = 1
+
+LINEAR_MODEL_TYPES = ('logistic_regression',)
+MODEL_TYPES = ('logistic_regression', 'gradient_boosting')
+
+
+class RiskFeatureEncoder:
+    """
+    Encodes patient dicts into a fixed-length feature vector.
+    Term matching mirrors the heuristic model: a condition or symptom term
+    matches when it is a substring of the reported name.
+    """
+
+    BASE_FEATURES = [
+        'age_scaled',
+        'age_over_65',
+        'age_over_75',
+        'condition_count',
+        'medication_count',
+        'polypharmacy'
+    ]
+
+    def __init__(self, disease_terms, symptom_terms, medication_terms):
+        self.disease_terms = list(disease_terms)
+        self.symptom_terms = list(symptom_terms)
+        self.medication_terms = list(medication_terms)
+
+        self.feature_names = (
+            list(self.BASE_FEATURES) +
+            [f'condition:{t}' for t in self.disease_terms] +
+            [f'symptom:{t}' for t in self.symptom_terms] +
+            [f'medication:{t}' for t in self.medication_terms]
+        )
+        self._disease_offset = len(self.BASE_FEATURES)
+        self._symptom_offset = self._disease_offset + len(self.disease_terms)
+        self._medication_index = {
+            term: self._symptom_offset + len(self.symptom_terms) + i
+            for i, term in enumerate(self.medication_terms)
+        }
+
+    @property
+    def size(self):
+        return len(self.feature_names)
+
+    def active_features(self, patient):
+        """
+        Sparse encoding of one patient.
+
+        Returns:
+            list: (feature index, value) pairs for non-zero features
+        """
+        age = patient.get('age', 0) or 0
+        diseases = patient.get('diseases', []) or []
+        medications = patient.get('medications', []) or []
+        symptoms = patient.get('symptoms', []) or []
+
+        active = []
+        if age:
+            active.append((0, min(age, 100) / 100.0))
+        if age >= 65:
+            active.append((1, 1.0))
+        if age >= 75:
+            active.append((2, 1.0))
+        if diseases:
+            active.append((3, min(len(diseases), 10) / 10.0))
+        if medications:
+            active.append((4, min(len(medications), 10) / 10.0))
+        if len(medications) >= 5:
+            active.append((5, 1.0))
+
+        seen = set()
+        for disease in diseases:
+            disease_lower = disease.lower()
+            for i, term in enumerate(self.disease_terms):
+                if term in disease_lower:
+                    seen.add(self._disease_offset + i)
+                    break
+        for symptom in symptoms:
+            symptom_lower = symptom.lower()
+            for i, term in enumerate(self.symptom_terms):
+                if term in symptom_lower:
+                    seen.add(self._symptom_offset + i)
+                    break
+        for medication in medications:
+            index = self._medication_index.get(medication.strip().lower())
+            if index is not None:
+                seen.add(index)
+
+        active.extend((index, 1.0) for index in sorted(seen))
+        return active
+
+    def transform(self, patients):
+        """Encode many patients into a dense (n_patients x n_features) matrix."""
+        import numpy as np
+
+        matrix = np.zeros((len(patients), self.size), dtype=np.float64)
+        for row, patient in enumerate(patients):
+            for index, value in self.active_features(patient):
+                matrix[row, index] = value
+        return matrix
+
+    def describe(self, index, patient):
+        """Human-readable factor label for a feature."""
+        name = self.feature_names[index]
+        age = patient.get('age', 0)
+        if name == 'age_over_75':
+            return f'Advanced age ({age} years)'
+        if name in ('age_over_65', 'age_scaled'):
+            return f'Age ({age} years)'
+        if name == 'polypharmacy':
+            return f"Polypharmacy ({len(patient.get('medications', []))} medications)"
+        if name == 'medication_count':
+            return f"Medication count ({len(patient.get('medications', []))})"
+        if name == 'condition_count':
+            return f"Condition count ({len(patient.get('diseases', []))})"
+        kind, term = name.split(':', 1)
+        return f'{kind.title()}: {term}'
+
+    def to_dict(self):
+        return {
+            'disease_terms': self.disease_terms,
+            'symptom_terms': self.symptom_terms,
+            'medication_terms': self.medication_terms
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['disease_terms'], data['symptom_terms'], data['medication_terms'])
+
+
+class LearnedRiskModel:
+    """
+    Serving wrapper around a persisted risk model artifact.
+    Linear models are scored from their coefficient vector and gradient
+    boosting models from their tree node arrays, which avoids
+    scikit-learn's per-call validation overhead on single patients.
+    """
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.encoder = RiskFeatureEncoder.from_dict(artifact['encoder'])
+        self.model_type = artifact['model_type']
+        self.version = artifact['version']
+        self.estimator = artifact['estimator']
+
+        self._coef = None
+        self._coef_list = None
+        self._intercept = 0.0
+        self._trees = None
+        if self.model_type in LINEAR_MODEL_TYPES:
+            self._coef = artifact['coef']
+            self._coef_list = [float(c) for c in self._coef]
+            self._intercept = float(artifact['intercept'])
+        else:
+            importances = getattr(self.estimator, 'feature_importances_', None)
+            self._importances = list(importances) if importances is not None else [0.0] * self.encoder.size
+            self._trees = _compile_trees(self.estimator)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an artifact, memory-mapping its arrays when possible."""
+        import joblib
+
+        artifact = joblib.load(path, mmap_mode='r' if mmap else None)
+        if artifact.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported risk model artifact format: {artifact.get('format_version')}")
+        return cls(artifact)
+
+    def predict_proba(self, patient):
+        """Probability of the high-risk outcome for one patient."""
+        if self._coef_list is not None:
+            z = self._intercept
+            for index, value in self.encoder.active_features(patient):
+                z += self._coef_list[index] * value
+            return _sigmoid(z)
+        if self._trees is not None:
+            row = [0.0] * self.encoder.size
+            for index, value in self.encoder.active_features(patient):
+                row[index] = value
+            baseline, trees = self._trees
+            z = baseline
+            for feature, threshold, left, right, leaf_value in trees:
+                node = 0
+                while feature[node] >= 0:
+                    node = left[node] if row[feature[node]] <= threshold[node] else right[node]
+                z += leaf_value[node]
+            return _sigmoid(z)
+        matrix = self.encoder.transform([patient])
+        return float(self.estimator.predict_proba(matrix)[0, 1])
+
+    def predict_proba_batch(self, patients):
+        """Probabilities for many patients in one vectorized pass."""
+        import numpy as np
+
+        matrix = self.encoder.transform(patients)
+        if self._coef is not None:
+            z = matrix @ self._coef + self._intercept
+            return 1.0 / (1.0 + np.exp(-z))
+        return self.estimator.predict_proba(matrix)[:, 1]
+
+    def top_factors(self, patient, limit=5):
+        """Features that pushed this patient's risk up the most."""
+        contributions = []
+        for index, value in self.encoder.active_features(patient):
+            if self._coef_list is not None:
+                weight = self._coef_list[index] * value
+            else:
+                weight = self._importances[index] * value
+            if weight > 0:
+                contributions.append((weight, index))
+        contributions.sort(reverse=True)
+
+        factors = []
+        for _, index in contributions:
+            label = self.encoder.describe(index, patient)
+            if label not in factors:
+                factors.append(label)
+            if len(factors) >= limit:
+                break
+        return factors
+
+
+def _compile_trees(estimator):
+    """
+    (baseline, trees) for a binary HistGradientBoostingClassifier, each tree as
+    plain lists (split feature or -1 at leaves, threshold, left, right, leaf
+    value); None for other estimators or when the fitted layout is unknown.
+    Features are never missing or categorical, so a row goes left when its
+    value is <= the split threshold, as in scikit-learn's own predictor.
+    """
+    try:
+        if getattr(estimator, 'n_trees_per_iteration_', None) != 1:
+            return None
+        baseline = float(estimator._baseline_prediction.ravel()[0])
+        trees = []
+        for (predictor,) in estimator._predictors:
+            nodes = predictor.nodes
+            if nodes['is_categorical'].any():
+                return None
+            is_leaf = nodes['is_leaf'].tolist()
+            trees.append((
+                [-1 if leaf else int(f) for leaf, f in zip(is_leaf, nodes['feature_idx'].tolist())],
+                nodes['num_threshold'].tolist(),
+                nodes['left'].tolist(),
+                nodes['right'].tolist(),
+                nodes['value'].tolist()
+            ))
+    except (AttributeError, KeyError, ValueError):
+        return None
+    return baseline, tuple(trees)
+
+
+def _sigmoid(z):
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    ez = math.exp(z)
+    return ez / (1.0 + ez)
+
+
+# ============================================
+# Training
+# ============================================
+
+def default_encoder():
+    """Build the encoder vocabulary from the service's clinical term lists."""
+    from risk_prediction import RiskPredictionModel
+    from clinical_nlp import ClinicalNLPAnalyzer
+
+    return RiskFeatureEncoder(
+        disease_terms=RiskPredictionModel.DISEASE_SEVERITY.keys(),
+        symptom_terms=RiskPredictionModel.SYMPTOM_WEIGHTS.keys(),
+        medication_terms=ClinicalNLPAnalyzer.MEDICATION_KEYWORDS
+    )
+
+
+def train_risk_model(patients, labels, model_type='logistic_regression', encoder=None,
+                     test_fraction=0.2, random_state=42, training_source='labeled'):
+    """
+    Fit a risk classifier on labeled patients.
+
+    Args:
+        patients: list of patient dicts (age, diseases, medications, symptoms)
+        labels: list of 0/1 outcomes (1 = high-risk outcome)
+        model_type: 'logistic_regression' or 'gradient_boosting'
+
+    Returns:
+        dict: artifact ready for save_artifact()
+    """
+    import numpy as np
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import roc_auc_score, brier_score_loss, accuracy_score
+
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f'Unknown model type: {model_type}')
+
+    encoder = encoder or default_encoder()
+    X = encoder.transform(patients)
+    y = np.asarray(labels, dtype=np.int8)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_fraction, random_state=random_state, stratify=y
+    )
+
+    if model_type == 'logistic_regression':
+        estimator = LogisticRegression(max_iter=1000, C=1.0)
+    else:
+        estimator = HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1,
+                                                   random_state=random_state)
+    estimator.fit(X_train, y_train)
+
+    probabilities = estimator.predict_proba(X_test)[:, 1]
+    metrics = {
+        'auc': round(float(roc_auc_score(y_test, probabilities)), 4),
+        'brier': round(float(brier_score_loss(y_test, probabilities)), 4),
+        'accuracy': round(float(accuracy_score(y_test, probabilities >= 0.5)), 4),
+        'train_rows': int(len(y_train)),
+        'test_rows': int(len(y_test)),
+        'positive_rate': round(float(y.mean()), 4)
+    }
+
+    artifact = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_type': model_type,
+        'version': f"ml-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        'trained_at': datetime.now().isoformat(),
+        'training_source': training_source,
+        'encoder': encoder.to_dict(),
+        'feature_names': encoder.feature_names,
+        'estimator': estimator,
+        'metrics': metrics
+    }
+    if model_type in LINEAR_MODEL_TYPES:
+        artifact['coef'] = np.ascontiguousarray(estimator.coef_[0], dtype=np.float64)
+        artifact['intercept'] = float(estimator.intercept_[0])
+
+    return artifact
+
+
+def save_artifact(artifact, path):
+    """Persist an artifact uncompressed so its arrays can be memory-mapped."""
+    import joblib
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_training_data(path):
+    """
+    Read labeled patients from a JSONL file.
+    Each line: {"age": 70, "diseases": [...], "medications": [...], "symptoms": [...], "label": 1}
+    """
+    patients, labels = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            label = record.get('label', record.get('outcome'))
+            if label is None:
+                continue
+            patients.append(record)
+            labels.append(int(label))
+    return patients, labels
+
+
+def synthetic_cohort(n, seed=42, noise=8.0):
+    """
+    Generate a synthetic cohort labeled by the heuristic score plus noise.
+    Only useful to bootstrap the pipeline before real outcome labels exist.
+    """
+    from risk_prediction import RiskPredictionModel
+    from clinical_nlp import ClinicalNLPAnalyzer
+
+    rng = random.Random(seed)
+    heuristic = RiskPredictionModel()
+    diseases = [d.title() for d in RiskPredictionModel.DISEASE_SEVERITY]
+    symptoms = [s.capitalize() for s in RiskPredictionModel.SYMPTOM_WEIGHTS]
+    medications = [m.title() for m in ClinicalNLPAnalyzer.MEDICATION_KEYWORDS]
+
+    patients, labels = [], []
+    for _ in range(n):
+        patient = {
+            'age': rng.randint(18, 95),
+            'diseases': rng.sample(diseases, rng.choice([0, 1, 1, 2, 2, 3, 4])),
+            'medications': rng.sample(medications, rng.randint(0, 8)),
+            'symptoms': rng.sample(symptoms, rng.choice([0, 0, 1, 1, 2, 3]))
+        }
+        score = heuristic._predict_heuristic(patient)['score'] + rng.gauss(0, noise)
+        patients.append(patient)
+        labels.append(1 if score >= 50 else 0)
+    return patients, labels
+
+
+def benchmark(model, patients, repeats=3):
+    """Measure single-patient and batch inference latency."""
+    single_best = float('inf')
+    batch_best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for patient in patients:
+            model.predict_proba(patient)
+        single_best = min(single_best, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        model.predict_proba_batch(patients)
+        batch_best = min(batch_best, time.perf_counter() - started)
+
+    return {
+        'patients': len(patients),
+        'single_us_per_patient': round(single_best / len(patients) * 1e6, 2),
+        'batch_us_per_patient': round(batch_best / len(patients) * 1e6, 2)
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train and benchmark the CLARA risk model')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train = subparsers.add_parser('train', help='Fit and persist a risk model')
+    source = train.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help='Labeled patients (JSONL)')
+    source.add_argument('--synthetic', type=int, help='Bootstrap with N heuristic-labeled synthetic patients')
+    train.add_argument('--model', choices=MODEL_TYPES, default='logistic_regression')
+    train.add_argument('--out', default=os.path.join('models', 'risk_model.joblib'))
+
+    bench = subparsers.add_parser('benchmark', help='Measure inference latency')
+    bench.add_argument('--artifact', default=os.path.join('models', 'risk_model.joblib'))
+    bench.add_argument('--patients', type=int, default=10000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'train':
+        if args.data:
+            patients, labels = load_training_data(args.data)
+            training_source = os.path.basename(args.data)
+        else:
+            patients, labels = synthetic_cohort(args.synthetic)
+            training_source = 'synthetic-heuristic'
+        artifact = train_risk_model(patients, labels, model_type=args.model,
+                                    training_source=training_source)
+        save_artifact(artifact, args.out)
+        print(f"Saved {artifact['model_type']} model {artifact['version']} to {args.out}")
+        print(f"   Holdout metrics: {artifact['metrics']}")
+    else:
+        model = LearnedRiskModel.load(args.artifact)
+        patients, _ = synthetic_cohort(args.patients, seed=7)
+        print(f"Benchmark ({model.model_type} {model.version}): {benchmark(model, patients)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
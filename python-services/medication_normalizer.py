@@ -0,0 +1,281 @@
+"""
+CLARA Medication Normalizer
+===========================
+Maps brand names, generics and common abbreviations ("Coumadin", "APAP",
+"Toprol XL") to canonical generic drug IDs ("warfarin", "acetaminophen",
+"metoprolol").
+
+The synonym table is compiled into a marisa-trie and memory-mapped from the
+instance directory, so every worker process shares one read-only copy of
+the index through the page cache. Without marisa-trie a plain in-process
+dictionary with the same prefix API is used.
+
+Source format (CSV):
+    synonym,canonical,extractable
+
+`extractable` is 0 for names that are not medication mentions in free text
+("alcohol", "potassium" as a lab value). They still normalize in explicit
+medication lists but are skipped when extracting from transcripts.
+"""
+
+import csv
+import json
+import os
+import threading
+
+import config
+
+INDEX_FORMAT_VERSION = 2
+
+
+def _normalize_text(text):
+    return ' '.join(text.lower().split())
+
+
+def _is_boundary(text, end):
+    return end >= len(text) or not text[end].isalnum()
+
+
+class _PrefixDict:
+    """Dictionary fallback exposing the subset of the RecordTrie API used here."""
+
+    def __init__(self, items):
+        self._records = {}
+        for key, record in items:
+            self._records.setdefault(key, []).append(record)
+        self._max_len = max((len(key) for key in self._records), default=0)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __getitem__(self, key):
+        return self._records[key]
+
+    def keys(self):
+        return list(self._records)
+
+    def prefixes(self, text):
+        records = self._records
+        return [
+            text[:end] for end in range(1, min(len(text), self._max_len) + 1)
+            if text[:end] in records
+        ]
+
+
+class MedicationNormalizer:
+    """
+    Synonym -> canonical drug ID index.
+    """
+
+    def __init__(self, source_path, index_path=None):
+        self.source_path = source_path
+        self.index_path = index_path
+        self._trie = None
+        self._canonical = ()
+        self._excluded = frozenset()
+        self._max_length = 0
+        self._lock = threading.Lock()
+        self.backend = None
+
+    def load(self):
+        """Open the index, rebuilding the trie file when the source changed."""
+        if self._trie is not None:
+            return self
+        with self._lock:
+            if self._trie is not None:
+                return self
+
+            if not os.path.exists(self.source_path):
+                print(f"Warning: medication synonym table not found: {self.source_path}")
+                self._canonical = ()
+                self._set_trie(_PrefixDict([]))
+                self.backend = 'empty'
+                return self
+
+            try:
+                import marisa_trie
+            except ImportError:
+                marisa_trie = None
+
+            if marisa_trie is not None and self.index_path:
+                try:
+                    self._canonical, self._excluded, trie = self._open_marisa(marisa_trie)
+                    self._set_trie(trie)
+                    self.backend = 'marisa-trie'
+                    return self
+                except Exception as e:
+                    print(f"Warning: could not open medication trie, using in-memory index: {e}")
+
+            synonyms, canonical, excluded = self._read_source()
+            self._canonical = tuple(canonical)
+            self._excluded = frozenset(excluded)
+            self._set_trie(_PrefixDict(synonyms))
+            self.backend = 'dict'
+        return self
+
+    @property
+    def size(self):
+        return len(self.load()._trie)
+
+    def synonyms(self):
+        """All indexed names (brands, generics, abbreviations)."""
+        return self.load()._trie.keys()
+
+    def extractable_synonyms(self):
+        """Indexed names that count as medication mentions in free text."""
+        excluded = self.load()._excluded
+        return [synonym for synonym in self._trie.keys() if synonym not in excluded]
+
+    def canonical(self, name):
+        """
+        Canonical drug ID for a medication name, or None when unknown.
+        Trailing strength/form text is ignored ("Toprol XL 50 mg" -> "metoprolol").
+        """
+        text = _normalize_text(name)
+        if not text:
+            return None
+        match = self._longest_match(text, 0)
+        return match[1] if match else None
+
+    def normalize(self, name):
+        """Canonical drug ID, or the whitespace/case-normalized name when unknown."""
+        return self.canonical(name) or _normalize_text(name)
+
+    def normalize_list(self, medications, cache=None):
+        """
+        Canonical IDs for a medication list, de-duplicated in first-seen order.
+        `cache` (a dict shared across calls) normalizes each distinct name once.
+        """
+        normalized = []
+        seen = set()
+        for medication in medications or []:
+            if cache is None:
+                drug_id = self.normalize(medication)
+            else:
+                drug_id = cache.get(medication)
+                if drug_id is None:
+                    drug_id = cache[medication] = self.normalize(medication)
+            if drug_id and drug_id not in seen:
+                seen.add(drug_id)
+                normalized.append(drug_id)
+        return normalized
+
+    def extract(self, text):
+        """
+        Find medications mentioned in free text.
+        One trie prefix lookup per token start; the longest synonym ending on a
+        token boundary wins and matching resumes after it. Non-extractable
+        names ("alcohol") are not matched.
+
+        Returns:
+            list: canonical drug IDs in order of first mention
+        """
+        text = _normalize_text(text)
+        found = []
+        seen = set()
+        position = 0
+        length = len(text)
+        while position < length:
+            if not text[position].isalnum() or (position > 0 and text[position - 1].isalnum()):
+                position += 1
+                continue
+            match = self._longest_match(text, position, self._excluded)
+            if match is None:
+                position += 1
+                continue
+            end, drug_id = match
+            if drug_id not in seen:
+                seen.add(drug_id)
+                found.append(drug_id)
+            position = end
+        return found
+
+    def _longest_match(self, text, start, excluded=()):
+        """(end offset, canonical ID) of the longest synonym at `start`, or None."""
+        trie = self.load()._trie
+        best = None
+        for prefix in trie.prefixes(text[start:start + self._max_length]):
+            if prefix in excluded:
+                continue
+            end = start + len(prefix)
+            if _is_boundary(text, end) and (best is None or len(prefix) > best[0]):
+                best = (len(prefix), prefix)
+        if best is None:
+            return None
+        index = trie[best[1]][0][0]
+        return start + best[0], self._canonical[index]
+
+    def _set_trie(self, trie):
+        # Prefix lookups only need as much text as the longest synonym
+        self._max_length = max((len(key) for key in trie.keys()), default=0)
+        self._trie = trie
+
+    def _read_source(self):
+        canonical_index = {}
+        synonyms = []
+        excluded = set()
+        with open(self.source_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                synonym = _normalize_text(row['synonym'])
+                canonical = _normalize_text(row['canonical'])
+                if not synonym or not canonical:
+                    continue
+                index = canonical_index.setdefault(canonical, len(canonical_index))
+                synonyms.append((synonym, (index,)))
+                if (row.get('extractable') or '1').strip() == '0':
+                    excluded.add(synonym)
+
+        # Every canonical ID resolves to itself, with or without hyphens
+        for canonical, index in canonical_index.items():
+            synonyms.append((canonical, (index,)))
+            if '-' in canonical:
+                synonyms.append((canonical.replace('-', ' '), (index,)))
+
+        unique = dict(synonyms)
+        return (
+            sorted(unique.items()),
+            sorted(canonical_index, key=canonical_index.get),
+            sorted(excluded)
+        )
+
+    def _source_signature(self):
+        stat = os.stat(self.source_path)
+        return [INDEX_FORMAT_VERSION, os.path.abspath(self.source_path), stat.st_mtime_ns, stat.st_size]
+
+    def _open_marisa(self, marisa_trie):
+        meta_path = f'{self.index_path}.json'
+        signature = self._source_signature()
+
+        meta = None
+        if os.path.exists(self.index_path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = None
+
+        if meta is None or meta.get('signature') != signature:
+            synonyms, canonical, excluded = self._read_source()
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+            marisa_trie.RecordTrie('<I', synonyms).save(tmp_path)
+            os.replace(tmp_path, self.index_path)
+            meta = {'signature': signature, 'canonical': canonical, 'excluded': excluded}
+            tmp_meta = f'{meta_path}.{os.getpid()}.tmp'
+            with open(tmp_meta, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+
+        trie = marisa_trie.RecordTrie('<I')
+        trie.mmap(self.index_path)
+        return tuple(meta['canonical']), frozenset(meta['excluded']), trie
+
+
+# Export for use in main app
+medication_normalizer = MedicationNormalizer(
+    config.MEDICATION_SYNONYMS_PATH,
+    index_path=os.path.join(config.INSTANCE_DIR, 'medication_synonyms.marisa')
+)
@@ -0,0 +1,282 @@
+"""
+CLARA Model Evaluation
+======================
+ROC, precision-recall and calibration evaluation of risk scores and outcome
+probabilities against labeled outcomes.
+
+Every threshold is evaluated at once: scores are sorted a single time
+(descending) and cumulative sums of the labels give the true and false
+positive counts at every cutoff, so the full curves cost O(N log N) instead
+of one confusion table per threshold. Calibration bins are a bincount.
+
+Usage:
+    python model_evaluation.py --data scored.csv --model risk
+    python model_evaluation.py --data outcomes.jsonl --model outcome --score-column probability
+    python model_evaluation.py --synthetic 1000000
+"""
+
+from datetime import datetime
+import json
+import os
+import sys
+import time
+
+import config
+
+# Score scale (to map scores to probabilities) and operating-point cutoffs per model
+MODEL_PRESETS = {
+    # predict_risk scores 0-100: Medium/High/Critical cutoffs
+    'risk': {'scale': 100.0, 'thresholds': (25, 50, 75)},
+    # OutcomePredictor probabilities: Low/Moderate/High cutoffs
+    'outcome': {'scale': 1.0, 'thresholds': (0.05, 0.15, 0.30)}
+}
+
+
+class ModelEvaluator:
+    """
+    Threshold-sweep evaluation of scores against 0/1 labels.
+    """
+
+    def __init__(self, curve_points=200, calibration_bins=10):
+        self.curve_points = max(2, curve_points)
+        self.calibration_bins = max(1, calibration_bins)
+
+    def evaluate(self, scores, labels, model='risk', thresholds=None, scale=None):
+        """
+        Full evaluation of one model's scores.
+
+        Args:
+            scores: array-like of scores (higher = more likely positive)
+            labels: array-like of 0/1 outcomes, same length
+            model: preset name ('risk' or 'outcome') for scale and thresholds
+            thresholds: operating points to report (default: the preset's cutoffs)
+            scale: score value that corresponds to probability 1 (default: the preset's)
+
+        Returns:
+            dict: auc, average_precision, brier, downsampled roc/pr curves,
+                operating points and calibration bins
+        """
+        import numpy as np
+
+        preset = MODEL_PRESETS.get(model)
+        if preset is None:
+            raise ValueError(f'Unknown model: {model}')
+        scores = np.asarray(scores, dtype=np.float64)
+        labels = np.asarray(labels, dtype=bool)
+        if scores.ndim != 1 or scores.shape != labels.shape:
+            raise ValueError('scores and labels must be equal-length lists')
+        positives = int(np.count_nonzero(labels))
+        negatives = int(labels.size - positives)
+        if positives == 0 or negatives == 0:
+            raise ValueError('labels must contain both outcomes')
+
+        curve = self._curve(scores, labels)
+        thresholds = preset['thresholds'] if thresholds is None else thresholds
+        scale = preset['scale'] if scale is None else scale
+
+        return {
+            'model': model,
+            'rows': int(labels.size),
+            'positives': positives,
+            'negatives': negatives,
+            'auc': round(curve['auc'], 4),
+            'average_precision': round(curve['average_precision'], 4),
+            'roc': self._downsample(curve, ('fpr', 'tpr', 'thresholds')),
+            'pr': self._downsample(curve, ('recall', 'precision', 'thresholds')),
+            'operating_points': [
+                self._operating_point(curve, threshold) for threshold in thresholds
+            ],
+            'calibration': self._calibration(scores / scale, labels),
+            'evaluated_at': datetime.now().isoformat()
+        }
+
+    def _curve(self, scores, labels):
+        """Cumulative TP/FP counts at every distinct score, from one sort."""
+        import numpy as np
+
+        order = np.argsort(-scores, kind='stable')
+        sorted_scores = scores[order]
+        tp_cumulative = np.cumsum(labels[order], dtype=np.int64)
+        fp_cumulative = np.arange(1, scores.size + 1) - tp_cumulative
+
+        # Last position of each run of tied scores: one point per distinct cutoff
+        ends = np.r_[np.flatnonzero(np.diff(sorted_scores)), scores.size - 1]
+        tps = tp_cumulative[ends]
+        fps = fp_cumulative[ends]
+        positives = tps[-1]
+        negatives = fps[-1]
+
+        tpr = np.r_[0.0, tps / positives]
+        fpr = np.r_[0.0, fps / negatives]
+        recall = tps / positives
+        precision = tps / (tps + fps)
+
+        return {
+            'sorted_scores': sorted_scores,
+            'tp_cumulative': tp_cumulative,
+            'positives': int(positives),
+            'negatives': int(negatives),
+            'thresholds': np.r_[np.inf, sorted_scores[ends]],
+            'tpr': tpr,
+            'fpr': fpr,
+            # Trapezoids handle tied scores (diagonal segments) correctly
+            'auc': float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)),
+            'recall': np.r_[0.0, recall],
+            'precision': np.r_[1.0, precision],
+            'average_precision': float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+        }
+
+    def _downsample(self, curve, keys):
+        """At most `curve_points` evenly spaced points of the curve, ends included."""
+        import numpy as np
+
+        length = curve[keys[0]].size
+        if length > self.curve_points:
+            index = np.unique(np.linspace(0, length - 1, self.curve_points).round().astype(np.int64))
+        else:
+            index = np.arange(length)
+        points = {}
+        for key in keys:
+            values = curve[key][index]
+            points[key] = [
+                round(float(value), 4) if np.isfinite(value) else None for value in values
+            ]
+        return points
+
+    def _operating_point(self, curve, threshold):
+        """Confusion metrics for "positive when score >= threshold"."""
+        import numpy as np
+
+        # Scores are sorted descending; count those >= threshold
+        flagged = int(np.searchsorted(-curve['sorted_scores'], -threshold, side='right'))
+        tp = int(curve['tp_cumulative'][flagged - 1]) if flagged else 0
+        fp = flagged - tp
+        fn = curve['positives'] - tp
+        tn = curve['negatives'] - fp
+
+        def percent(numerator, denominator):
+            return round(numerator / denominator * 100, 1) if denominator > 0 else 0
+
+        return {
+            'threshold': threshold,
+            'flagged': flagged,
+            'tp': tp, 'fp': fp, 'tn': tn, 'fn': fn,
+            'sensitivity': percent(tp, tp + fn),
+            'specificity': percent(tn, tn + fp),
+            'ppv': percent(tp, tp + fp),
+            'npv': percent(tn, tn + fn),
+            'accuracy': percent(tp + tn, tp + fp + tn + fn)
+        }
+
+    def _calibration(self, probabilities, labels):
+        """Equal-width probability bins with predicted vs. observed event rates."""
+        import numpy as np
+
+        bins = self.calibration_bins
+        probabilities = np.clip(probabilities, 0.0, 1.0)
+        index = np.minimum((probabilities * bins).astype(np.int64), bins - 1)
+        counts = np.bincount(index, minlength=bins)
+        predicted = np.bincount(index, weights=probabilities, minlength=bins)
+        observed = np.bincount(index, weights=labels, minlength=bins)
+
+        rows = []
+        for b in range(bins):
+            count = int(counts[b])
+            rows.append({
+                'lower': round(b / bins, 4),
+                'upper': round((b + 1) / bins, 4),
+                'count': count,
+                'mean_predicted': round(float(predicted[b] / count), 4) if count else None,
+                'observed_rate': round(float(observed[b] / count), 4) if count else None
+            })
+
+        occupied = counts > 0
+        gaps = np.abs(predicted[occupied] - observed[occupied]) / counts[occupied]
+        return {
+            'bins': rows,
+            'expected_calibration_error': round(float(np.sum(gaps * counts[occupied]) / labels.size), 4),
+            'brier': round(float(np.mean((probabilities - labels) ** 2)), 4)
+        }
+
+
+def load_scored_rows(path, score_column, label_column):
+    """Scores and labels from a CSV (header row) or JSONL file."""
+    scores, labels = [], []
+    if path.endswith('.csv'):
+        import csv
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get(score_column) in (None, '') or row.get(label_column) in (None, ''):
+                    continue
+                scores.append(float(row[score_column]))
+                labels.append(int(float(row[label_column])))
+        return scores, labels
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get(score_column) is None or record.get(label_column) is None:
+                continue
+            scores.append(float(record[score_column]))
+            labels.append(int(record[label_column]))
+    return scores, labels
+
+
+def synthetic_scores(n, seed=42):
+    """Risk scores 0-100 with labels drawn from a logistic link, for benchmarking."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    scores = np.clip(rng.normal(40, 20, n).round(), 0, 100)
+    labels = rng.random(n) < 1 / (1 + np.exp(-(scores - 55) / 8))
+    return scores, labels
+
+
+def main(argv=None):
+    """Evaluate scored rows from a file, or time a synthetic evaluation."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='ROC and calibration evaluation of CLARA model scores')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help='Scored, labeled rows (CSV with header, or JSONL)')
+    source.add_argument('--synthetic', type=int, help='Benchmark on N synthetic risk scores')
+    parser.add_argument('--model', choices=sorted(MODEL_PRESETS), default='risk')
+    parser.add_argument('--score-column', default='risk_score')
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--thresholds', help='Comma-separated operating points (default: model cutoffs)')
+    parser.add_argument('--out', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.data:
+        scores, labels = load_scored_rows(args.data, args.score_column, args.label_column)
+    else:
+        scores, labels = synthetic_scores(args.synthetic)
+    thresholds = [float(t) for t in args.thresholds.split(',')] if args.thresholds else None
+
+    started = time.perf_counter()
+    report = model_evaluator.evaluate(scores, labels, model=args.model, thresholds=thresholds)
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Wrote evaluation of {report['rows']} rows (AUC {report['auc']}) to {args.out}")
+    else:
+        print(output)
+    return 0
+
+
+# Export for use in main app
+model_evaluator = ModelEvaluator(
+    curve_points=config.EVAL_CURVE_POINTS,
+    calibration_bins=config.EVAL_CALIBRATION_BINS
+)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+CLARA Model Registry
+====================
+Versioned clinical rule tables (risk weights, disease severity, outcome
+models, guidelines, comorbidity risks, ICD-10 condition groups) loaded from
+artifact files.
+
+Each version is compiled once into an immutable CompiledRuleSet. Requests
+read `model_registry.active` once and use that snapshot throughout, so a
+hot-swap never mixes two versions inside one request and costs nothing
+per request.
+
+Artifact layout (CLARA_MODEL_REGISTRY_DIR):
+    <version>.json   {"version": "2.1.0", "tables": {"RISK_WEIGHTS": {...}, ...}}
+    ACTIVE           name of the version every worker should serve
+
+Usage:
+    python model_registry.py export --version 2.1.0   # write current tables as a new version
+    python model_registry.py activate 2.1.0
+"""
+
+from datetime import datetime
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+import config
+
+DEFAULT_VERSION = '2.0.0'
+
+TABLE_NAMES = (
+    'RISK_WEIGHTS',
+    'DISEASE_SEVERITY',
+    'SYMPTOM_WEIGHTS',
+    'OUTCOME_MODELS',
+    'GUIDELINES',
+    'COMORBIDITY_RISKS',
+    'CONDITION_CODES',
+    'CODE_SEVERITY'
+)
+
+ACTIVE_POINTER = 'ACTIVE'
+
+# Numbers every compiled rule set; a version recompiled from a changed
+# artifact keeps its name but gets a new generation
+_generations = itertools.count(1)
+
+
+class CompiledRuleSet:
+    """
+    Immutable, precompiled view of one version's rule tables.
+    """
+
+    def __init__(self, version, tables, source=None):
+        self.version = version
+        self.generation = next(_generations)
+        self.source = source
+        self.loaded_at = datetime.now().isoformat()
+
+        self.risk_weights = dict(tables.get('RISK_WEIGHTS', {}))
+
+        # Ordered (term, weight) tuples; the first matching term wins
+        self.disease_severity = tuple(
+            (term.lower(), severity) for term, severity in tables.get('DISEASE_SEVERITY', {}).items()
+        )
+        self.symptom_weights = tuple(
+            (term.lower(), weight) for term, weight in tables.get('SYMPTOM_WEIGHTS', {}).items()
+        )
+
+        self.guidelines = tuple(
+            (key, key.replace('_', ' ').title(), guideline)
+            for key, guideline in tables.get('GUIDELINES', {}).items()
+        )
+
+        self.comorbidity_risks = tuple(
+            (combo, multiplier, ' + '.join(combo))
+            for combo, multiplier in _comorbidity_items(tables.get('COMORBIDITY_RISKS', {}))
+        )
+
+        self.outcome_models = tuple(
+            (name, model['base_rate'], tuple(_compile_factor(f, w) for f, w in model['risk_factors'].items()))
+            for name, model in tables.get('OUTCOME_MODELS', {}).items()
+        )
+
+        # Outcome-model inputs as feature-signature terms: age cutoffs and factors matched by name
+        self.outcome_age_thresholds = tuple(sorted({
+            threshold for _, _, factors in self.outcome_models
+            for _, _, _, threshold, _ in factors if threshold is not None
+        }))
+        self.outcome_condition_factors = tuple(sorted({
+            factor for _, _, factors in self.outcome_models
+            for factor, _, kind, _, _ in factors if kind != 'age'
+        }))
+
+        # (group, ICD-10-CM code prefixes); a code belongs to every group it falls under
+        self.condition_codes = tuple(
+            (group, tuple(prefixes)) for group, prefixes in tables.get('CONDITION_CODES', {}).items()
+        )
+        # Longest prefix first so the most specific entry wins
+        self.code_severity = tuple(sorted(
+            tables.get('CODE_SEVERITY', {}).items(), key=lambda item: len(item[0]), reverse=True
+        ))
+        self._code_groups = {}
+
+    def condition_groups(self, code):
+        """Condition groups an ICD-10-CM code falls under in the code hierarchy."""
+        groups = self._code_groups.get(code)
+        if groups is None:
+            groups = frozenset(
+                group for group, prefixes in self.condition_codes if code.startswith(prefixes)
+            )
+            self._code_groups[code] = groups
+        return groups
+
+    def severity_for_code(self, code):
+        """Severity of the most specific matching code prefix, or None."""
+        for prefix, severity in self.code_severity:
+            if code.startswith(prefix):
+                return severity
+        return None
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'generation': self.generation,
+            'source': self.source,
+            'loaded_at': self.loaded_at
+        }
+
+
+def _comorbidity_items(table):
+    """Accept the in-code dict form (tuple keys) or the artifact list form."""
+    if isinstance(table, dict):
+        return [(tuple(combo), multiplier) for combo, multiplier in table.items()]
+    return [(tuple(entry['conditions']), entry['multiplier']) for entry in table]
+
+
+def _compile_factor(factor, weight):
+    """
+    Classify an outcome risk factor once instead of on every prediction.
+
+    Returns:
+        tuple: (factor, weight, kind, age_threshold, label)
+    """
+    if 'age_over_75' in factor:
+        kind, threshold = 'age', 75
+    elif 'age_over_65' in factor:
+        kind, threshold = 'age', 65
+    elif 'polypharmacy' in factor:
+        kind, threshold = 'polypharmacy', None
+    elif 'multiple_conditions' in factor:
+        kind, threshold = 'multiple_conditions', None
+    else:
+        kind, threshold = 'condition', None
+    if threshold is None and 'age_over' in factor:
+        threshold = int(factor.split('_')[-1])
+    return (factor, weight, kind, threshold, factor.replace('_', ' ').title())
+
+
+def _tables_to_json(tables):
+    """Convert in-code tables to their JSON artifact form."""
+    serializable = dict(tables)
+    if 'COMORBIDITY_RISKS' in serializable:
+        serializable['COMORBIDITY_RISKS'] = [
+            {'conditions': list(combo), 'multiplier': multiplier}
+            for combo, multiplier in _comorbidity_items(serializable['COMORBIDITY_RISKS'])
+        ]
+    return serializable
+
+
+class ModelRegistry:
+    """
+    Loads, compiles and atomically swaps versioned rule tables.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._defaults = {}
+        self._compiled = {}
+        self._watch_state = None
+        self._watcher = None
+        try:
+            self._active = self._compile(self._read_pointer() or DEFAULT_VERSION)
+        except Exception as e:
+            print(f"Warning: could not load active model version, using built-in tables: {e}")
+            self._active = self._compile(DEFAULT_VERSION)
+
+    @property
+    def active(self):
+        """The rule set serving requests right now."""
+        return self._active
+
+    def set_defaults(self, **tables):
+        """
+        Register the built-in tables that versions inherit from.
+        Called by each module that owns tables when it is imported.
+        """
+        with self._lock:
+            self._defaults.update(tables)
+            self._compiled.clear()
+            self._active = self._compile(self._active.version)
+
+    def get(self, version):
+        """Compiled rule set for a version (cached)."""
+        compiled = self._compiled.get(version)
+        if compiled is None:
+            compiled = self._compile(version)
+        return compiled
+
+    def list_versions(self):
+        """Versions available in the registry directory."""
+        versions = {DEFAULT_VERSION}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    versions.add(name[:-len('.json')])
+        return sorted(versions)
+
+    def activate(self, version, persist=True):
+        """
+        Compile a version and swap it in.
+        With persist=True the ACTIVE pointer is updated so other workers follow.
+        """
+        compiled = self._compile(version)
+        if persist:
+            self._write_pointer(version)
+        self._active = compiled
+        self._watch_state = self._current_watch_state()
+        return compiled
+
+    def refresh(self):
+        """Follow the ACTIVE pointer if it or the active artifact changed on disk."""
+        state = self._current_watch_state()
+        if state == self._watch_state:
+            return False
+        self._watch_state = state
+
+        version = self._read_pointer() or DEFAULT_VERSION
+        try:
+            self._compiled.pop(version, None)
+            self.activate(version, persist=False)
+        except Exception as e:
+            print(f"Warning: could not activate model version {version}: {e}")
+            return False
+        return True
+
+    def start_watcher(self, interval):
+        """Poll the registry directory every `interval` seconds in a daemon thread."""
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watch_state = self._current_watch_state()
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                self.refresh()
+
+        self._watcher = threading.Thread(target=watch, name='model-registry-watcher', daemon=True)
+        self._watcher.start()
+
+    def export(self, version, tables=None):
+        """Write tables (default: the active defaults) as a new version artifact."""
+        tables = tables if tables is not None else self._defaults
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._artifact_path(version)
+        _atomic_write(path, json.dumps({
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'tables': _tables_to_json({name: tables[name] for name in TABLE_NAMES if name in tables})
+        }, indent=2))
+        return path
+
+    def status(self):
+        return {
+            'active': self._active.describe(),
+            'available_versions': self.list_versions(),
+            'directory': self.directory,
+            'watching': self._watcher is not None
+        }
+
+    def _compile(self, version):
+        tables = dict(self._defaults)
+        source = 'built-in'
+        path = self._artifact_path(version)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                artifact = json.load(f)
+            unknown = set(artifact.get('tables', {})) - set(TABLE_NAMES)
+            if unknown:
+                raise ValueError(f"Unknown tables in {path}: {', '.join(sorted(unknown))}")
+            tables.update(artifact.get('tables', {}))
+            source = path
+        elif version != DEFAULT_VERSION:
+            raise ValueError(f'Unknown model version: {version}')
+
+        compiled = CompiledRuleSet(version, tables, source=source)
+        self._compiled[version] = compiled
+        return compiled
+
+    def _artifact_path(self, version):
+        if os.path.basename(version) != version or version.startswith('.'):
+            raise ValueError(f'Invalid model version: {version}')
+        return os.path.join(self.directory, f'{version}.json')
+
+    def _read_pointer(self):
+        try:
+            with open(os.path.join(self.directory, ACTIVE_POINTER), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _write_pointer(self, version):
+        os.makedirs(self.directory, exist_ok=True)
+        _atomic_write(os.path.join(self.directory, ACTIVE_POINTER), version + '\n')
+
+    def _current_watch_state(self):
+        """(pointer mtime, active artifact mtime) used to detect changes cheaply."""
+        pointer = _mtime(os.path.join(self.directory, ACTIVE_POINTER))
+        version = self._read_pointer() or DEFAULT_VERSION
+        try:
+            artifact = _mtime(self._artifact_path(version))
+        except ValueError:
+            artifact = None
+        return (pointer, artifact)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _atomic_write(path, content):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage CLARA model registry versions')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export', help='Write the built-in tables as a new version')
+    export.add_argument('--version', required=True)
+    activate = subparsers.add_parser('activate', help='Point all workers at a version')
+    activate.add_argument('version')
+    subparsers.add_parser('list', help='List available versions')
+    args = parser.parse_args(argv)
+
+    # Importing the owning modules registers their built-in tables
+    import risk_prediction  # noqa: F401
+    import clinical_insights  # noqa: F401
+    from model_registry import model_registry as registry
+    if args.command == 'export':
+        print(f'Wrote {registry.export(args.version)}')
+    elif args.command == 'activate':
+        registry.activate(args.version)
+        print(f'Activated {args.version} in {config.MODEL_REGISTRY_DIR}')
+    else:
+        print(json.dumps(registry.status(), indent=2))
+    return 0
+
+
+# Export for use in main app
+model_registry = ModelRegistry(config.MODEL_REGISTRY_DIR)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
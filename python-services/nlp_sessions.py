@@ -0,0 +1,409 @@
+"""
+CLARA Incremental NLP Sessions
+==============================
+Session-scoped analysis of live consultation transcripts that arrive as
+appended chunks. Each chunk is fed through Aho-Corasick automata whose state
+is carried across chunk boundaries, so a term split over two chunks is still
+found and an update costs O(chunk length) instead of re-scanning the whole
+transcript.
+
+The transcript is the plain concatenation of the chunks; the result has the
+same shape as ClinicalNLPAnalyzer.analyze_transcript on the full text.
+Idle sessions expire after a TTL and the least recently used session is
+evicted when the store is full.
+"""
+
+from collections import OrderedDict, deque
+import threading
+import time
+import uuid
+
+import config
+
+KEY_PHRASE_LENGTH = 100
+
+
+class AhoCorasick:
+    """
+    Multi-pattern automaton. `step` advances one character so matching can be
+    paused and resumed anywhere in the stream.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: dict pattern -> payload reported on every match
+        """
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [()]
+        self.max_length = max((len(p) for p in patterns), default=0)
+
+        for pattern, payload in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                state = next_state
+            self.outputs[state] = self.outputs[state] + ((len(pattern), payload),)
+
+        # Breadth-first failure links; outputs include those of the fail state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def step(self, state, char):
+        """Next state after reading `char`."""
+        goto = self.goto
+        while state and char not in goto[state]:
+            state = self.fail[state]
+        return goto[state].get(char, 0)
+
+
+class _Vocabulary:
+    """Automata shared by every session of a store."""
+
+    def __init__(self, analyzer, medication_normalizer):
+        terms = {}
+
+        def add(words, kind, value=None):
+            for word in words:
+                terms.setdefault(word, []).append((kind, value if value is not None else word))
+
+        add(analyzer.DISEASE_KEYWORDS, 'diseases')
+        add(analyzer.TEST_KEYWORDS, 'tests')
+        add(analyzer.SYMPTOM_KEYWORDS, 'symptoms')
+        add(analyzer.POSITIVE_WORDS, 'positive')
+        add(analyzer.NEGATIVE_WORDS, 'negative')
+        add(analyzer.EMERGENCY_WORDS, 'emergency')
+        add(analyzer.HIGH_URGENCY_WORDS, 'high_urgency')
+        add(analyzer.KEY_PHRASE_PATTERNS, 'phrase')
+
+        # Medication synonyms match on whitespace-collapsed text at token
+        # boundaries; without a synonym table fall back to substring keywords
+        medications = {}
+        if medication_normalizer.size:
+            for synonym in medication_normalizer.extractable_synonyms():
+                medications[synonym] = medication_normalizer.canonical(synonym)
+        else:
+            add(analyzer.MEDICATION_KEYWORDS, 'medications')
+
+        self.terms = AhoCorasick({word: tuple(kinds) for word, kinds in terms.items()})
+        self.medications = AhoCorasick(medications)
+        self.phrase_patterns = list(analyzer.KEY_PHRASE_PATTERNS)
+
+
+class TranscriptSession:
+    """
+    Incremental analysis state for one transcript.
+    """
+
+    def __init__(self, session_id, analyzer, vocabulary):
+        self.session_id = session_id
+        self.analyzer = analyzer
+        self.vocabulary = vocabulary
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.lock = threading.Lock()
+
+        self.length = 0
+        self.chunks = 0
+        self.word_count = 0
+        self.sentence_count = 0
+        self._in_word = False
+
+        # Raw lowercase stream: substring keywords
+        self._term_state = 0
+        self.entities = {'diseases': {}, 'medications': {}, 'tests': {}, 'symptoms': {}}
+        self.signals = {'positive': set(), 'negative': set(), 'emergency': set(), 'high_urgency': set()}
+
+        # Key phrases: original-case tail to recover a pattern's start, and per
+        # pattern [first 100 chars, sentence ended, non-space beyond 100 chars]
+        self._tail = deque(maxlen=max(1, vocabulary.terms.max_length))
+        self._phrases = {}
+        self._open_phrases = []
+
+        # Whitespace-collapsed stream: medications with longest-match semantics
+        self._medication_state = 0
+        self._normalized_length = 0
+        self._last_normalized = ' '
+        self._normalized_tail = deque(maxlen=vocabulary.medications.max_length + 1)
+        self._pending_boundary = []
+        self._candidates = {}
+        self._resume_at = 0
+
+    def append(self, text):
+        """Feed the next chunk of the transcript."""
+        terms = self.vocabulary.terms
+        term_state = self._term_state
+        entities = self.entities
+        signals = self.signals
+
+        for char in text:
+            lower = char.lower()
+            for lower_char in lower:
+                self.length += 1
+                self._tail.append(char)
+
+                if self._open_phrases:
+                    self._extend_phrases(char)
+
+                term_state = terms.step(term_state, lower_char)
+                for length, payloads in terms.outputs[term_state]:
+                    for kind, value in payloads:
+                        if kind in entities:
+                            entities[kind].setdefault(value.title(), None)
+                        elif kind == 'phrase':
+                            if value not in self._phrases:
+                                self._start_phrase(value, length)
+                        else:
+                            signals[kind].add(value)
+
+                if lower_char.isspace():
+                    self._in_word = False
+                elif not self._in_word:
+                    self._in_word = True
+                    self.word_count += 1
+
+                self._feed_medication(lower_char)
+
+            if char == '.' or char == '?':
+                self.sentence_count += 1
+
+        self._term_state = term_state
+        self.chunks += 1
+        self._resolve_medications(final=False)
+
+    def analysis(self):
+        """Current analysis, in the shape of analyze_transcript."""
+        analyzer = self.analyzer
+        medications = dict(self.entities['medications'])
+        for drug_id in self._resolve_medications(final=True):
+            medications.setdefault(drug_id.title(), None)
+
+        diseases = list(self.entities['diseases'])
+        result = analyzer.build_analysis(
+            diseases,
+            list(medications),
+            list(self.entities['tests']),
+            list(self.entities['symptoms']),
+            word_count=self.word_count,
+            sentence_count=self.sentence_count,
+            sentiment=analyzer._score_sentiment(len(self.signals['positive']), len(self.signals['negative'])),
+            key_phrases=self._key_phrases(),
+            urgency=analyzer._urgency_level(bool(self.signals['emergency']), bool(self.signals['high_urgency']))
+        )
+        result['session'] = {
+            'session_id': self.session_id,
+            'characters': self.length,
+            'chunks': self.chunks
+        }
+        return result
+
+    # ----- key phrases -----
+
+    def _start_phrase(self, pattern, length):
+        prefix = ''.join(list(self._tail)[-length:])
+        state = [prefix, False, False]
+        self._phrases[pattern] = state
+        self._open_phrases.append(state)
+
+    def _extend_phrases(self, char):
+        """A phrase runs to the next '.'; only its first 100 characters are kept."""
+        still_open = []
+        for state in self._open_phrases:
+            if char == '.':
+                state[1] = True
+                continue
+            if len(state[0]) < KEY_PHRASE_LENGTH:
+                state[0] += char
+            elif not char.isspace():
+                state[2] = True
+            still_open.append(state)
+        self._open_phrases = still_open
+
+    def _key_phrases(self):
+        phrases = []
+        for pattern in self.vocabulary.phrase_patterns:
+            state = self._phrases.get(pattern)
+            if state is None:
+                continue
+            text, ended, more_after_limit = state
+            # Same as stripping the full sentence before truncating it
+            phrase = text if ended and more_after_limit else text.rstrip()
+            if len(phrase) > 10:
+                phrases.append(phrase[:KEY_PHRASE_LENGTH])
+        return phrases[:5]
+
+    # ----- medications -----
+
+    def _feed_medication(self, char):
+        if char.isspace():
+            if self._last_normalized == ' ':
+                return
+            char = ' '
+        self._last_normalized = char
+
+        # Matches ending at the previous character need this one as a boundary
+        if self._pending_boundary:
+            if not char.isalnum():
+                for match in self._pending_boundary:
+                    self._add_candidate(*match)
+            self._pending_boundary = []
+
+        position = self._normalized_length
+        self._normalized_length += 1
+        self._normalized_tail.append(char)
+
+        automaton = self.vocabulary.medications
+        self._medication_state = automaton.step(self._medication_state, char)
+        for length, drug_id in automaton.outputs[self._medication_state]:
+            start = position - length + 1
+            previous = self._char_at(start - 1)
+            if previous is None or not previous.isalnum():
+                self._pending_boundary.append((start, position + 1, drug_id))
+
+    def _char_at(self, position):
+        offset = self._normalized_length - 1 - position
+        if offset < 0 or offset >= len(self._normalized_tail):
+            return None
+        return self._normalized_tail[-1 - offset]
+
+    def _add_candidate(self, start, end, drug_id):
+        current = self._candidates.get(start)
+        if current is None or end > current[0]:
+            self._candidates[start] = (end, drug_id)
+
+    def _resolve_medications(self, final):
+        """
+        Longest match per start, left to right, skipping starts inside a chosen
+        match. Starts that a longer, not yet seen match could still cover stay
+        pending; with `final` the end of the stream is treated as a boundary
+        and nothing is committed.
+        """
+        candidates = dict(self._candidates)
+        if final:
+            for match in self._pending_boundary:
+                start, end, drug_id = match
+                current = candidates.get(start)
+                if current is None or end > current[0]:
+                    candidates[start] = (end, drug_id)
+            settled_before = None
+        else:
+            settled_before = self._normalized_length - self.vocabulary.medications.max_length - 1
+
+        resume_at = self._resume_at
+        found = []
+        for start in sorted(candidates):
+            if settled_before is not None and start > settled_before:
+                break
+            end, drug_id = candidates[start]
+            if start >= resume_at:
+                found.append(drug_id)
+                resume_at = end
+            if not final:
+                del self._candidates[start]
+
+        if not final:
+            self._resume_at = resume_at
+            for drug_id in found:
+                self.entities['medications'].setdefault(drug_id.title(), None)
+        return found
+
+
+class NlpSessionStore:
+    """
+    Live sessions keyed by ID with idle expiry and LRU eviction.
+    """
+
+    def __init__(self, analyzer, medication_normalizer, max_sessions=1000, idle_ttl=900):
+        self.analyzer = analyzer
+        self.medication_normalizer = medication_normalizer
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._vocabulary = None
+        self._stats = {'created': 0, 'expired': 0, 'evicted': 0, 'closed': 0}
+
+    def create(self):
+        """Start a session and return it."""
+        vocabulary = self._get_vocabulary()
+        session = TranscriptSession(uuid.uuid4().hex, self.analyzer, vocabulary)
+        with self._lock:
+            self._expire(time.time())
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats['evicted'] += 1
+            self._sessions[session.session_id] = session
+            self._stats['created'] += 1
+        return session
+
+    def get(self, session_id):
+        """Session by ID (marks it as used), or None when unknown or expired."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id):
+        """Remove a session and return it, or None."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._stats['closed'] += 1
+            return session
+
+    def status(self):
+        with self._lock:
+            self._expire(time.time())
+            return {
+                'active_sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'idle_ttl_seconds': self.idle_ttl,
+                'stats': dict(self._stats)
+            }
+
+    def _expire(self, now):
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self._stats['expired'] += 1
+
+    def _get_vocabulary(self):
+        if self._vocabulary is None:
+            with self._lock:
+                if self._vocabulary is None:
+                    self._vocabulary = _Vocabulary(self.analyzer, self.medication_normalizer)
+        return self._vocabulary
+
+
+def create_session_store(analyzer, medication_normalizer):
+    """Session store configured from the environment."""
+    return NlpSessionStore(
+        analyzer,
+        medication_normalizer,
+        max_sessions=config.NLP_SESSION_MAX,
+        idle_ttl=config.NLP_SESSION_IDLE_TTL
+    )
@@ -0,0 +1,347 @@
+"""
+CLARA Patient State
+===================
+Per-patient risk state carried across encounters. Each encounter submits
+only what changed (new or resolved diagnoses, medications, symptoms, a new
+age) and only the affected parts are recomputed:
+
+- every diagnosis and symptom keeps its risk-score term, and every diagnosis
+  its resolved ICD-10 condition profile, so neither is matched again;
+- a new medication is checked against the current list only (its own
+  interaction pairs), not the whole list pairwise;
+- risk, outcomes and alerts are re-derived from the cached terms only when
+  an input they depend on changed.
+
+Results have the same shape as predict-risk, predict-outcomes and
+generate-alerts run on the accumulated profile. A new active rule set
+(another version, or the same version recompiled from a changed artifact)
+rebuilds the cached terms on the next encounter. Idle states
+expire after a TTL and the least recently used one is evicted when the store
+is full.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import time
+
+import config
+from drug_interactions import SEVERITY_RANK
+from model_registry import model_registry
+
+LIST_FIELDS = ('diseases', 'medications', 'symptoms')
+
+# Inputs each result depends on ('present' = which profile fields are non-empty)
+RISK_INPUTS = frozenset(('age', 'diseases', 'medications', 'symptoms'))
+OUTCOME_INPUTS = frozenset(('age', 'diseases', 'medications', 'present'))
+ALERT_INPUTS = frozenset(('risk_score', 'diseases', 'medications'))
+
+
+class PatientState:
+    """
+    Canonical profile of one patient plus cached score terms and last results.
+    """
+
+    def __init__(self, patient_id):
+        self.patient_id = patient_id
+        self.lock = threading.Lock()
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.rules_version = None
+        self.rules_generation = None
+        self.age = 0
+        # lowercased name -> [disease, risk term, condition profile entry or None]
+        self.diseases = OrderedDict()
+        # canonical drug ID -> None (insertion-ordered set)
+        self.medications = OrderedDict()
+        # lowercased name -> [symptom, risk term]
+        self.symptoms = OrderedDict()
+        # (drug_a, drug_b) -> interaction record
+        self.interactions = {}
+        self.encounters = 0
+        self.risk = None
+        self.outcomes = None
+        self.alerts = None
+        self.updated_at = None
+
+    def patient_data(self):
+        """Accumulated profile in the API's patient shape."""
+        return {
+            'age': self.age,
+            'diseases': [entry[0] for entry in self.diseases.values()],
+            'medications': list(self.medications),
+            'symptoms': [entry[0] for entry in self.symptoms.values()]
+        }
+
+    def present_fields(self):
+        patient = self.patient_data()
+        return tuple(field for field in ('age',) + LIST_FIELDS if patient[field])
+
+    def condition_profile(self):
+        """Cached condition_profile entries, in diagnosis order."""
+        return [entry[2] for entry in self.diseases.values()]
+
+    def ordered_interactions(self):
+        """Interactions in InteractionKnowledgeBase.check order (severity, then list order)."""
+        position = {drug_id: index for index, drug_id in enumerate(self.medications)}
+
+        def order(interaction):
+            drug_a, drug_b = sorted(interaction['drugs'], key=position.get)
+            return (
+                SEVERITY_RANK.get(interaction['severity'], len(SEVERITY_RANK)),
+                position[drug_a],
+                position[drug_b]
+            )
+
+        return sorted(self.interactions.values(), key=order)
+
+    def snapshot(self):
+        return {
+            'patient_id': self.patient_id,
+            'encounters': self.encounters,
+            'profile': self.patient_data(),
+            'risk': self.risk,
+            'outcomes': self.outcomes,
+            'alerts': self.alerts,
+            'model_version': self.rules_version,
+            'updated_at': self.updated_at
+        }
+
+
+class PatientStateStore:
+    """
+    Patient states keyed by patient ID with idle expiry and LRU eviction.
+    """
+
+    def __init__(self, risk_model, alert_system, medication_normalizer, interaction_kb,
+                 max_patients=10000, idle_ttl=86400):
+        self.risk_model = risk_model
+        self.alert_system = alert_system
+        self.medication_normalizer = medication_normalizer
+        self.interaction_kb = interaction_kb
+        self.max_patients = max_patients
+        self.idle_ttl = idle_ttl
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'created': 0, 'expired': 0, 'evicted': 0, 'closed': 0,
+            'encounters': 0, 'risk_recomputed': 0, 'outcomes_recomputed': 0,
+            'alerts_recomputed': 0, 'rebuilds': 0
+        }
+
+    def get(self, patient_id):
+        """State by patient ID (marks it as used), or None when unknown or expired."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            state = self._states.get(patient_id)
+            if state is None:
+                return None
+            state.last_access = now
+            self._states.move_to_end(patient_id)
+            return state
+
+    def get_or_create(self, patient_id):
+        """State by patient ID, starting an empty one for a new patient."""
+        state = self.get(patient_id)
+        if state is not None:
+            return state
+        with self._lock:
+            state = self._states.get(patient_id)
+            if state is None:
+                while len(self._states) >= self.max_patients:
+                    self._states.popitem(last=False)
+                    self._stats['evicted'] += 1
+                state = PatientState(patient_id)
+                self._states[patient_id] = state
+                self._stats['created'] += 1
+            return state
+
+    def close(self, patient_id):
+        """Remove a patient's state and return it, or None."""
+        with self._lock:
+            state = self._states.pop(patient_id, None)
+            if state is not None:
+                self._stats['closed'] += 1
+            return state
+
+    def record_encounter(self, state, encounter, outcome_predictor=None, rules=None):
+        """
+        Apply one encounter's changes to a state (hold `state.lock`) and
+        recompute what they affect.
+
+        Args:
+            encounter: {age, diseases, medications, symptoms, remove: {...}}
+                where the lists hold only what is new (or, under "remove",
+                what no longer applies)
+            outcome_predictor: OutcomePredictor, or None to skip outcomes
+
+        Returns:
+            dict: changed inputs, recomputed results and new alerts
+        """
+        rules = rules or model_registry.active
+        changed = set()
+        if state.rules_generation != rules.generation:
+            if state.rules_generation is not None:
+                changed.update(RISK_INPUTS)
+            self._rebuild(state, rules)
+        present_before = state.present_fields()
+        previous_score = state.risk['score'] if state.risk else None
+
+        age = encounter.get('age')
+        if age is not None and int(age) != state.age:
+            state.age = int(age)
+            changed.add('age')
+
+        self._remove(state, encounter.get('remove') or {}, changed)
+        self._add(state, encounter, rules, changed)
+        if state.present_fields() != present_before:
+            changed.add('present')
+
+        recomputed = []
+        if state.risk is None or changed & RISK_INPUTS:
+            state.risk = self._score_risk(state, rules)
+            recomputed.append('risk')
+        if outcome_predictor is not None and (state.outcomes is None or changed & OUTCOME_INPUTS):
+            state.outcomes = self._predict_outcomes(state, rules, outcome_predictor)
+            recomputed.append('outcomes')
+        if state.risk['score'] != previous_score:
+            changed.add('risk_score')
+
+        previous_alerts = state.alerts or []
+        if state.alerts is None or changed & ALERT_INPUTS:
+            state.alerts = self.alert_system.assemble_alerts(
+                state.risk['score'],
+                len(state.diseases),
+                len(state.medications),
+                state.ordered_interactions()
+            )
+            recomputed.append('alerts')
+
+        state.encounters += 1
+        state.updated_at = datetime.now().isoformat()
+        with self._lock:
+            self._stats['encounters'] += 1
+            for result in recomputed:
+                self._stats[f'{result}_recomputed'] += 1
+
+        known = {alert['message'] for alert in previous_alerts}
+        return {
+            'inputs': sorted(changed - {'present', 'risk_score'}),
+            'recomputed': recomputed,
+            'risk_score_delta': (
+                state.risk['score'] - previous_score if previous_score is not None else None
+            ),
+            'new_alerts': [alert for alert in state.alerts if alert['message'] not in known]
+        }
+
+    def status(self):
+        with self._lock:
+            self._expire(time.time())
+            return {
+                'active_patients': len(self._states),
+                'max_patients': self.max_patients,
+                'idle_ttl_seconds': self.idle_ttl,
+                'stats': dict(self._stats)
+            }
+
+    # ----- profile changes -----
+
+    def _add(self, state, encounter, rules, changed):
+        for disease in encounter.get('diseases') or []:
+            key = disease.lower()
+            if key not in state.diseases:
+                state.diseases[key] = [disease, self.risk_model._disease_term(disease, rules), None]
+                changed.add('diseases')
+
+        for drug_id in self.medication_normalizer.normalize_list(encounter.get('medications') or []):
+            if drug_id in state.medications:
+                continue
+            # Only the pairs the new drug forms with the current list
+            for interaction in self.interaction_kb.interactions_with(drug_id, state.medications):
+                state.interactions[tuple(interaction['drugs'])] = interaction
+            state.medications[drug_id] = None
+            changed.add('medications')
+
+        for symptom in encounter.get('symptoms') or []:
+            key = symptom.lower()
+            if key not in state.symptoms:
+                state.symptoms[key] = [symptom, self.risk_model._symptom_term(symptom, rules)]
+                changed.add('symptoms')
+
+    def _remove(self, state, remove, changed):
+        for disease in remove.get('diseases') or []:
+            if state.diseases.pop(disease.lower(), None) is not None:
+                changed.add('diseases')
+
+        for drug_id in self.medication_normalizer.normalize_list(remove.get('medications') or []):
+            if state.medications.pop(drug_id, False) is not False:
+                state.interactions = {
+                    pair: interaction for pair, interaction in state.interactions.items()
+                    if drug_id not in pair
+                }
+                changed.add('medications')
+
+        for symptom in remove.get('symptoms') or []:
+            if state.symptoms.pop(symptom.lower(), None) is not None:
+                changed.add('symptoms')
+
+    def _rebuild(self, state, rules):
+        """Recompute every cached term under another rule set."""
+        for entry in state.diseases.values():
+            entry[1] = self.risk_model._disease_term(entry[0], rules)
+            entry[2] = None
+        for entry in state.symptoms.values():
+            entry[1] = self.risk_model._symptom_term(entry[0], rules)
+        state.outcomes = None
+        if state.rules_generation is not None:
+            with self._lock:
+                self._stats['rebuilds'] += 1
+        state.rules_version = rules.version
+        state.rules_generation = rules.generation
+
+    # ----- results -----
+
+    def _score_risk(self, state, rules):
+        patient = state.patient_data()
+        if self.risk_model.learned_model is not None:
+            # A trained model scores the whole profile; only the heuristic is additive
+            return self.risk_model.predict_risk(patient, rules=rules)
+
+        terms = [self.risk_model._age_term(state.age, rules)]
+        terms.extend(entry[1] for entry in state.diseases.values())
+        terms.append(self.risk_model._polypharmacy_term(len(state.medications), rules))
+        terms.extend(entry[1] for entry in state.symptoms.values())
+        return self.risk_model._heuristic_result(patient, terms, rules)
+
+    def _predict_outcomes(self, state, rules, outcome_predictor):
+        from clinical_insights import condition_profile
+
+        # Resolve ICD-10 condition groups for diagnoses added since the last run
+        unresolved = [entry for entry in state.diseases.values() if entry[2] is None]
+        for entry, resolved in zip(unresolved, condition_profile([e[0] for e in unresolved], rules)):
+            entry[2] = resolved
+        return outcome_predictor.predict_outcomes(
+            state.patient_data(), rules=rules, profile=state.condition_profile()
+        )
+
+    def _expire(self, now):
+        # States are kept in access order, so expired ones are at the front
+        while self._states:
+            patient_id, state = next(iter(self._states.items()))
+            if now - state.last_access < self.idle_ttl:
+                break
+            del self._states[patient_id]
+            self._stats['expired'] += 1
+
+
+def create_patient_state_store(risk_model, alert_system, medication_normalizer, interaction_kb):
+    """Patient state store configured from the environment."""
+    return PatientStateStore(
+        risk_model,
+        alert_system,
+        medication_normalizer,
+        interaction_kb,
+        max_patients=config.PATIENT_STATE_MAX,
+        idle_ttl=config.PATIENT_STATE_IDLE_TTL
+    )
@@ -0,0 +1,244 @@
+"""
+CLARA Risk Prediction
+=====================
+Heuristic clinical risk scoring with an optional trained model artifact.
+Weights and severities come from the active model registry rule set; this
+module registers the built-in tables as its defaults.
+"""
+
+from datetime import datetime
+import os
+
+import config
+from model_registry import model_registry
+from medication_normalizer import medication_normalizer
+from startup import ModuleLoader
+
+
+class RiskPredictionModel:
+    """
+    Machine Learning model for clinical risk prediction.
+    Uses a trained model artifact when one is available and falls back to
+    weighted scoring based on clinical factors.
+    """
+    
+    # Risk factor weights (derived from medical literature)
+    RISK_WEIGHTS = {
+        'age_over_65': 15,
+        'age_over_75': 25,
+        'diabetes': 20,
+        'hypertension': 15,
+        'heart_disease': 30,
+        'previous_mi': 35,
+        'kidney_disease': 25,
+        'copd': 20,
+        'asthma': 10,
+        'obesity': 15,
+        'smoking': 20,
+        'multiple_medications': 10,
+        'drug_interaction_risk': 25,
+        'high_blood_pressure': 15,
+        'abnormal_ecg': 20,
+        'chest_pain': 25,
+        'shortness_of_breath': 15,
+        'family_history': 10
+    }
+    
+    # Disease severity scores
+    DISEASE_SEVERITY = {
+        'hypertension': 15,
+        'type 2 diabetes': 20,
+        'type 1 diabetes': 25,
+        'coronary artery disease': 35,
+        'heart failure': 40,
+        'atrial fibrillation': 25,
+        'pneumonia': 20,
+        'asthma': 15,
+        'copd': 25,
+        'chronic kidney disease': 30,
+        'myocardial infarction': 45,
+        'stroke': 40,
+        'cancer': 50
+    }
+    
+    # Symptom weights
+    SYMPTOM_WEIGHTS = {
+        'chest pain': 25,
+        'shortness of breath': 15,
+        'difficulty breathing': 20,
+        'dizziness': 10,
+        'syncope': 20,
+        'palpitations': 15
+    }
+    
+    def __init__(self, learned_model_loader=None):
+        self._learned_model_loader = learned_model_loader
+        self._learned_model = None
+        self._learned_model_checked = learned_model_loader is None
+    
+    @property
+    def learned_model(self):
+        """Trained model, loaded on first access (None when unavailable)."""
+        if not self._learned_model_checked:
+            self._learned_model = self._learned_model_loader()
+            self._learned_model_checked = True
+        return self._learned_model
+    
+    def predict_risk(self, patient_data, rules=None):
+        """
+        Predict risk score based on patient data.
+        Returns score (0-100), level, confidence, and factors.
+        `rules` pins a registry version; defaults to the active one.
+        """
+        patient_data = self._normalize_patient(patient_data)
+        learned_model = self.learned_model
+        if learned_model is not None:
+            try:
+                probability = learned_model.predict_proba(patient_data)
+                return self._learned_result(learned_model, patient_data, probability)
+            except Exception as e:
+                print(f"Warning: learned risk model failed, using heuristic: {e}")
+        
+        return self._predict_heuristic(patient_data, rules)
+    
+    def predict_risk_batch(self, patients, rules=None):
+        """
+        Predict risk for many patients at once.
+        The trained model scores the whole batch in one vectorized pass.
+        """
+        patients = [self._normalize_patient(patient) for patient in patients]
+        learned_model = self.learned_model
+        if learned_model is not None and patients:
+            try:
+                probabilities = learned_model.predict_proba_batch(patients)
+                return [
+                    self._learned_result(learned_model, patient, probability)
+                    for patient, probability in zip(patients, probabilities)
+                ]
+            except Exception as e:
+                print(f"Warning: learned risk model failed, using heuristic: {e}")
+        
+        rules = rules or model_registry.active
+        return [self._predict_heuristic(patient, rules) for patient in patients]
+    
+    def _normalize_patient(self, patient_data):
+        """Copy of the patient with medications mapped to canonical drug IDs."""
+        medications = patient_data.get('medications')
+        if not medications:
+            return patient_data
+        return dict(patient_data, medications=medication_normalizer.normalize_list(medications))
+    
+    def _predict_heuristic(self, patient_data, rules=None):
+        """Weighted additive risk score (fallback when no trained model is loaded)."""
+        rules = rules or model_registry.active
+        terms = [self._age_term(patient_data.get('age', 0), rules)]
+        terms.extend(self._disease_term(disease, rules) for disease in patient_data.get('diseases', []))
+        terms.append(self._polypharmacy_term(len(patient_data.get('medications', [])), rules))
+        terms.extend(self._symptom_term(symptom, rules) for symptom in patient_data.get('symptoms', []))
+        return self._heuristic_result(patient_data, terms, rules)
+    
+    # Additive score terms: (points, factor or None) each
+    
+    def _age_term(self, age, rules):
+        if age >= 75:
+            return rules.risk_weights['age_over_75'], f'Advanced age ({age} years)'
+        elif age >= 65:
+            return rules.risk_weights['age_over_65'], f'Age over 65 ({age} years)'
+        return 0, None
+    
+    def _disease_term(self, disease, rules):
+        disease_lower = disease.lower()
+        for key, severity in rules.disease_severity:
+            if key in disease_lower:
+                return severity, f'Condition: {disease}'
+        return 0, None
+    
+    def _polypharmacy_term(self, medication_count, rules):
+        if medication_count >= 5:
+            return rules.risk_weights['multiple_medications'], f'Polypharmacy ({medication_count} medications)'
+        return 0, None
+    
+    def _symptom_term(self, symptom, rules):
+        symptom_lower = symptom.lower()
+        for keyword, weight in rules.symptom_weights:
+            if keyword in symptom_lower:
+                return weight, f'Symptom: {symptom}'
+        return 0, None
+    
+    def _heuristic_result(self, patient_data, terms, rules):
+        """Sum the terms (capped at 100) into a prediction result."""
+        score = min(sum(points for points, _ in terms), 100)
+        factors = [factor for _, factor in terms if factor]
+        
+        return {
+            'score': score,
+            'level': self._risk_level(score),
+            'confidence': self._confidence(patient_data),
+            'factors': factors[:5],  # Top 5 factors
+            'model_version': rules.version,
+            'model_type': 'heuristic',
+            'prediction_timestamp': datetime.now().isoformat()
+        }
+    
+    def _learned_result(self, learned_model, patient_data, probability):
+        """Format a trained-model probability like the heuristic result."""
+        score = int(round(float(probability) * 100))
+        return {
+            'score': score,
+            'level': self._risk_level(score),
+            'confidence': self._confidence(patient_data),
+            'factors': learned_model.top_factors(patient_data, limit=5),
+            'probability': round(float(probability), 4),
+            'model_version': learned_model.version,
+            'model_type': learned_model.model_type,
+            'prediction_timestamp': datetime.now().isoformat()
+        }
+    
+    def _risk_level(self, score):
+        """Map a 0-100 score onto a risk level."""
+        if score >= 75:
+            return 'Critical'
+        elif score >= 50:
+            return 'High'
+        elif score >= 25:
+            return 'Medium'
+        else:
+            return 'Low'
+    
+    def _confidence(self, patient_data):
+        """Calculate confidence (based on data completeness)."""
+        data_points = (
+            len(patient_data.get('diseases', [])) +
+            len(patient_data.get('medications', [])) +
+            len(patient_data.get('symptoms', [])) +
+            (1 if patient_data.get('age', 0) else 0)
+        )
+        return min(95, 60 + (data_points * 5))
+
+
+model_registry.set_defaults(
+    RISK_WEIGHTS=RiskPredictionModel.RISK_WEIGHTS,
+    DISEASE_SEVERITY=RiskPredictionModel.DISEASE_SEVERITY,
+    SYMPTOM_WEIGHTS=RiskPredictionModel.SYMPTOM_WEIGHTS
+)
+
+
+def load_learned_risk_model(path=None, module_loader=None):
+    """
+    Load the trained risk model artifact if one is configured.
+    `module_loader` (startup.ModuleLoader) records the import timing.
+    """
+    path = path or config.RISK_MODEL_PATH
+    if not path or not os.path.exists(path):
+        return None
+
+    module = (module_loader or ModuleLoader()).load('learned_risk_model')
+    if module is None:
+        print("Warning: learned risk model dependencies not available, using heuristic")
+        return None
+
+    try:
+        return module.LearnedRiskModel.load(path)
+    except Exception as e:
+        print(f"Warning: could not load risk model artifact {path}: {e}")
+        return None
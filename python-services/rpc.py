@@ -0,0 +1,172 @@
+"""
+CLARA Multiplexed RPC
+=====================
+Runs several analysis operations in one HTTP request. Operations execute in
+order; a parameter value of the form {"$ref": "<op id>.<path>"} is replaced
+by (part of) the result of an earlier operation ("$patient" names the shared
+patient), and other keys next to "$ref" are merged over the referenced
+object. Every operation gets its own status, so one failure does not fail
+the whole call. Operations not started before the request deadline report
+504.
+
+All operations of a call share one context: the model version is pinned once
+and each distinct patient is normalized once, however many operations use it.
+
+Request:
+    {
+        "patient": {"age": 65, "diseases": [...], ...},   (default params)
+        "operations": [
+            {"id": "nlp", "method": "analyze-nlp", "params": {"transcript": "..."}},
+            {"id": "risk", "method": "predict-risk", "params": {"$ref": "nlp.entities", "age": 65}},
+            {"id": "alerts", "method": "generate-alerts",
+             "params": {"risk_score": {"$ref": "risk.score"}, "diseases": {"$ref": "nlp.entities.diseases"}}}
+        ]
+    }
+"""
+
+import json
+
+import config
+
+
+class RpcError(Exception):
+    """Operation failure with the HTTP-style status reported for it."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class RpcContext:
+    """State shared by the operations of one call."""
+
+    def __init__(self, rules, normalize_patient, shared_patient=None, deadline=None):
+        self.rules = rules
+        self.shared_patient = shared_patient
+        self.deadline = deadline
+        self._normalize_patient = normalize_patient
+        self._patients = {}
+
+    def patient(self, params):
+        """Normalized patient for these params (computed once per distinct patient)."""
+        key = json.dumps(params, sort_keys=True, default=str)
+        patient = self._patients.get(key)
+        if patient is None:
+            patient = self._normalize_patient(params)
+            self._patients[key] = patient
+        return patient
+
+
+class RpcDispatcher:
+    """
+    Method table plus reference resolution.
+    """
+
+    def __init__(self, max_operations=50):
+        self.max_operations = max_operations
+        self._methods = {}
+
+    def register(self, method, handler, patient_params=False):
+        """
+        Register a method.
+
+        Args:
+            handler: callable(params, context) -> JSON-serializable result
+            patient_params: params default to the call's shared "patient"
+        """
+        self._methods[method] = (handler, patient_params)
+
+    @property
+    def methods(self):
+        return sorted(self._methods)
+
+    def execute(self, operations, context):
+        """
+        Run operations in order.
+
+        Returns:
+            list: {"id", "method", "status", "result" | "error"} per operation
+        """
+        if not isinstance(operations, list) or not operations:
+            raise ValueError('At least one operation is required')
+        if len(operations) > self.max_operations:
+            raise ValueError(f'Too many operations: {len(operations)} (maximum {self.max_operations})')
+
+        results = []
+        completed = {}
+        if context.shared_patient is not None:
+            completed['$patient'] = {'status': 200, 'result': context.shared_patient}
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                operation = {}
+            op_id = str(operation.get('id', index))
+            method = operation.get('method')
+            response = {'id': op_id, 'method': method}
+            try:
+                if context.deadline is not None and context.deadline.expired:
+                    raise RpcError('Deadline exceeded before this operation started', 504)
+                if op_id in completed:
+                    raise RpcError(f"Duplicate operation id '{op_id}'")
+                entry = self._methods.get(method)
+                if entry is None:
+                    raise RpcError(f"Unknown method '{method}'", 404)
+                handler, patient_params = entry
+
+                params = operation.get('params')
+                if params is None and patient_params:
+                    params = context.shared_patient
+                params = self._resolve(params if params is not None else {}, completed)
+                if not isinstance(params, dict):
+                    raise RpcError('params must be an object')
+
+                response['status'] = 200
+                response['result'] = handler(params, context)
+                completed[op_id] = response
+            except RpcError as e:
+                response['status'] = e.status
+                response['error'] = str(e)
+                completed[op_id] = response
+            except Exception as e:
+                response['status'] = 500
+                response['error'] = str(e)
+                completed[op_id] = response
+            results.append(response)
+        return results
+
+    def _resolve(self, value, completed):
+        if isinstance(value, list):
+            return [self._resolve(item, completed) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if '$ref' not in value:
+            return {key: self._resolve(item, completed) for key, item in value.items()}
+
+        referenced = self._lookup(value['$ref'], completed)
+        overrides = {key: self._resolve(item, completed) for key, item in value.items() if key != '$ref'}
+        if not overrides:
+            return referenced
+        if not isinstance(referenced, dict):
+            raise RpcError(f"Reference '{value['$ref']}' is not an object and cannot take extra keys")
+        return dict(referenced, **overrides)
+
+    def _lookup(self, ref, completed):
+        op_id, _, path = str(ref).partition('.')
+        source = completed.get(op_id)
+        if source is None:
+            raise RpcError(f"Reference '{ref}' does not name an earlier operation")
+        if source['status'] != 200:
+            raise RpcError(f"Operation '{op_id}' failed", 424)
+
+        value = source['result']
+        for part in path.split('.') if path else ():
+            if isinstance(value, dict) and part in value:
+                value = value[part]
+            elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                raise RpcError(f"Reference '{ref}' not found in the result of '{op_id}'")
+        return value
+
+
+# Export for use in main app
+rpc_dispatcher = RpcDispatcher(max_operations=config.RPC_MAX_OPERATIONS)
@@ -0,0 +1,283 @@
+"""
+CLARA Population Scoring
+========================
+Offline risk, outcome and alert scoring of a whole patient panel.
+
+The input file (CSV with a header row, or Parquet) is streamed in fixed-size
+chunks. Each chunk is scored in a worker process by RiskPredictionModel
+and AlertSystem (batch paths) and OutcomePredictor, and results are appended to
+a JSONL output file in input order, so memory stays bounded by the number of
+chunks in flight regardless of file size.
+
+After every written chunk a progress file (<output>.progress.json) records
+how many chunks and output bytes are complete. Rerunning the same command
+resumes after the last completed chunk; anything written past it by an
+interrupted run is truncated first.
+
+Input columns: patient_id (or id), age, diseases, medications, symptoms.
+List columns are ";"-separated strings (CSV) or list columns (Parquet).
+
+Usage:
+    python score_population.py --input patients.csv --output scores.jsonl
+    python score_population.py --input patients.parquet --output scores.jsonl --workers 8 --chunk-size 10000
+    python score_population.py --input patients.csv --output scores.jsonl --mongo-collection population_scores
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import csv
+import json
+import os
+import sys
+import time
+
+LIST_FIELDS = ('diseases', 'medications', 'symptoms')
+LIST_SEPARATOR = ';'
+
+PROGRESS_SUFFIX = '.progress.json'
+
+# Worker-process state, set by _init_worker
+_scorer = None
+
+
+class PopulationScorer:
+    """
+    Scores one chunk of patients with the service's models.
+    """
+
+    def __init__(self):
+        import config
+        from risk_prediction import RiskPredictionModel, load_learned_risk_model
+        from alert_system import AlertSystem
+        from clinical_insights import OutcomePredictor
+        from model_registry import model_registry
+
+        self.risk_model = RiskPredictionModel(learned_model_loader=load_learned_risk_model)
+        self.outcome_predictor = OutcomePredictor(memo_size=config.SIGNATURE_MEMO_SIZE)
+        self.alert_system = AlertSystem()
+        self.rules = model_registry.active
+
+    def score_chunk(self, rows):
+        """
+        Args:
+            rows: list of raw input rows (dicts)
+
+        Returns:
+            str: one JSON line per row
+        """
+        patients = [parse_patient(row) for row in rows]
+        risks = self.risk_model.predict_risk_batch(patients, rules=self.rules)
+        panel_alerts = self.alert_system.generate_alerts_batch([
+            {'risk_score': risk['score'], 'diseases': patient['diseases'], 'medications': patient['medications']}
+            for patient, risk in zip(patients, risks)
+        ])
+        lines = []
+        for row, patient, risk, alerts in zip(rows, patients, risks, panel_alerts):
+            outcomes = self.outcome_predictor.predict_outcomes(patient, rules=self.rules)
+            lines.append(json.dumps({
+                'patient_id': row.get('patient_id', row.get('id')),
+                'risk_score': risk['score'],
+                'risk_level': risk['level'],
+                'risk_model': risk.get('model_version'),
+                'outcomes': outcomes,
+                'alerts': alerts
+            }, default=str))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+def parse_patient(row):
+    """Patient dict in the API's shape from one input row."""
+    patient = {'age': _parse_age(row.get('age'))}
+    for field in LIST_FIELDS:
+        value = row.get(field)
+        if value is None:
+            items = []
+        elif isinstance(value, str):
+            items = [item.strip() for item in value.split(LIST_SEPARATOR)]
+        else:
+            items = [str(item).strip() for item in value]
+        patient[field] = [item for item in items if item]
+    return patient
+
+
+def _parse_age(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def iter_chunks(path, chunk_size):
+    """Lists of row dicts of at most `chunk_size` rows, streamed from CSV or Parquet."""
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit('Reading Parquet requires pyarrow (pip install pyarrow)')
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _init_worker():
+    global _scorer
+    _scorer = PopulationScorer()
+
+
+def _score_chunk(rows):
+    return _scorer.score_chunk(rows)
+
+
+def load_progress(progress_path, input_path, chunk_size):
+    """Progress of an earlier run of the same job, or None to start over."""
+    if not os.path.exists(progress_path):
+        return None
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        progress = json.load(f)
+    if progress.get('input') != os.path.abspath(input_path) or progress.get('chunk_size') != chunk_size:
+        raise SystemExit(
+            f'{progress_path} belongs to a different input or chunk size; '
+            'remove it (and the output) to start over'
+        )
+    return progress
+
+
+def save_progress(progress_path, progress):
+    """Write the progress file atomically."""
+    progress['updated_at'] = datetime.now().isoformat()
+    tmp_path = f'{progress_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress, f, indent=2)
+    os.replace(tmp_path, progress_path)
+
+
+def score_population(input_path, output_path, chunk_size=5000, workers=None, in_flight=None,
+                     mongo_collection=None):
+    """
+    Score every patient in `input_path` into `output_path` (JSONL), resuming
+    after the last completed chunk of an earlier run. With `mongo_collection`
+    each chunk is also bulk-inserted into that MongoDB collection, keyed by
+    patient_id so a chunk repeated after a resume is not stored twice.
+
+    Returns:
+        dict: rows and chunks scored in this run and in total, and throughput
+    """
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or workers * 2
+    progress_path = output_path + PROGRESS_SUFFIX
+    progress = load_progress(progress_path, input_path, chunk_size) or {
+        'input': os.path.abspath(input_path),
+        'chunk_size': chunk_size,
+        'chunks_done': 0,
+        'rows_done': 0,
+        'output_bytes': 0,
+        'completed': False
+    }
+    resumed_from = progress['chunks_done']
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    mode = 'r+b' if os.path.exists(output_path) else 'wb'
+
+    store = None
+    written = {'inserted': 0, 'duplicates': 0, 'errors': 0}
+    if mongo_collection:
+        from data_access import analysis_store as store
+
+    started = time.perf_counter()
+    rows_scored = 0
+    with open(output_path, mode) as out, ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        # Drop output of chunks that finished writing but were never recorded as done
+        out.truncate(progress['output_bytes'])
+        out.seek(progress['output_bytes'])
+
+        pending = deque()
+
+        def write_oldest():
+            rows, future = pending.popleft()
+            text = future.result()
+            data = text.encode('utf-8')
+            out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+            if store is not None:
+                result = store.insert_many(mongo_collection, result_documents(text))
+                for key in written:
+                    written[key] += result[key]
+            progress['chunks_done'] += 1
+            progress['rows_done'] += rows
+            progress['output_bytes'] += len(data)
+            save_progress(progress_path, progress)
+            return rows
+
+        for index, rows in enumerate(iter_chunks(input_path, chunk_size)):
+            if index < resumed_from:
+                continue
+            pending.append((len(rows), pool.submit(_score_chunk, rows)))
+            # Bounded window: wait for the oldest chunk before reading further
+            if len(pending) >= in_flight:
+                rows_scored += write_oldest()
+        while pending:
+            rows_scored += write_oldest()
+
+    progress['completed'] = True
+    save_progress(progress_path, progress)
+    elapsed = time.perf_counter() - started
+    summary = {
+        'output': output_path,
+        'resumed_from_chunk': resumed_from,
+        'rows_scored': rows_scored,
+        'rows_total': progress['rows_done'],
+        'chunks_total': progress['chunks_done'],
+        'workers': workers,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(rows_scored / elapsed, 1) if elapsed > 0 else None
+    }
+    if store is not None:
+        summary['mongo'] = dict(written, collection=mongo_collection)
+    return summary
+
+
+def result_documents(text):
+    """MongoDB documents for a chunk of JSONL results (_id = patient_id when present)."""
+    documents = []
+    for line in text.splitlines():
+        document = json.loads(line)
+        if document.get('patient_id') is not None:
+            document['_id'] = str(document['patient_id'])
+        documents.append(document)
+    return documents
+
+
+def main(argv=None):
+    """Score a patient file from the command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Score a patient panel offline (risk, outcomes, alerts)')
+    parser.add_argument('--input', required=True, help='Patients (CSV with header, or .parquet)')
+    parser.add_argument('--output', required=True, help='Scores (JSONL); rerun to resume')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Patients per chunk')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--mongo-collection', help='Also bulk-insert results into this collection (MONGO_URI)')
+    args = parser.parse_args(argv)
+
+    summary = score_population(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers,
+                               mongo_collection=args.mongo_collection)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+CLARA Shadow Evaluation
+=======================
+Runs candidate models on a sampled fraction of live requests, off the
+response path, and records score differences and latency of both models
+in a local SQLite store.
+"""
+
+from datetime import datetime
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+import config
+
+
+class ShadowEvaluator:
+    """
+    Samples requests, replays them against candidate models in a background
+    thread and stores the comparison. Submitting is O(1) and never blocks:
+    when the backlog is full the sample is dropped.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS shadow_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recorded_at TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            primary_version TEXT,
+            candidate_version TEXT,
+            primary_value REAL,
+            candidate_value REAL,
+            difference REAL,
+            primary_level TEXT,
+            candidate_level TEXT,
+            primary_latency_ms REAL,
+            candidate_latency_ms REAL
+        )
+    """
+
+    def __init__(self, db_path, fraction=0.0, max_backlog=1000):
+        self.db_path = db_path
+        self.fraction = fraction
+        self.max_backlog = max_backlog
+        self._candidates = {}
+        self._queue = None
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats = {'sampled': 0, 'dropped': 0, 'evaluated': 0, 'errors': 0}
+
+    def register_candidate(self, endpoint, run, compare, warmup=None):
+        """
+        Register a candidate model for an endpoint.
+
+        Args:
+            run: callable(request_data) -> candidate result
+            compare: callable(primary_result, candidate_result) -> list of
+                (metric, primary_value, candidate_value, primary_level, candidate_level,
+                 primary_version, candidate_version)
+            warmup: optional callable run once in the background thread before
+                the first sample, so model loading is not counted as latency
+        """
+        self._candidates[endpoint] = (run, compare, warmup)
+
+    @property
+    def enabled(self):
+        return self.fraction > 0 and bool(self._candidates)
+
+    def submit(self, endpoint, request_data, primary_result, primary_latency):
+        """Maybe schedule a shadow run; returns immediately."""
+        if self.fraction <= 0 or endpoint not in self._candidates:
+            return False
+        if random.random() >= self.fraction:
+            return False
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((endpoint, request_data, primary_result, primary_latency))
+            self._stats['sampled'] += 1
+            return True
+        except queue.Full:
+            self._stats['dropped'] += 1
+            return False
+
+    def summary(self):
+        """Aggregate recorded comparisons per endpoint and metric."""
+        rows = []
+        if os.path.exists(self.db_path):
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(self.SCHEMA)
+                rows = conn.execute("""
+                    SELECT endpoint, metric, candidate_version, COUNT(*),
+                           AVG(ABS(difference)), MAX(ABS(difference)), AVG(difference),
+                           AVG(CASE WHEN primary_level = candidate_level THEN 1.0 ELSE 0.0 END),
+                           AVG(primary_latency_ms), AVG(candidate_latency_ms)
+                    FROM shadow_results
+                    GROUP BY endpoint, metric, candidate_version
+                    ORDER BY endpoint, metric
+                """).fetchall()
+
+        return {
+            'enabled': self.enabled,
+            'fraction': self.fraction,
+            'candidates': sorted(self._candidates),
+            'stats': dict(self._stats),
+            'comparisons': [
+                {
+                    'endpoint': endpoint,
+                    'metric': metric,
+                    'candidate_version': candidate_version,
+                    'samples': count,
+                    'mean_abs_difference': _round(mean_abs),
+                    'max_abs_difference': _round(max_abs),
+                    'mean_difference': _round(mean_diff),
+                    'level_agreement_rate': _round(agreement * 100 if agreement is not None else None),
+                    'primary_latency_ms': _round(primary_ms, 3),
+                    'candidate_latency_ms': _round(candidate_ms, 3)
+                }
+                for (endpoint, metric, candidate_version, count, mean_abs, max_abs,
+                     mean_diff, agreement, primary_ms, candidate_ms) in rows
+            ],
+            'generated_at': datetime.now().isoformat()
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._queue = queue.Queue(maxsize=self.max_backlog)
+            self._worker = threading.Thread(target=self._run, name='shadow-evaluator', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(self.SCHEMA)
+        conn.commit()
+
+        for endpoint, (_, _, warmup) in list(self._candidates.items()):
+            if warmup is not None:
+                try:
+                    warmup()
+                except Exception as e:
+                    print(f"Warning: shadow candidate warmup failed for {endpoint}: {e}")
+
+        while True:
+            endpoint, request_data, primary_result, primary_latency = self._queue.get()
+            try:
+                rows = self._evaluate(endpoint, request_data, primary_result, primary_latency)
+                conn.executemany("""
+                    INSERT INTO shadow_results (
+                        recorded_at, endpoint, metric, primary_version, candidate_version,
+                        primary_value, candidate_value, difference, primary_level,
+                        candidate_level, primary_latency_ms, candidate_latency_ms
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                conn.commit()
+                self._stats['evaluated'] += 1
+            except Exception as e:
+                self._stats['errors'] += 1
+                print(f"Warning: shadow evaluation failed for {endpoint}: {e}")
+
+    def _evaluate(self, endpoint, request_data, primary_result, primary_latency):
+        run, compare, _ = self._candidates[endpoint]
+        started = time.perf_counter()
+        candidate_result = run(request_data)
+        candidate_latency = time.perf_counter() - started
+
+        recorded_at = datetime.now().isoformat()
+        rows = []
+        for (metric, primary_value, candidate_value, primary_level, candidate_level,
+             primary_version, candidate_version) in compare(primary_result, candidate_result):
+            rows.append((
+                recorded_at, endpoint, metric, primary_version, candidate_version,
+                primary_value, candidate_value, candidate_value - primary_value,
+                primary_level, candidate_level,
+                primary_latency * 1000, candidate_latency * 1000
+            ))
+        return rows
+
+
+def compare_risk(primary, candidate):
+    """Comparison rows for /api/predict-risk results."""
+    return [(
+        'score', primary['score'], candidate['score'], primary['level'], candidate['level'],
+        primary.get('model_version'), candidate.get('model_version')
+    )]
+
+
+def compare_outcomes(primary, candidate):
+    """Comparison rows for /api/predict-outcomes results, one per outcome."""
+    rows = []
+    for name, outcome in primary.items():
+        if not isinstance(outcome, dict) or 'probability' not in outcome:
+            continue
+        other = candidate.get(name)
+        if not isinstance(other, dict) or 'probability' not in other:
+            continue
+        rows.append((
+            name, outcome['probability'], other['probability'],
+            outcome['risk_level'], other['risk_level'],
+            primary.get('model_version'), candidate.get('model_version')
+        ))
+    return rows
+
+
+def _round(value, digits=2):
+    return round(value, digits) if value is not None else None
+
+
+# Export for use in main app
+shadow_evaluator = ShadowEvaluator(
+    config.SHADOW_DB_PATH,
+    fraction=config.SHADOW_FRACTION,
+    max_backlog=config.SHADOW_MAX_BACKLOG
+)
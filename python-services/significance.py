@@ -0,0 +1,206 @@
+"""
+CLARA Significance Testing
+==========================
+Bootstrap confidence intervals and p-values for before/after comparisons of
+raw per-analysis data (risk scores, outcome flags).
+
+Every resample is drawn at once as a matrix instead of looping in Python:
+
+- rates (0/1 flags): resampling n flags with replacement is exactly
+  Binomial(n, p) successes, so B resampled rates are one vectorized
+  binomial draw.
+- means of values with few distinct levels (integer risk scores 0-100):
+  a resample is a multinomial draw of counts over the k distinct values,
+  so the B resampled means are a (B x k) count matrix times the value
+  vector. Cost is O(B * k) regardless of n.
+- means of continuous values: small samples resample indices directly;
+  large ones are first collapsed into MULTINOMIAL_MAX_LEVELS equal-count
+  quantile bins (bin mean as the level), which keeps the mean exact and
+  loses only the within-bin variance, negligible at that many bins.
+
+The p-value is two-sided and found by inverting the percentile interval:
+twice the smaller tail of the bootstrapped difference around zero.
+"""
+
+import config
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_CONFIDENCE = 0.95
+
+# Distinct values up to which the multinomial shortcut is used
+MULTINOMIAL_MAX_LEVELS = 256
+
+# Samples whose (resamples x n) index matrix stays under this are resampled exactly
+EXACT_MAX_ELEMENTS = 5000000
+
+# Risk level bands (RiskPredictionModel): High is [50, 75), Critical is 75 and above.
+# high_risk_rate counts High only, as ImpactAnalytics does; Critical is reported separately.
+HIGH_RISK_THRESHOLD = 50
+CRITICAL_RISK_THRESHOLD = 75
+
+
+def _rng(seed):
+    import numpy as np
+    return np.random.default_rng(seed)
+
+
+def resample_means(values, resamples=DEFAULT_RESAMPLES, rng=None):
+    """Bootstrap distribution (length `resamples`) of the mean of `values`."""
+    import numpy as np
+
+    rng = rng or _rng(None)
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    levels, counts = np.unique(values, return_counts=True)
+    if levels.size == 1:
+        return np.full(resamples, levels[0])
+
+    if levels.size > MULTINOMIAL_MAX_LEVELS:
+        if n * resamples <= EXACT_MAX_ELEMENTS:
+            indices = rng.integers(0, n, size=(resamples, n))
+            return values[indices].mean(axis=1)
+        bins = np.array_split(np.sort(values), MULTINOMIAL_MAX_LEVELS)
+        levels = np.array([bin_values.mean() for bin_values in bins])
+        counts = np.array([bin_values.size for bin_values in bins])
+
+    draws = rng.multinomial(n, counts / n, size=resamples)
+    return draws @ levels / n
+
+
+def resample_rates(flags, resamples=DEFAULT_RESAMPLES, rng=None):
+    """Bootstrap distribution of the proportion of truthy `flags`."""
+    import numpy as np
+
+    rng = rng or _rng(None)
+    flags = np.asarray(flags, dtype=bool)
+    n = flags.size
+    return rng.binomial(n, flags.mean(), size=resamples) / n
+
+
+def compare(before_stats, after_stats, observed_before, observed_after,
+            confidence=DEFAULT_CONFIDENCE, scale=1.0):
+    """
+    Summarize bootstrapped before/after distributions of a statistic.
+
+    Returns:
+        dict: observed values, difference, percentile CI and two-sided p-value
+    """
+    import numpy as np
+
+    differences = (after_stats - before_stats) * scale
+    alpha = 1 - confidence
+    lower, upper = np.quantile(differences, [alpha / 2, 1 - alpha / 2])
+    resamples = differences.size
+    below = np.count_nonzero(differences <= 0) / resamples
+    above = np.count_nonzero(differences >= 0) / resamples
+    p_value = min(1.0, max(2 * min(below, above), 1 / resamples))
+    return {
+        'before': round(float(observed_before) * scale, 4),
+        'after': round(float(observed_after) * scale, 4),
+        'difference': round(float(observed_after - observed_before) * scale, 4),
+        'ci_lower': round(float(lower), 4),
+        'ci_upper': round(float(upper), 4),
+        'confidence': confidence,
+        'p_value': round(float(p_value), 6),
+        'significant': bool(p_value < alpha)
+    }
+
+
+class BootstrapTester:
+    """
+    Before/after significance tests on raw per-analysis data.
+    """
+
+    def __init__(self, resamples=DEFAULT_RESAMPLES, confidence=DEFAULT_CONFIDENCE, seed=None):
+        self.resamples = max(100, resamples)
+        self.confidence = confidence
+        self.seed = seed
+
+    def compare_periods(self, before, after):
+        """
+        Bootstrap tests for two periods of raw analyses.
+
+        Args:
+            before, after: dicts with "risk_scores" (list of numbers) and optionally
+                "high_risk" and "outcomes" (lists of 0/1 flags, one per analysis).
+                Without "high_risk", scores in the High band count as high risk.
+
+        Returns:
+            dict: results per metric (mean_risk_score, high_risk_rate, outcome_rate),
+                or None when either period has no risk scores
+        """
+        import numpy as np
+
+        before_scores = np.asarray(before.get('risk_scores') or [], dtype=np.float64)
+        after_scores = np.asarray(after.get('risk_scores') or [], dtype=np.float64)
+        if before_scores.size == 0 or after_scores.size == 0:
+            return None
+
+        rng = _rng(self.seed)
+        resamples = self.resamples
+        confidence = self.confidence
+        results = {
+            'method': 'bootstrap',
+            'resamples': resamples,
+            'sample_sizes': {'before': int(before_scores.size), 'after': int(after_scores.size)}
+        }
+
+        results['mean_risk_score'] = compare(
+            resample_means(before_scores, resamples, rng),
+            resample_means(after_scores, resamples, rng),
+            before_scores.mean(), after_scores.mean(), confidence
+        )
+
+        before_high = _flags(before.get('high_risk'), before_scores)
+        after_high = _flags(after.get('high_risk'), after_scores)
+        results['high_risk_rate'] = compare(
+            resample_rates(before_high, resamples, rng),
+            resample_rates(after_high, resamples, rng),
+            before_high.mean(), after_high.mean(), confidence, scale=100
+        )
+
+        before_outcomes = before.get('outcomes')
+        after_outcomes = after.get('outcomes')
+        if before_outcomes and after_outcomes:
+            before_outcomes = np.asarray(before_outcomes, dtype=bool)
+            after_outcomes = np.asarray(after_outcomes, dtype=bool)
+            results['outcome_rate'] = compare(
+                resample_rates(before_outcomes, resamples, rng),
+                resample_rates(after_outcomes, resamples, rng),
+                before_outcomes.mean(), after_outcomes.mean(), confidence, scale=100
+            )
+        return results
+
+
+def _flags(flags, scores):
+    import numpy as np
+
+    if flags:
+        return np.asarray(flags, dtype=bool)
+    return (scores >= HIGH_RISK_THRESHOLD) & (scores < CRITICAL_RISK_THRESHOLD)
+
+
+def period_summary(period):
+    """average_risk_score / high_risk_rate / critical_rate / total_analyses derived from raw data."""
+    scores = period.get('risk_scores') or []
+    if not scores:
+        return {}
+    flags = period.get('high_risk')
+    if flags:
+        high = sum(1 for flag in flags if flag)
+    else:
+        high = sum(1 for s in scores if HIGH_RISK_THRESHOLD <= s < CRITICAL_RISK_THRESHOLD)
+    critical = sum(1 for s in scores if s >= CRITICAL_RISK_THRESHOLD)
+    return {
+        'total_analyses': len(scores),
+        'average_risk_score': round(sum(scores) / len(scores), 2),
+        'high_risk_rate': round(high / len(scores) * 100, 2),
+        'critical_rate': round(critical / len(scores) * 100, 2)
+    }
+
+
+# Export for use in main app
+bootstrap_tester = BootstrapTester(
+    resamples=config.BOOTSTRAP_RESAMPLES,
+    confidence=config.BOOTSTRAP_CONFIDENCE
+)
@@ -0,0 +1,135 @@
+"""
+CLARA Request Coalescing
+========================
+Single-flight execution for expensive, deterministic endpoints. Concurrent
+requests with the same canonical payload wait for the first one's
+computation and share its result instead of recomputing it. Nothing is kept
+once the computation finishes, so this is not a result cache: a request
+arriving after the first one completed computes afresh.
+
+Keys are SHA-256 hashes of the endpoint name and the payload serialized as
+canonical JSON (sorted keys, compact separators).
+"""
+
+from collections import defaultdict
+from datetime import datetime
+import hashlib
+import json
+import threading
+
+import config
+
+
+def canonical_key(name, payload):
+    """SHA-256 of the endpoint name and the canonical JSON of the payload."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f'{name}\n{body}'.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """One in-flight computation."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls. Thread-safe; followers block on an
+    event until the leader finishes (or `wait_seconds` pass, after which they
+    compute on their own).
+    """
+
+    def __init__(self, enabled=True, wait_seconds=30):
+        self.enabled = enabled
+        self.wait_seconds = wait_seconds
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            'requests': 0, 'executions': 0, 'coalesced': 0,
+            'errors': 0, 'wait_timeouts': 0, 'unshared': 0, 'max_waiters': 0
+        })
+
+    def do(self, name, payload, compute, shareable=None, timeout=None):
+        """
+        Run `compute()` unless an identical call is already in flight, in
+        which case wait for it and return its result (or raise its error).
+
+        Args:
+            shareable: predicate on the leader's result; when it returns
+                False (e.g. a result cut short by the leader's deadline)
+                followers compute their own instead of sharing it
+            timeout: follower wait limit in seconds, e.g. the time left
+                before the request's deadline (capped at wait_seconds)
+        """
+        if not self.enabled:
+            return compute()
+
+        key = canonical_key(name, payload)
+        with self._lock:
+            stats = self._stats[name]
+            stats['requests'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                stats['executions'] += 1
+            else:
+                call.waiters += 1
+                stats['coalesced'] += 1
+                stats['max_waiters'] = max(stats['max_waiters'], call.waiters)
+
+        if leader:
+            try:
+                call.result = compute()
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    stats['errors'] += 1
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            wait_seconds = self.wait_seconds if timeout is None else min(self.wait_seconds, timeout)
+            if not call.done.wait(wait_seconds):
+                with self._lock:
+                    stats['wait_timeouts'] += 1
+                return compute()
+            if call.error is None and shareable is not None and not shareable(call.result):
+                with self._lock:
+                    stats['unshared'] += 1
+                return compute()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """Per-endpoint request, execution and coalescing counts."""
+        with self._lock:
+            endpoints = {}
+            for name, stats in self._stats.items():
+                entry = dict(stats)
+                entry['coalescing_rate'] = round(
+                    stats['coalesced'] / stats['requests'] * 100, 2
+                ) if stats['requests'] else 0.0
+                endpoints[name] = entry
+            in_flight = len(self._calls)
+        return {
+            'enabled': self.enabled,
+            'in_flight': in_flight,
+            'endpoints': endpoints,
+            'generated_at': datetime.now().isoformat()
+        }
+
+
+# Export for use in main app
+single_flight = SingleFlight(
+    enabled=config.SINGLE_FLIGHT,
+    wait_seconds=config.SINGLE_FLIGHT_WAIT_SECONDS
+)
@@ -0,0 +1,276 @@
+"""
+CLARA spaCy NLP Backend
+=======================
+Optional spaCy-backed transcript analysis. The pipeline is loaded once per
+worker with the components the analysis does not use disabled, and batches
+go through `nlp.pipe`. All keyword vocabularies (diseases, medication
+synonyms, tests, symptoms, sentiment, urgency, key-phrase patterns) run as a
+single case-insensitive PhraseMatcher over the shared tokenization.
+
+Matching is token-based: "pain" no longer matches inside "painful", and
+medication spans use the longest non-overlapping match.
+
+Usage:
+    python spacy_pipeline.py --count 500     # benchmark vs. the string-scan path
+"""
+
+from collections import defaultdict
+import sys
+import threading
+import time
+
+import spacy
+from spacy.matcher import PhraseMatcher
+from spacy.util import filter_spans
+
+import config
+
+# Components the analysis never reads; sentences come from the sentencizer
+DISABLED_COMPONENTS = ['tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'senter']
+
+MATCH_LABELS = {
+    'DISEASE': 'diseases',
+    'MEDICATION': 'medications',
+    'TEST': 'tests',
+    'SYMPTOM': 'symptoms',
+    'POSITIVE': 'positive',
+    'NEGATIVE': 'negative',
+    'EMERGENCY': 'emergency',
+    'HIGH_URGENCY': 'high_urgency',
+    'KEY_PHRASE': 'phrase'
+}
+
+KEY_PHRASE_LENGTH = 100
+
+
+class SpacyAnalyzer:
+    """
+    spaCy pipeline plus PhraseMatcher producing analyze_transcript results.
+    """
+
+    def __init__(self, analyzer, medication_normalizer, model, batch_size=64, n_process=1):
+        self.analyzer = analyzer
+        self.medication_normalizer = medication_normalizer
+        self.model = model
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.nlp = None
+        self.matcher = None
+        self.model_loaded = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the pipeline and build the matcher (once per worker)."""
+        if self.nlp is not None:
+            return self
+        with self._lock:
+            if self.nlp is not None:
+                return self
+            try:
+                nlp = spacy.load(self.model, disable=DISABLED_COMPONENTS)
+                self.model_loaded = self.model
+            except OSError as e:
+                print(f"Warning: spaCy model '{self.model}' not available, using a blank English pipeline: {e}")
+                nlp = spacy.blank('en')
+                self.model_loaded = 'blank:en'
+            if 'sentencizer' not in nlp.pipe_names:
+                nlp.add_pipe('sentencizer')
+
+            matcher = PhraseMatcher(nlp.vocab, attr='LOWER')
+            analyzer = self.analyzer
+            vocabularies = {
+                'DISEASE': analyzer.DISEASE_KEYWORDS,
+                'TEST': analyzer.TEST_KEYWORDS,
+                'SYMPTOM': analyzer.SYMPTOM_KEYWORDS,
+                'POSITIVE': analyzer.POSITIVE_WORDS,
+                'NEGATIVE': analyzer.NEGATIVE_WORDS,
+                'EMERGENCY': analyzer.EMERGENCY_WORDS,
+                'HIGH_URGENCY': analyzer.HIGH_URGENCY_WORDS,
+                'KEY_PHRASE': analyzer.KEY_PHRASE_PATTERNS,
+                'MEDICATION': self.medication_normalizer.extractable_synonyms() or analyzer.MEDICATION_KEYWORDS
+            }
+            for label, terms in vocabularies.items():
+                matcher.add(label, list(nlp.tokenizer.pipe(terms)))
+
+            self.matcher = matcher
+            self.nlp = nlp
+        return self
+
+    @property
+    def has_ner(self):
+        return 'ner' in self.load().nlp.pipe_names
+
+    def analyze(self, text):
+        """Analyze one transcript."""
+        self.load()
+        return self._analyze_doc(self.nlp(text))
+
+    def analyze_batch(self, texts, batch_size=None, n_process=None, deadline=None):
+        """Analyze many transcripts through nlp.pipe, stopping once `deadline` passes."""
+        self.load()
+        docs = self.nlp.pipe(
+            texts,
+            batch_size=batch_size or self.batch_size,
+            n_process=n_process or self.n_process
+        )
+        results = []
+        for doc in docs:
+            if deadline is not None and deadline.expired:
+                break
+            results.append(self._analyze_doc(doc))
+        return results
+
+    def status(self):
+        return {
+            'backend': 'spacy',
+            'model': self.model_loaded or self.model,
+            'pipeline': list(self.nlp.pipe_names) if self.nlp is not None else None,
+            'batch_size': self.batch_size,
+            'n_process': self.n_process
+        }
+
+    def _analyze_doc(self, doc):
+        strings = doc.vocab.strings
+        found = defaultdict(dict)
+        phrase_starts = {}
+        medication_spans = []
+        for match_id, start, end in self.matcher(doc):
+            kind = MATCH_LABELS[strings[match_id]]
+            span = doc[start:end]
+            if kind == 'medications':
+                medication_spans.append(span)
+            elif kind == 'phrase':
+                phrase_starts.setdefault(span.text.lower(), span)
+            else:
+                found[kind].setdefault(span.text.lower(), None)
+
+        medications = {}
+        normalizer = self.medication_normalizer
+        for span in filter_spans(medication_spans):
+            drug_id = normalizer.normalize(span.text)
+            medications.setdefault(drug_id.title(), None)
+
+        analyzer = self.analyzer
+        result = analyzer.build_analysis(
+            [term.title() for term in found['diseases']],
+            list(medications),
+            [term.title() for term in found['tests']],
+            [term.title() for term in found['symptoms']],
+            word_count=sum(1 for token in doc if not token.is_space and not token.is_punct),
+            sentence_count=sum(1 for _ in doc.sents),
+            sentiment=analyzer._score_sentiment(len(found['positive']), len(found['negative'])),
+            key_phrases=self._key_phrases(doc, phrase_starts),
+            urgency=analyzer._urgency_level(bool(found['emergency']), bool(found['high_urgency']))
+        )
+        if 'ner' in self.nlp.pipe_names:
+            result['named_entities'] = [
+                {'text': ent.text, 'label': ent.label_, 'start': ent.start_char, 'end': ent.end_char}
+                for ent in doc.ents
+            ]
+        return result
+
+    def _key_phrases(self, doc, phrase_starts):
+        """From each pattern's first match to the end of its sentence."""
+        phrases = []
+        for pattern in self.analyzer.KEY_PHRASE_PATTERNS:
+            span = phrase_starts.get(pattern)
+            if span is None:
+                continue
+            sentence = span.sent
+            phrase = doc.text[span.start_char:sentence.end_char].strip().rstrip('.?!')
+            if len(phrase) > 10:
+                phrases.append(phrase[:KEY_PHRASE_LENGTH])
+        return phrases[:5]
+
+
+def create_spacy_analyzer(analyzer, medication_normalizer):
+    """spaCy analyzer configured from the environment."""
+    return SpacyAnalyzer(
+        analyzer,
+        medication_normalizer,
+        config.SPACY_MODEL,
+        batch_size=config.SPACY_BATCH_SIZE,
+        n_process=config.SPACY_N_PROCESS
+    )
+
+
+def benchmark(count=500, batch_size=None, n_process=None, seed=7):
+    """
+    Throughput of the string-scan path vs. the spaCy path on synthetic
+    transcripts, plus how often both find the same entity sets.
+
+    Returns:
+        dict: transcripts per second for each path and entity agreement
+    """
+    import random
+    from clinical_nlp import ClinicalNLPAnalyzer
+    from medication_normalizer import medication_normalizer
+
+    nlp_analyzer = ClinicalNLPAnalyzer()
+    rng = random.Random(seed)
+    vocabulary = (
+        nlp_analyzer.DISEASE_KEYWORDS + nlp_analyzer.MEDICATION_KEYWORDS +
+        nlp_analyzer.SYMPTOM_KEYWORDS + nlp_analyzer.TEST_KEYWORDS
+    )
+    filler = ('the patient reports that she has been feeling this way for a few weeks '
+              'and we discussed the plan in detail').split()
+    texts = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.randint(5, 20)):
+            words = rng.sample(filler, rng.randint(6, 14)) + rng.sample(vocabulary, rng.randint(0, 3))
+            rng.shuffle(words)
+            sentences.append(' '.join(words).capitalize() + '.')
+        texts.append(' '.join(sentences))
+
+    spacy_analyzer = create_spacy_analyzer(nlp_analyzer, medication_normalizer)
+    if batch_size:
+        spacy_analyzer.batch_size = batch_size
+    if n_process:
+        spacy_analyzer.n_process = n_process
+    spacy_analyzer.load()
+
+    started = time.perf_counter()
+    keyword_results = [nlp_analyzer.analyze_transcript(text) for text in texts]
+    keyword_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    spacy_results = spacy_analyzer.analyze_batch(texts)
+    spacy_seconds = time.perf_counter() - started
+
+    agree = 0
+    for keyword_result, spacy_result in zip(keyword_results, spacy_results):
+        if all(
+            set(keyword_result['entities'][kind]) == set(spacy_result['entities'][kind])
+            for kind in ('diseases', 'medications', 'tests', 'symptoms')
+        ):
+            agree += 1
+
+    characters = sum(len(text) for text in texts)
+    return {
+        'transcripts': count,
+        'characters': characters,
+        'spacy': spacy_analyzer.status(),
+        'keyword_per_second': round(count / keyword_seconds, 1),
+        'spacy_per_second': round(count / spacy_seconds, 1),
+        'entity_agreement_rate': round(agree / count * 100, 1)
+    }
+
+
+def main(argv=None):
+    """Print a string-scan vs. spaCy throughput comparison."""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Benchmark the spaCy NLP backend')
+    parser.add_argument('--count', type=int, default=500, help='Number of synthetic transcripts')
+    parser.add_argument('--batch-size', type=int, help='nlp.pipe batch size (default: CLARA_SPACY_BATCH_SIZE)')
+    parser.add_argument('--n-process', type=int, help='nlp.pipe processes (default: CLARA_SPACY_N_PROCESS)')
+    args = parser.parse_args(argv)
+
+    print(json.dumps(benchmark(args.count, args.batch_size, args.n_process), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+CLARA Startup & Lazy Loading
+============================
+On-demand module imports with per-module timing, plus an import-time
+breakdown report for tuning cold start and worker spawn time.
+
+Usage:
+    python startup.py            # import-time breakdown of `import app`
+    python startup.py --lazy     # same, with CLARA_LAZY_IMPORTS=1
+"""
+
+from datetime import datetime
+from collections import defaultdict
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Dependencies from requirements.txt that are expensive to import
+HEAVY_DEPENDENCIES = [
+    'numpy', 'pandas', 'sklearn', 'joblib', 'spacy', 'nltk',
+    'matplotlib', 'seaborn', 'reportlab', 'pymongo', 'textblob'
+]
+
+
+class ModuleLoader:
+    """
+    Imports modules on first use and records how long each import took.
+    Safe to call from concurrent request threads.
+    """
+
+    def __init__(self, lazy=False):
+        self.lazy = lazy
+        self._lock = threading.Lock()
+        self._modules = {}
+        self._errors = {}
+        self._timings = {}
+        self._created = time.perf_counter()
+        self._ready_seconds = None
+
+    def load(self, name):
+        """
+        Import a module by name, once.
+
+        Returns:
+            module or None if the import failed
+        """
+        module = self._modules.get(name)
+        if module is not None:
+            return module
+
+        with self._lock:
+            if name in self._modules:
+                return self._modules[name]
+            if name in self._errors:
+                return None
+
+            started = time.perf_counter()
+            try:
+                module = importlib.import_module(name)
+            except ImportError as e:
+                self._errors[name] = str(e)
+                return None
+            finally:
+                self._timings[name] = {
+                    'seconds': round(time.perf_counter() - started, 4),
+                    'loaded_at': datetime.now().isoformat(),
+                    'deferred': self._ready_seconds is not None
+                }
+
+            self._modules[name] = module
+            return module
+
+    def mark_ready(self):
+        """Record the time from loader creation until the app finished importing."""
+        self._ready_seconds = round(time.perf_counter() - self._created, 4)
+
+    def report(self):
+        """Summarize startup and on-demand import timings."""
+        return {
+            'lazy_imports': self.lazy,
+            'app_import_seconds': self._ready_seconds,
+            'modules': dict(self._timings),
+            'failed_modules': dict(self._errors),
+            'heavy_dependencies_loaded': [
+                name for name in HEAVY_DEPENDENCIES if name in sys.modules
+            ],
+            'generated_at': datetime.now().isoformat()
+        }
+
+
+def import_time_breakdown(target='app', lazy=False, top=15):
+    """
+    Run `python -X importtime -c "import <target>"` in a fresh interpreter and
+    aggregate self time per top-level package.
+
+    Returns:
+        dict: total seconds and the most expensive packages
+    """
+    env = dict(os.environ)
+    env['CLARA_LAZY_IMPORTS'] = '1' if lazy else '0'
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+    per_package = defaultdict(int)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        self_us = int(parts[0].strip())
+        package = parts[2].strip().split('.')[0]
+        per_package[package] += self_us
+        total_us += self_us
+
+    ranked = sorted(per_package.items(), key=lambda x: x[1], reverse=True)[:top]
+    return {
+        'target': target,
+        'lazy_imports': lazy,
+        'exit_code': proc.returncode,
+        'total_seconds': round(total_us / 1e6, 3),
+        'packages': [{'name': name, 'seconds': round(us / 1e6, 4)} for name, us in ranked]
+    }
+
+
+def main(argv=None):
+    """Print an import-time breakdown for the service."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='CLARA import-time breakdown')
+    parser.add_argument('--target', default='app', help='Module to import (default: app)')
+    parser.add_argument('--lazy', action='store_true', help='Enable CLARA_LAZY_IMPORTS')
+    parser.add_argument('--top', type=int, default=15, help='Number of packages to show')
+    args = parser.parse_args(argv)
+
+    report = import_time_breakdown(args.target, lazy=args.lazy, top=args.top)
+    print(f"Import of '{report['target']}' (lazy={report['lazy_imports']}): "
+          f"{report['total_seconds']:.3f}s")
+    for pkg in report['packages']:
+        print(f"   {pkg['seconds']:8.4f}s  {pkg['name']}")
+    return report['exit_code']
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -222,6 +222,25 @@ export const PythonAPI = {
             console.error('Batch analysis error:', error);
             return { results: [], processed: 0 };
         }
+    },
+
+    /**
+     * Run several operations in one round trip
+     * @param {Array} operations - [{ id, method, params }], params may use { $ref: 'opId.path' }
+     * @param {Object} patient - Optional shared patient (default params, referenced as '$patient')
+     */
+    async rpc(operations, patient = null) {
+        try {
+            const response = await fetch(`${PYTHON_API_URL}/rpc`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(patient ? { patient, operations } : { operations })
+            });
+            return await response.json();
+        } catch (error) {
+            console.error('RPC error:', error);
+            return { results: [], count: 0, failed: operations.length };
+        }
     }
 };
 
@@ -414,6 +433,33 @@ export const DynamicFeatures = {
         return alerts.alerts || [];
     },
 
+    /**
+     * Risk, alerts, insights and outcomes for a patient in a single request
+     */
+    async getPatientOverview(patientData) {
+        const response = await PythonAPI.rpc([
+            { id: 'risk', method: 'predict-risk' },
+            {
+                id: 'alerts',
+                method: 'generate-alerts',
+                params: { $ref: '$patient', risk_score: { $ref: 'risk.score' } }
+            },
+            { id: 'insights', method: 'clinical-insights' },
+            { id: 'outcomes', method: 'predict-outcomes' }
+        ], patientData);
+
+        const overview = {};
+        for (const result of response.results || []) {
+            overview[result.id] = result.status === 200 ? result.result : null;
+        }
+        return {
+            risk: overview.risk || null,
+            alerts: overview.alerts?.alerts || [],
+            insights: overview.insights || null,
+            outcomes: overview.outcomes || null
+        };
+    },
+
     /**
      * Get dynamic dashboard
      */